@@ -0,0 +1,265 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the JSON API server file for the final project.
+
+Loads the model once and serves the chart data to scripts over HTTP:
+
+    python api_server.py --port 8050
+    curl 'http://localhost:8050/line?area=downtown&granularity=week'
+    curl 'http://localhost:8050/bar?area=kitsilano&start=2023-01-01&end=2023-12-31'
+"""
+
+import argparse  # For command line options
+import hashlib  # For entity tags
+import json  # For the response bodies
+import logging  # For leveled log output
+import sys  # For the exit code
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit  # For reading query strings
+from data_cache import DataCache
+from data_model import DataModel, LICENSES_URL, PERMITS_URL
+from instrumentation import Profiler, RECORDER, add_profiling_options
+from log_config import configure_logging
+from query_cache import QueryCache
+
+DEFAULT_PORT = 8050
+DEFAULT_CACHE_SIZE = 1024  # Responses kept in memory
+
+logger = logging.getLogger(__name__)
+
+
+class ApiServer(ThreadingHTTPServer):
+    """
+    Purpose:
+        Serves the chart data of one loaded DataModel as JSON, one thread per
+        connection, so many clients share the same in-memory data.
+    Attributes:
+        model (DataModel): The loaded model.
+        responses (QueryCache): Encoded responses by query and data version.
+    """
+
+    daemon_threads = True  # Do not wait for open connections on shutdown
+
+    def __init__(self, address, model, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        Purpose:
+            Binds the server and attaches the model.
+        Parameters:
+            address (tuple): (host, port); port 0 picks a free port.
+            model (DataModel): The loaded model.
+            cache_size (int): The number of responses cached.
+        Returns:
+            Nothing
+        """
+        super().__init__(address, ApiHandler)
+        self.model = model
+        self.responses = QueryCache(cache_size)
+
+    def respond(self, route, params):
+        """
+        Purpose:
+            Returns the response to a query, from the cache when the same
+            query was answered for the same data before.
+        Parameters:
+            route (str): '/line', '/bar' or '/areas'.
+            params (dict): The query parameters, one value each.
+        Returns:
+            tuple: (status, body, etag) with the body as JSON bytes.
+        """
+        key = (route, tuple(sorted(params.items())), self.model.data_version())
+        response = self.responses.get(key)
+        if response is None:
+            status, payload = self._query(route, params)
+            body = json.dumps(payload).encode("utf-8")
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            response = (status, body, etag)
+            self.responses.put(key, response)
+        return response
+
+    def _query(self, route, params):
+        """
+        Purpose:
+            Runs a query against the model.
+        Parameters:
+            route (str): '/line', '/bar' or '/areas'.
+            params (dict): The query parameters, one value each.
+        Returns:
+            tuple: (status, payload) where payload is JSON-serializable.
+        """
+        if route == "/areas":
+            return 200, {"areas": self.model.neighborhood_index().names}
+        area = params.get("area", "all").strip()
+        neighborhood = None
+        if area.lower() not in ("", "all"):
+            neighborhood = self.model.resolve_neighborhood(area)
+            if neighborhood is None:
+                return 404, {
+                    "error": f"Unknown neighborhood: {area}.",
+                    "suggestions": self.model.suggest_neighborhoods(area),
+                }
+        try:
+            if route == "/line":
+                data = self.model.prepare_line_chart_data(
+                    neighborhood, params.get("start"), params.get("end"),
+                    params.get("granularity"),
+                )
+            else:
+                data = self.model.prepare_grouped_bar_data(
+                    neighborhood, params.get("start"), params.get("end")
+                )
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        return 200, {"area": neighborhood, "data": data}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """
+    Purpose:
+        Handles GET requests for /line, /bar and /areas, answering 304 Not
+        Modified when the client already holds the current response.
+    """
+
+    routes = ("/line", "/bar", "/areas")
+
+    def do_GET(self):
+        """
+        Purpose:
+            Answers one GET request.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        url = urlsplit(self.path)
+        route = url.path.rstrip("/") or "/"
+        if route not in self.routes:
+            self._send(404, json.dumps({"error": f"Unknown path: {url.path}"}).encode())
+            return
+        params = {name: values[-1] for name, values
+                  in parse_qs(url.query, keep_blank_values=True).items()}
+        status, body, etag = self.server.respond(route, params)
+        if status == 200 and etag in self._client_etags():
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self._send(status, body, etag)
+
+    def _client_etags(self):
+        """
+        Purpose:
+            Returns the entity tags the client sent in If-None-Match.
+        Parameters:
+            Nothing
+        Returns:
+            list: The tags, with weak markers removed.
+        """
+        header = self.headers.get("If-None-Match", "")
+        return [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+    def _send(self, status, body, etag=None):
+        """
+        Purpose:
+            Sends a JSON response.
+        Parameters:
+            status (int): The HTTP status.
+            body (bytes): The JSON body.
+            etag (str): The entity tag, or None.
+        Returns:
+            Nothing
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")  # Revalidate with the ETag
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """
+        Purpose:
+            Sends access log lines to the module logger at DEBUG.
+        Parameters:
+            format (str): The message format.
+            args: The format arguments.
+        Returns:
+            Nothing
+        """
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def parse_args(argv=None):
+    """
+    Purpose:
+        Parses the command line options of the API server.
+    Parameters:
+        argv (list): The arguments to parse, or None to use sys.argv.
+    Returns:
+        Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(description="Serve the dashboard's chart data as JSON")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--columns", default=None,
+                        help="open columns saved by DataModel.save_columns "
+                             "instead of downloading")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not read or write the on-disk cache")
+    parser.add_argument("--cache-dir", default=None,
+                        help="cache directory (default: $DASHBOARD_CACHE_DIR or ~/.cache)")
+    parser.add_argument("--log-level", default=None,
+                        help="DEBUG, INFO, WARNING or ERROR (default: INFO)")
+    add_profiling_options(parser)
+    args = parser.parse_args(argv)
+    try:
+        args.profiler = Profiler.from_options(args, "api-server")
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def main(argv=None):
+    """
+    Purpose:
+        Entry point of the API server. Loads the data once, then serves it
+        until interrupted.
+    Parameters:
+        argv (list): The command line arguments, or None to use sys.argv.
+    Returns:
+        int: The exit code, 0 on success.
+    """
+    args = parse_args(argv)
+    configure_logging(args.log_level)
+    if args.columns:
+        model = DataModel()
+        loaded = model.open_columns(args.columns)
+    else:
+        model = DataModel(None if args.no_cache else DataCache(args.cache_dir))
+        loaded = all(model.load_datasets(PERMITS_URL, LICENSES_URL, year=None))
+    if not loaded:
+        logger.error("Failed to load permits and licenses data.")
+        return 1
+
+    server = ApiServer((args.host, args.port), model)
+    logger.info("Serving on http://%s:%d", *server.server_address[:2])
+    args.profiler.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        args.profiler.stop()
+        if args.timings_json:
+            RECORDER.dump_json(args.timings_json)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
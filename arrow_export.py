@@ -0,0 +1,245 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the Arrow/Parquet export file for the final project.
+
+Writes the cleaned datasets and the neighborhood x month aggregates as
+year-partitioned Parquet or Arrow IPC datasets that other tools (pandas,
+DuckDB, Spark, polars) read directly:
+
+    exports/permits/year=2024/part-0.parquet      issued_date, local_area
+    exports/licenses/year=2024/part-0.parquet
+    exports/aggregates/dataset=permits/part-0.parquet
+                                                  neighborhood, month, count
+
+pyarrow is optional; it is only imported when exporting or importing.
+"""
+
+import logging  # For leveled log output
+import os  # For dataset paths
+import shutil  # For replacing earlier exports
+import numpy as np  # For the column arrays
+from record_store import RecordStore, days_to_buckets  # Columnar storage
+
+FORMATS = {"parquet": "parquet", "arrow": "ipc"}  # Name -> pyarrow format
+AGGREGATES = "aggregates"
+
+logger = logging.getLogger(__name__)
+
+
+def _pyarrow():
+    """
+    Purpose:
+        Imports pyarrow and its dataset module on first use.
+    Parameters:
+        Nothing
+    Returns:
+        tuple: (pyarrow, pyarrow.dataset).
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow  # Optional: only needed for Arrow/Parquet files
+        import pyarrow.dataset  # For partitioned reads and writes
+    except ImportError as e:
+        raise ImportError(
+            "Arrow/Parquet export needs pyarrow: pip install pyarrow"
+        ) from e
+    return pyarrow, pyarrow.dataset
+
+
+def _format(file_format):
+    """
+    Purpose:
+        Maps a format name to the pyarrow dataset format.
+    Parameters:
+        file_format (str): 'parquet' or 'arrow'.
+    Returns:
+        str: The pyarrow dataset format.
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(
+            f"Unknown format: {file_format}. Use {' or '.join(FORMATS)}."
+        )
+    return FORMATS[file_format]
+
+
+def _int32_array(pa, values):
+    """
+    Purpose:
+        Wraps an int32 numpy array as an Arrow array without copying it.
+    Parameters:
+        pa (module): pyarrow.
+        values (ndarray): The int32 values, e.g. a memory-mapped column.
+    Returns:
+        Array: An Arrow int32 array over the same memory.
+    """
+    values = np.ascontiguousarray(values, dtype=np.int32)
+    return pa.Array.from_buffers(pa.int32(), len(values), [None, pa.py_buffer(values)])
+
+
+def _partitioning(pa, ds):
+    """
+    Purpose:
+        Returns the schema of the exported records and their year
+        partitioning.
+    Parameters:
+        pa (module): pyarrow.
+        ds (module): pyarrow.dataset.
+    Returns:
+        tuple: (Schema, Partitioning).
+    """
+    year = pa.field("year", pa.int16())
+    schema = pa.schema([
+        ("issued_date", pa.date32()),
+        ("local_area", pa.dictionary(pa.int32(), pa.string())),
+        year,
+    ])
+    return schema, ds.partitioning(pa.schema([year]), flavor="hive")
+
+
+def store_table(store):
+    """
+    Purpose:
+        Builds an Arrow table over a store's columns. The day column is
+        reinterpreted as date32 (also days since 1970-01-01) and the area
+        codes become the indices of a dictionary column, so neither is copied.
+    Parameters:
+        store (RecordStore): The store.
+    Returns:
+        Table: 'issued_date' (date32), 'local_area' (dictionary of strings)
+               and 'year' (int16, the partition key).
+    """
+    pa, ds = _pyarrow()
+    days = store.days
+    issued = _int32_array(pa, days).view(pa.date32())
+    areas = pa.DictionaryArray.from_arrays(
+        _int32_array(pa, store.codes), pa.array(store.area_names, pa.string())
+    )
+    years = (days_to_buckets(days, "year") + 1970).astype(np.int16)
+    return pa.Table.from_arrays([issued, areas, years],
+                                schema=_partitioning(pa, ds)[0])
+
+
+def aggregate_table(store):
+    """
+    Purpose:
+        Builds an Arrow table of the non-zero neighborhood x month counts of
+        a store, read from its count cube.
+    Parameters:
+        store (RecordStore): The store.
+    Returns:
+        Table: 'neighborhood' (dictionary of strings), 'month' (date32, the
+               first day of the month) and 'count' (int64).
+    """
+    pa, _ = _pyarrow()
+    cube = store.month_cube()
+    rows, columns = np.nonzero(cube.counts)
+    months = (columns + cube.first_month).astype("datetime64[M]")
+    month_days = months.astype("datetime64[D]").astype(np.int32)
+    return pa.table({
+        "neighborhood": pa.DictionaryArray.from_arrays(
+            rows.astype(np.int32), pa.array(store.area_names, pa.string())
+        ),
+        "month": _int32_array(pa, month_days).view(pa.date32()),
+        "count": cube.counts[rows, columns],
+    })
+
+
+def export_datasets(stores, directory, file_format="parquet"):
+    """
+    Purpose:
+        Writes each store partitioned by year, and the aggregates of all of
+        them partitioned by dataset, replacing earlier exports of the same
+        names.
+    Parameters:
+        stores (dict): Dataset name -> RecordStore.
+        directory (str): The export directory; created if missing.
+        file_format (str): 'parquet' or 'arrow' (Arrow IPC).
+    Returns:
+        int: The total size written, in bytes.
+    Raises:
+        ImportError: If pyarrow is not installed.
+        ValueError: If the format is unknown.
+    """
+    arrow_format = _format(file_format)
+    pa, ds = _pyarrow()
+    _, year_partitions = _partitioning(pa, ds)
+    written = []
+
+    def visit(written_file):
+        written.append(written_file.size)
+
+    for dataset, store in stores.items():
+        path = os.path.join(directory, dataset)
+        shutil.rmtree(path, ignore_errors=True)  # Drop partitions of old years
+        os.makedirs(path)  # Kept even when the store is empty
+        ds.write_dataset(
+            store_table(store), path, format=arrow_format,
+            partitioning=year_partitions,
+            existing_data_behavior="overwrite_or_ignore", file_visitor=visit,
+        )
+
+    tables = []
+    for dataset, store in stores.items():
+        table = aggregate_table(store)
+        tables.append(table.append_column(
+            "dataset", pa.array([dataset] * len(table), pa.string())
+        ))
+    path = os.path.join(directory, AGGREGATES)
+    shutil.rmtree(path, ignore_errors=True)
+    ds.write_dataset(
+        pa.concat_tables(tables, promote_options="permissive"), path,
+        format=arrow_format,
+        partitioning=ds.partitioning(pa.schema([("dataset", pa.string())]),
+                                     flavor="hive"),
+        existing_data_behavior="overwrite_or_ignore", file_visitor=visit,
+    )
+    logger.info("Exported %s to %s (%d files, %d bytes)",
+                ", ".join(stores), directory, len(written), sum(written))
+    return sum(written)
+
+
+def import_dataset(directory, dataset, record_type, file_format="parquet"):
+    """
+    Purpose:
+        Reads a dataset written by export_datasets back into a store. Only
+        the two columns are read, and the Arrow buffers become the store's
+        columns without any parsing.
+    Parameters:
+        directory (str): The export directory.
+        dataset (str): 'permits' or 'licenses'.
+        record_type (type): The record class the store materializes.
+        file_format (str): 'parquet' or 'arrow'.
+    Returns:
+        RecordStore: The store.
+    Raises:
+        ImportError: If pyarrow is not installed.
+        ValueError: If the format is unknown.
+        OSError: If the dataset cannot be read.
+    """
+    arrow_format = _format(file_format)
+    pa, ds = _pyarrow()
+    path = os.path.join(directory, dataset)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"No exported {dataset} in {directory}")
+    schema, year_partitions = _partitioning(pa, ds)
+    dataset_files = ds.dataset(
+        path, schema=schema, format=arrow_format, partitioning=year_partitions
+    )
+    table = dataset_files.to_table(columns=["issued_date", "local_area"])
+    # One dictionary for every file, then one chunk per column
+    table = table.unify_dictionaries().combine_chunks()
+    if table.num_rows == 0:
+        return RecordStore(record_type)
+    days = table.column("issued_date").chunk(0)
+    areas = table.column("local_area").chunk(0)
+    return RecordStore.from_arrays(
+        record_type,
+        days.view(pa.int32()).to_numpy(),
+        areas.indices.to_numpy(),
+        areas.dictionary.to_pylist(),
+    )
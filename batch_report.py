@@ -0,0 +1,232 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the batch report file for the final project.
+
+Renders the grouped bar chart and the line chart of the whole city and of
+every neighborhood to image files, without opening a window:
+
+    python batch_report.py --output-dir reports
+    python batch_report.py --formats png,svg --start 2020 --end "" --granularity year
+    python batch_report.py --columns saved-columns --workers 8
+"""
+
+import argparse  # For command line options
+import logging  # For leveled log output
+import os  # For output paths
+import re  # For turning neighborhood names into file names
+import sys  # For the exit code
+import time  # For timing the run
+from concurrent.futures import ProcessPoolExecutor  # For rendering on every core
+from chart_drawing import draw_grouped_bar_chart, draw_line_chart
+from data_cache import DataCache
+from data_model import DataModel, LICENSES_URL, PERMITS_URL
+from instrumentation import Profiler, RECORDER, add_profiling_options
+from log_config import configure_logging
+from parallel_parse import default_workers, pool_context
+
+FORMATS = ("png", "svg")
+FIGURE_SIZE = (14, 5)  # Inches; the bar chart beside the line chart
+DPI = 100
+
+logger = logging.getLogger(__name__)
+
+
+def report_file_stem(neighborhood):
+    """
+    Purpose:
+        Builds the file name (without extension) of a neighborhood's report.
+    Parameters:
+        neighborhood (str): The neighborhood, or None for the whole city.
+    Returns:
+        str: A lowercase, dash-separated name such as 'kensington-cedar-cottage'.
+    """
+    if neighborhood is None:
+        return "all-neighborhoods"
+    return re.sub(r"[^0-9a-z]+", "-", neighborhood.lower()).strip("-")
+
+
+def render_report(neighborhood, line_data, bar_data, output_dir, formats):
+    """
+    Purpose:
+        Draws one neighborhood's charts with the Agg backend and saves them in
+        each requested format. Runs in a worker process.
+    Parameters:
+        neighborhood (str): The neighborhood, or None for the whole city.
+        line_data (list): The line chart data of the neighborhood.
+        bar_data (dict): The grouped bar chart data of the neighborhood.
+        output_dir (str): The directory to write to.
+        formats (tuple): File formats, from FORMATS.
+    Returns:
+        list: The paths written.
+    """
+    # Deferred so that only rendering, not the CLI, loads matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg  # No display needed
+    from matplotlib.figure import Figure  # For drawing without pyplot or Tk
+    figure = Figure(figsize=FIGURE_SIZE, dpi=DPI)
+    FigureCanvasAgg(figure)
+    bar_ax, line_ax = figure.subplots(1, 2, gridspec_kw={"width_ratios": [1, 2]})
+    title = neighborhood or "All Neighborhoods"
+    draw_grouped_bar_chart(bar_ax, bar_data, f"{title}: Totals")
+    draw_line_chart(line_ax, line_data, f"{title}: Over Time")
+    figure.tight_layout()
+
+    paths = []
+    for file_format in formats:
+        path = os.path.join(
+            output_dir, f"{report_file_stem(neighborhood)}.{file_format}"
+        )
+        figure.savefig(path, format=file_format)
+        paths.append(path)
+    return paths
+
+
+def render_reports(report, output_dir, formats=("png",), workers=None):
+    """
+    Purpose:
+        Renders every entry of a report, spread over a process pool.
+    Parameters:
+        report (list): (neighborhood, line data, bar data) tuples, as returned
+                       by DataModel.prepare_report_data.
+        output_dir (str): The directory to write to; created if missing.
+        formats (tuple): File formats, from FORMATS.
+        workers (int): The number of processes, or None for every core.
+    Returns:
+        list: The paths written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = min(workers or default_workers(), max(len(report), 1))
+    tasks = [
+        (neighborhood, line_data, bar_data, output_dir, tuple(formats))
+        for neighborhood, line_data, bar_data in report
+    ]
+    if workers == 1:
+        results = [render_report(*task) for task in tasks]
+    else:
+        # Workers start like the parse workers, not forked from a process
+        # that has run the loader threads
+        context = pool_context()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            results = list(pool.map(render_report, *zip(*tasks)))
+    return [path for paths in results for path in paths]
+
+
+def load_model(args):
+    """
+    Purpose:
+        Loads both datasets, from saved columns or from the portal.
+    Parameters:
+        args (Namespace): The parsed command line options.
+    Returns:
+        DataModel or None: The loaded model, or None if loading failed.
+    """
+    if args.columns:
+        model = DataModel()
+        return model if model.open_columns(args.columns) else None
+    cache = None if args.no_cache else DataCache(args.cache_dir)
+    model = DataModel(cache, workers=args.workers)
+    if not all(model.load_datasets(PERMITS_URL, LICENSES_URL, year=None)):
+        return None
+    return model
+
+
+def parse_args(argv=None):
+    """
+    Purpose:
+        Parses the command line options of the report renderer.
+    Parameters:
+        argv (list): The arguments to parse, or None to use sys.argv.
+    Returns:
+        Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(
+        description="Render chart reports for every Vancouver neighborhood"
+    )
+    parser.add_argument("--output-dir", default="reports",
+                        help="directory for the report files (default: reports)")
+    parser.add_argument("--formats", default="png",
+                        help="comma separated file formats: " + ",".join(FORMATS))
+    parser.add_argument("--start", default=None,
+                        help="first day, YYYY-MM-DD ('' for the earliest record; "
+                             "default: 2024-01-01)")
+    parser.add_argument("--end", default=None,
+                        help="last day, YYYY-MM-DD ('' for the latest record; "
+                             "default: 2024-12-31)")
+    parser.add_argument("--granularity", default="month",
+                        help="day, week, month or year (default: month)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes for parsing and rendering (default: all cores)")
+    parser.add_argument("--columns", default=None,
+                        help="open columns saved by DataModel.save_columns "
+                             "instead of downloading")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not read or write the on-disk cache")
+    parser.add_argument("--cache-dir", default=None,
+                        help="cache directory (default: $DASHBOARD_CACHE_DIR or ~/.cache)")
+    parser.add_argument("--log-level", default=None,
+                        help="DEBUG, INFO, WARNING or ERROR (default: INFO)")
+    add_profiling_options(parser)
+    args = parser.parse_args(argv)
+    try:
+        args.profiler = Profiler.from_options(args, "batch-report")
+    except ValueError as e:
+        parser.error(str(e))
+    args.formats = [name.strip().lower() for name in args.formats.split(",") if name.strip()]
+    unknown = set(args.formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"unknown formats: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    """
+    Purpose:
+        Entry point of the report renderer.
+    Parameters:
+        argv (list): The command line arguments, or None to use sys.argv.
+    Returns:
+        int: The exit code, 0 on success.
+    """
+    args = parse_args(argv)
+    configure_logging(args.log_level)
+    with args.profiler:
+        status = run(args)
+    if args.timings_json:
+        RECORDER.dump_json(args.timings_json)
+    return status
+
+
+def run(args):
+    """
+    Purpose:
+        Loads the data, aggregates it and renders every report.
+    Parameters:
+        args (Namespace): The parsed command line options.
+    Returns:
+        int: The exit code, 0 on success.
+    """
+    started = time.perf_counter()
+    model = load_model(args)
+    if model is None:
+        logger.error("Failed to load permits and licenses data.")
+        return 1
+    loaded = time.perf_counter()
+    try:
+        report = model.prepare_report_data(args.start, args.end, args.granularity)
+    except ValueError as e:
+        logger.error("%s", e)
+        return 1
+    aggregated = time.perf_counter()
+    paths = render_reports(report, args.output_dir, args.formats, args.workers)
+    logger.info(
+        "Wrote %d files for %d reports to %s (load %.2fs, aggregate %.3fs, "
+        "render %.2fs)",
+        len(paths), len(report), args.output_dir, loaded - started,
+        aggregated - loaded, time.perf_counter() - aggregated,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
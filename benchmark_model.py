@@ -0,0 +1,426 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the model benchmark file for the final project.
+
+Generates synthetic permit/license exports, times each DataModel stage
+against them and compares the results with a stored baseline:
+
+    python benchmark_model.py --sizes 10k,100k
+    python benchmark_model.py --sizes 10k,100k --save-baseline
+    python benchmark_model.py --sizes 1m,10m --stages load,filter,line,bar
+"""
+
+import argparse  # For command line options
+import functools  # For binding the served directory
+import json  # For results and the baseline file
+import os  # For paths
+import resource  # For peak resident memory
+import subprocess  # For running each size in a fresh process
+import sys  # For the interpreter path and exit codes
+import tempfile  # For the generated exports
+import threading  # For the local HTTP server
+import time  # For timing stages
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np  # For vectorized data generation
+import pandas as pd  # For writing the CSV exports
+
+DEFAULT_SIZES = "10k,100k"
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.25  # Slowdown allowed before a stage counts as regressed
+DEFAULT_REPEAT = 3  # Runs of each repeatable stage; the fastest is kept
+MIN_REGRESSION_SECONDS = 0.001  # Smaller slowdowns are scheduler jitter
+# Stages that leave the model as they found it and can be run again
+REPEATABLE_STAGES = ("download", "pparse", "load", "line", "bar")
+GENERATE_CHUNK = 500000  # Rows generated and written at a time
+ALL_STAGES = ["download", "parse", "pparse", "load", "filter", "line", "bar"]
+
+# Local areas with rough relative activity, so some areas are much busier
+NEIGHBORHOODS = {
+    "Downtown": 18, "Mount Pleasant": 8, "Kensington-Cedar Cottage": 7,
+    "Kitsilano": 7, "Fairview": 6, "Renfrew-Collingwood": 6,
+    "Hastings-Sunrise": 5, "Grandview-Woodland": 5, "West End": 5,
+    "Sunset": 4, "Riley Park": 4, "Marpole": 4, "Dunbar-Southlands": 3,
+    "Victoria-Fraserview": 3, "Killarney": 3, "Kerrisdale": 3,
+    "Strathcona": 3, "Arbutus Ridge": 2, "West Point Grey": 2,
+    "Oakridge": 2, "Shaughnessy": 2, "South Cambie": 2,
+}
+# Seasonality: more permits and licenses are issued in spring and summer
+MONTH_WEIGHTS = [6, 7, 9, 10, 10, 10, 9, 9, 8, 8, 7, 5]
+FIRST_YEAR, LAST_YEAR = 2015, 2025
+DESCRIPTIONS = [
+    "Addition/alteration to existing single detached house",
+    "New laneway house with garage and associated site work",
+    "Interior alterations to retail unit on ground floor",
+    "Demolition of existing building; salvage and abatement",
+    "New multiple dwelling building with underground parking",
+]
+BUSINESS_TYPES = ["Restaurant", "Retail Dealer", "Office", "Contractor", "Salon"]
+
+
+def parse_size(text):
+    """
+    Purpose:
+        Parses a row count such as '10k', '1m' or '2500'.
+    Parameters:
+        text (str): The size text.
+    Returns:
+        int: The number of rows.
+    """
+    text = text.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    number = text[:-1] if multiplier > 1 else text
+    return int(float(number) * multiplier)
+
+
+def generate_export(path, dataset, rows, seed=0):
+    """
+    Purpose:
+        Writes a synthetic export with the same layout as the Open Data
+        portal's CSV: semicolon separated, extra free-text columns, a few
+        missing dates and areas, weighted areas and seasonal dates.
+    Parameters:
+        path (str): The file to write.
+        dataset (str): 'permits' or 'licenses'.
+        rows (int): The number of rows to generate.
+        seed (int): The random seed.
+    Returns:
+        Nothing
+    """
+    rng = np.random.default_rng(seed)
+    names = np.array(list(NEIGHBORHOODS))
+    area_p = np.array(list(NEIGHBORHOODS.values()), dtype=float)
+    area_p /= area_p.sum()
+    month_p = np.array(MONTH_WEIGHTS, dtype=float) / sum(MONTH_WEIGHTS)
+
+    with open(path, "w", encoding="utf-8", newline="") as export:
+        for start in range(0, rows, GENERATE_CHUNK):
+            size = min(GENERATE_CHUNK, rows - start)
+            years = rng.integers(FIRST_YEAR, LAST_YEAR + 1, size)
+            months = rng.choice(12, size, p=month_p)
+            month_starts = (
+                (years - 1970) * 12 + months
+            ).astype("datetime64[M]").astype("datetime64[D]")
+            dates = month_starts + rng.integers(0, 28, size).astype("timedelta64[D]")
+            date_text = np.datetime_as_string(dates, unit="D").astype(object)
+            date_text[rng.random(size) < 0.02] = ""  # Missing issue dates
+            areas = names[rng.choice(len(names), size, p=area_p)].astype(object)
+            areas[rng.random(size) < 0.03] = ""  # Records without an area
+
+            numbers = np.arange(start, start + size)
+            if dataset == "permits":
+                frame = pd.DataFrame({
+                    "PermitNumber": [f"BP-{n:08d}" for n in numbers],
+                    "IssueDate": date_text,
+                    "ProjectDescription": np.array(DESCRIPTIONS)[
+                        rng.integers(0, len(DESCRIPTIONS), size)
+                    ],
+                    "ProjectValue": rng.integers(1000, 5000000, size),
+                    "GeoLocalArea": areas,
+                })
+            else:
+                frame = pd.DataFrame({
+                    "LicenceNumber": [f"{n:08d}-2024" for n in numbers],
+                    "BusinessType": np.array(BUSINESS_TYPES)[
+                        rng.integers(0, len(BUSINESS_TYPES), size)
+                    ],
+                    "IssuedDate": date_text,
+                    "NumberOfEmployees": rng.integers(0, 50, size),
+                    "LocalArea": areas,
+                })
+            frame.to_csv(export, sep=";", index=False, header=start == 0)
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """
+    Purpose:
+        Serves the generated exports without logging every request.
+    """
+
+    def log_message(self, format, *args):
+        """
+        Purpose:
+            Suppresses request logging.
+        Parameters:
+            format (str): The log format.
+            args: The format arguments.
+        Returns:
+            Nothing
+        """
+        pass
+
+
+def start_server(directory):
+    """
+    Purpose:
+        Serves a directory over HTTP on a free local port.
+    Parameters:
+        directory (str): The directory to serve.
+    Returns:
+        tuple: (server, base_url).
+    """
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def peak_rss_mb():
+    """
+    Purpose:
+        Returns the peak resident memory of this process so far.
+    Parameters:
+        Nothing
+    Returns:
+        float: The peak RSS in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def export_paths(rows, work_dir, seed=0):
+    """
+    Purpose:
+        Returns the exports of one size, generating those not yet written.
+    Parameters:
+        rows (int): The rows per export.
+        work_dir (str): The directory for the generated exports.
+        seed (int): The random seed.
+    Returns:
+        dict: Dataset name -> export path.
+    """
+    paths = {}
+    for dataset in ("permits", "licenses"):
+        paths[dataset] = os.path.join(work_dir, f"{dataset}-{rows}.csv")
+        if not os.path.exists(paths[dataset]):
+            generate_export(paths[dataset], dataset, rows, seed)
+    return paths
+
+
+def run_size(rows, stages, work_dir, seed=0, repeat=DEFAULT_REPEAT):
+    """
+    Purpose:
+        Times each requested stage on exports of one size. Stages in
+        REPEATABLE_STAGES run several times and report their best time,
+        which is much less noisy than a single run. The stages share one
+        model, so peak memory is only meaningful for the whole size; run
+        each size in a fresh process to measure it.
+    Parameters:
+        rows (int): The rows per export.
+        stages (list): The stage names to run, from ALL_STAGES.
+        work_dir (str): The directory for the generated exports.
+        seed (int): The random seed.
+        repeat (int): The runs of each repeatable stage.
+    Returns:
+        dict: 'stages' (stage name -> {'seconds', 'runs',
+              'rows_per_second'}) and 'peak_rss_mb' (the peak of this
+              process once every stage ran).
+    """
+    from data_model import DataModel  # Imported here so RSS excludes setup
+    from log_config import configure_logging
+
+    configure_logging("WARNING")
+    paths = export_paths(rows, work_dir, seed)
+    server, base_url = start_server(work_dir)
+    urls = {name: f"{base_url}/{os.path.basename(path)}" for name, path in paths.items()}
+
+    results = {}
+    model = DataModel()
+    texts = {}
+
+    def timed(stage, func, items):
+        runs = repeat if stage in REPEATABLE_STAGES else 1
+        seconds = None
+        for _ in range(runs):
+            model.query_cache.clear()  # Chart stages must compute every run
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            seconds = elapsed if seconds is None else min(seconds, elapsed)
+        results[stage] = {
+            "seconds": round(seconds, 6),
+            "runs": runs,
+            "rows_per_second": round(items / seconds) if seconds > 0 else None,
+        }
+
+    try:
+        if "download" in stages or "parse" in stages:
+            def download():
+                for dataset, url in urls.items():
+                    texts[dataset] = model.download_data(url)
+            timed("download", download, 2 * rows)
+        if "parse" in stages:
+            def parse():
+                model.parse_permit_data(texts.pop("permits"))
+                model.parse_license_data(texts.pop("licenses"))
+            timed("parse", parse, 2 * rows)
+        texts.clear()
+        if "pparse" in stages:
+            from parallel_parse import default_workers
+
+            def parallel_parse():
+                parallel = DataModel(workers=default_workers())
+                for dataset, path in paths.items():
+                    parallel.load_csv_file(path, dataset)
+            timed("pparse", parallel_parse, 2 * rows)
+        if "load" in stages:
+            model = DataModel()  # Streaming replaces the parsed data anyway
+            timed(
+                "load",
+                lambda: model.load_datasets(urls["permits"], urls["licenses"], year=None),
+                2 * rows,
+            )
+        if "filter" in stages:
+            timed("filter", model.filter_data_2024, 2 * rows)
+        if "line" in stages:
+            timed("line", lambda: [
+                model.prepare_line_chart_data(area) for area in [None] + list(NEIGHBORHOODS)
+            ], 2 * rows)
+        if "bar" in stages:
+            timed("bar", lambda: [
+                model.prepare_grouped_bar_data(area) for area in [None] + list(NEIGHBORHOODS)
+            ], 2 * rows)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return {"stages": results, "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE,
+                        min_seconds=MIN_REGRESSION_SECONDS):
+    """
+    Purpose:
+        Finds stages that got slower than the baseline by more than the
+        tolerance. Slowdowns under min_seconds are ignored, since on stages
+        taking well under a millisecond scheduler jitter outweighs the work.
+    Parameters:
+        results (dict): Size -> run_size() result, from this run.
+        baseline (dict): The same structure, from the stored baseline.
+        tolerance (float): The allowed relative slowdown, e.g. 0.25 for 25%.
+        min_seconds (float): The smallest slowdown reported, in seconds.
+    Returns:
+        list: (size, stage, baseline_seconds, seconds) for each regression.
+    """
+    regressions = []
+    for size, measured_size in results.items():
+        for stage, measured in measured_size["stages"].items():
+            reference = baseline.get(size, {}).get("stages", {}).get(stage)
+            if reference is None:
+                continue
+            slowdown = measured["seconds"] - reference["seconds"]
+            if (measured["seconds"] > reference["seconds"] * (1 + tolerance)
+                    and slowdown >= min_seconds):
+                regressions.append((size, stage, reference["seconds"], measured["seconds"]))
+    return regressions
+
+
+def print_report(results, regressions):
+    """
+    Purpose:
+        Prints a table of the measurements, the peak memory of each size and
+        any regressions.
+    Parameters:
+        results (dict): Size -> run_size() result.
+        regressions (list): The output of compare_to_baseline.
+    Returns:
+        Nothing
+    """
+    print(f"{'rows':>10} {'stage':<10} {'seconds':>10} {'rows/s':>14}")
+    for size, measured_size in results.items():
+        for stage, measured in measured_size["stages"].items():
+            rate = measured["rows_per_second"]
+            print(
+                f"{size:>10} {stage:<10} {measured['seconds']:>10.4f} "
+                f"{rate if rate is not None else '-':>14}"
+            )
+        print(f"{size:>10} {'peak RSS':<10} {measured_size['peak_rss_mb']:>10.1f} MB")
+    for size, stage, before, after in regressions:
+        print(f"REGRESSION {size} rows, {stage}: {before:.4f}s -> {after:.4f}s")
+
+
+def parse_args(argv=None):
+    """
+    Purpose:
+        Parses the command line options of the benchmark.
+    Parameters:
+        argv (list): The arguments to parse, or None to use sys.argv.
+    Returns:
+        Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the DataModel pipeline")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help="comma separated row counts, e.g. 10k,100k,1m,10m")
+    parser.add_argument("--stages", default=",".join(ALL_STAGES),
+                        help="comma separated stages: " + ",".join(ALL_STAGES))
+    parser.add_argument("--work-dir", default=None,
+                        help="where to keep generated exports (default: a temp dir)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="baseline JSON file to compare against")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown before reporting a regression")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="runs of each repeatable stage; the best is kept")
+    parser.add_argument("--json", default=None, help="also write the results here")
+    parser.add_argument("--run-one", type=int, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Purpose:
+        Runs every size in a fresh interpreter, so peak memory is measured per
+        size, then reports and compares the results. The exports are
+        generated here first, so their memory is not counted.
+    Parameters:
+        argv (list): The command line arguments, or None to use sys.argv.
+    Returns:
+        int: 1 if a regression was found, otherwise 0.
+    """
+    args = parse_args(argv)
+    stages = [stage for stage in args.stages.split(",") if stage]
+
+    if args.run_one is not None:
+        print(json.dumps(run_size(args.run_one, stages, args.work_dir,
+                                  repeat=args.repeat)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = args.work_dir or temp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        results = {}
+        for size in args.sizes.split(","):
+            rows = parse_size(size)
+            export_paths(rows, work_dir)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run-one", str(rows),
+                 "--stages", ",".join(stages), "--work-dir", work_dir,
+                 "--repeat", str(args.repeat)],
+                check=True, capture_output=True, text=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout
+            results[str(rows)] = json.loads(output.strip().splitlines()[-1])
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    print_report(results, regressions)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as json_file:
+            json.dump(results, json_file, indent=2)
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(baseline, baseline_file, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,7 +5,10 @@ Final Project
 This is the BusinessLicense class for the final project.
 """
 
-import pandas as pd  # Import pandas for flexible date parsing
+import logging  # For debug output that costs nothing when disabled
+from date_parser import DATE_PARSER  # Shared, memoized date parsing engine
+
+logger = logging.getLogger(__name__)
 
 
 class BusinessLicense:
@@ -18,6 +21,9 @@ class BusinessLicense:
                           business operates.
     """
 
+    # No per-instance __dict__: records are small and may be built in bulk
+    __slots__ = ("issued_date", "local_area")
+
     def __init__(self, issued_date, local_area):
         """
         Purpose:
@@ -31,17 +37,36 @@ class BusinessLicense:
         """
         self.issued_date = self.parse_date(issued_date)
         self.local_area = local_area.strip()
-        print(
-            f"Initialized BusinessLicense: issued_date={self.issued_date}, "
-            f"local_area={self.local_area}"
+        logger.debug(
+            "Initialized BusinessLicense: issued_date=%s, local_area=%s",
+            self.issued_date,
+            self.local_area,
         )
 
+    @classmethod
+    def from_parsed(cls, issued_date, local_area):
+        """
+        Purpose:
+            Builds a BusinessLicense from values that were already parsed, skipping
+            the per-record date parsing.
+        Parameters:
+            issued_date (datetime): The parsed issued date.
+            local_area (str): The cleaned local area.
+        Returns:
+            BusinessLicense: The new record.
+        """
+        license = cls.__new__(cls)
+        license.issued_date = issued_date
+        license.local_area = local_area
+        return license
+
     @staticmethod
     def parse_date(date_str):
         """
         Purpose:
-            Parses a date string into a datetime object
-            using pandas.to_datetime for flexible parsing.
+            Parses a date string into a datetime object using the shared
+            date parsing engine, which memoizes repeated dates and only falls
+            back to flexible parsing for non-ISO strings.
         Parameters:
             date_str (str): The date string to be parsed.
         Returns:
@@ -49,18 +74,14 @@ class BusinessLicense:
                               fails or no date is provided.
         """
         if not date_str:
-            print("No date provided to parse.")
+            logger.debug("No date provided to parse.")
             return None
-        try:
-            parsed_date = pd.to_datetime(date_str.strip(), errors="coerce")
-            if pd.isna(parsed_date):
-                print(f"Failed to parse date: {date_str}")
-                return None
-            print(f"Parsed date successfully: {parsed_date}")
-            return parsed_date
-        except Exception as e:
-            print(f"Failed to parse date: {date_str} with error {e}")
+        parsed_date = DATE_PARSER.parse(date_str)
+        if parsed_date is None:
+            logger.debug("Failed to parse date: %s", date_str)
             return None
+        logger.debug("Parsed date successfully: %s", parsed_date)
+        return parsed_date
 
     @property
     def year(self):
@@ -0,0 +1,79 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the chart drawing file for the final project.
+"""
+
+MAX_TICK_LABELS = 24  # Longer series label every n-th point only
+
+
+def draw_grouped_bar_chart(ax, data, title="Grouped Bar Chart"):
+    """
+    Purpose:
+        Draws the grouped bar chart on a matplotlib axes. Used by the Tk view
+        and by the headless report renderer.
+    Parameters:
+        ax (Axes): The axes to draw on; it is cleared first.
+        data (dict): A dictionary with category names as keys and counts as values.
+        title (str): The chart title.
+    Returns:
+        dict: The artists, for updating the chart in place: 'categories' and
+              'bars'.
+    """
+    categories = list(data.keys())
+    values = list(data.values())
+    ax.clear()
+    bars = ax.bar(categories, values)
+    ax.set_title(title)
+    ax.set_xlabel("Category")
+    ax.set_ylabel("Count (Permits/Licenses)")
+    set_count_limit(ax, values)
+    return {"categories": categories, "bars": bars}
+
+
+def draw_line_chart(ax, data, title="Line Chart"):
+    """
+    Purpose:
+        Draws the line chart on a matplotlib axes. Used by the Tk view and by
+        the headless report renderer.
+    Parameters:
+        ax (Axes): The axes to draw on; it is cleared first.
+        data (list): A list of dictionaries containing period, permits, and licenses counts.
+        title (str): The chart title.
+    Returns:
+        dict: The artists, for updating the chart in place: 'periods',
+              'permits' and 'licenses'.
+    """
+    periods = [entry["period"] for entry in data]
+    permits = [entry["permits"] for entry in data]
+    licenses = [entry["licenses"] for entry in data]
+    marker = "o" if len(periods) <= MAX_TICK_LABELS * 2 else None
+
+    ax.clear()
+    (permit_line,) = ax.plot(periods, permits, label="Building Permits", marker=marker)
+    (license_line,) = ax.plot(periods, licenses, label="Business Licenses", marker=marker)
+    ax.set_title(title)
+    ax.set_xlabel("Time")
+    ax.set_ylabel("Count (Permits/Licenses)")
+    ax.legend()
+
+    # Label at most MAX_TICK_LABELS periods, rotated for readability
+    step = max(1, -(-len(periods) // MAX_TICK_LABELS))
+    ax.set_xticks(range(0, len(periods), step))
+    ax.set_xticklabels(periods[::step], rotation=45, ha="right")
+    set_count_limit(ax, permits + licenses)
+    return {"periods": periods, "permits": permit_line, "licenses": license_line}
+
+
+def set_count_limit(ax, values):
+    """
+    Purpose:
+        Scales the count axis to the largest value plus a margin.
+    Parameters:
+        ax (Axes): The axes to scale.
+        values (list): The counts shown.
+    Returns:
+        Nothing
+    """
+    ax.set_ylim(0, max(values + [0]) * 1.1 or 1)
@@ -0,0 +1,124 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the memory-mapped column file for the final project.
+"""
+
+import json  # For the file header
+import os  # For atomic file replacement
+import struct  # For the fixed-size header prefix
+import numpy as np  # For writing and memory-mapping the columns
+from record_store import RecordStore  # The columns being stored
+
+MAGIC = b"DASHCOL1"  # Identifies the format and its version
+ALIGNMENT = 64  # Column data starts on cache-line boundaries
+PREFIX = struct.Struct("<8sQ")  # Magic and header length
+
+
+def _aligned(offset):
+    """
+    Purpose:
+        Rounds an offset up to the next multiple of ALIGNMENT.
+    Parameters:
+        offset (int): The byte offset.
+    Returns:
+        int: The aligned offset.
+    """
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def save_columns(path, store):
+    """
+    Purpose:
+        Writes a store's columns to a column file: a small JSON header with
+        the row count, area names and column offsets, followed by the raw
+        int32 day and area code columns. The file is written next to its
+        destination and moved into place, so readers that have the old file
+        mapped keep a consistent copy.
+    Parameters:
+        path (str): The column file to write.
+        store (RecordStore): The columns to write.
+    Returns:
+        int: The size of the file in bytes.
+    """
+    days = np.ascontiguousarray(store.days, dtype="<i4")
+    codes = np.ascontiguousarray(store.codes, dtype="<i4")
+    rows = len(days)
+    header = {"rows": rows, "area_names": list(store.area_names)}
+    # The offsets depend on the header length, which depends on the offsets;
+    # reserve enough digits by encoding with the largest plausible values first
+    header["days_offset"] = header["codes_offset"] = 10 ** 15
+    reserved = len(json.dumps(header).encode("utf-8"))
+    header["days_offset"] = _aligned(PREFIX.size + reserved)
+    header["codes_offset"] = _aligned(header["days_offset"] + rows * 4)
+    encoded = json.dumps(header).encode("utf-8").ljust(reserved)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as column_file:
+        column_file.write(PREFIX.pack(MAGIC, len(encoded)))
+        column_file.write(encoded)
+        column_file.seek(header["days_offset"])
+        column_file.write(days.tobytes())
+        column_file.seek(header["codes_offset"])
+        column_file.write(codes.tobytes())
+        size = header["codes_offset"] + rows * 4
+        column_file.truncate(size)  # Seeking alone does not extend the file
+    os.replace(temp_path, path)
+    return size
+
+
+def read_header(path):
+    """
+    Purpose:
+        Reads the header of a column file.
+    Parameters:
+        path (str): The column file.
+    Returns:
+        dict: 'rows', 'area_names', 'days_offset' and 'codes_offset'.
+    Raises:
+        ValueError: If the file is not a column file or is truncated.
+    """
+    with open(path, "rb") as column_file:
+        prefix = column_file.read(PREFIX.size)
+        if len(prefix) != PREFIX.size:
+            raise ValueError(f"Truncated column file: {path}")
+        magic, length = PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"Not a column file: {path}")
+        header = json.loads(column_file.read(length).decode("utf-8"))
+        size = os.fstat(column_file.fileno()).st_size
+    if size < header["codes_offset"] + header["rows"] * 4:
+        raise ValueError(f"Truncated column file: {path}")
+    return header
+
+
+def open_columns(path, record_type):
+    """
+    Purpose:
+        Opens a column file as a RecordStore whose columns are read-only
+        memory maps. Nothing is parsed or copied: pages are read on first
+        use and shared with every other process mapping the same file.
+    Parameters:
+        path (str): The column file.
+        record_type (type): The record class the store materializes.
+    Returns:
+        RecordStore: The store backed by the file.
+    Raises:
+        ValueError: If the file is not a column file or is truncated.
+    """
+    header = read_header(path)
+    rows = header["rows"]
+    if rows == 0:
+        days = np.empty(0, dtype=np.int32)
+        codes = np.empty(0, dtype=np.int32)
+    else:
+        days = np.memmap(path, dtype="<i4", mode="r",
+                         offset=header["days_offset"], shape=(rows,))
+        codes = np.memmap(path, dtype="<i4", mode="r",
+                          offset=header["codes_offset"], shape=(rows,))
+    store = RecordStore(record_type)
+    for name in header["area_names"]:
+        store.area_code(name)
+    store._set_columns(days, codes)
+    return store
@@ -0,0 +1,268 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the on-disk dataset cache file for the final project.
+"""
+
+import hashlib  # For turning URLs into file names
+import json  # For the cache entry metadata
+import logging  # For reporting cache activity
+import os  # For paths and atomic file replacement
+import threading  # For serializing writes from concurrent loaders
+import time  # For TTL and least-recently-used bookkeeping
+from column_file import open_columns, save_columns  # Memory-mapped columns
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "vancouver-dashboard")
+DEFAULT_TTL = 24 * 60 * 60  # Seconds before a cached export is revalidated
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # Total size of all cached entries
+
+
+class DataCache:
+    """
+    Purpose:
+        Stores parsed, filtered dataset columns on disk as memory-mapped
+        column files, together with the HTTP validators (ETag/Last-Modified)
+        needed to revalidate them with a conditional GET.
+    Attributes:
+        cache_dir (str): The directory holding the cache entries.
+        ttl (float): Seconds an entry is used without revalidation.
+        max_bytes (int): The total size the cache is trimmed to.
+    """
+
+    def __init__(self, cache_dir=None, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Purpose:
+            Initializes the cache and creates its directory.
+        Parameters:
+            cache_dir (str): The cache directory, or None to use
+                             $DASHBOARD_CACHE_DIR or ~/.cache.
+            ttl (float): Seconds an entry is used without revalidation.
+            max_bytes (int): The total size the cache is trimmed to.
+        Returns:
+            Nothing
+        """
+        if cache_dir is None:
+            cache_dir = os.environ.get("DASHBOARD_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def entry_key(url, year):
+        """
+        Purpose:
+            Builds the file name stem for an export URL and year filter.
+        Parameters:
+            url (str): The export URL.
+            year (int): The year filter applied, or None.
+        Returns:
+            str: A short hexadecimal key.
+        """
+        return hashlib.sha256(f"{url}|{year}".encode("utf-8")).hexdigest()[:24]
+
+    def _paths(self, key):
+        """
+        Purpose:
+            Returns the metadata and data file paths of an entry.
+        Parameters:
+            key (str): The entry key.
+        Returns:
+            tuple: (meta_path, data_path).
+        """
+        base = os.path.join(self.cache_dir, key)
+        return base + ".json", base + ".cols"
+
+    def spool_path(self, url):
+        """
+        Purpose:
+            Returns where a download of the export keeps its compressed body
+            until it completes, so an interrupted download can be resumed.
+        Parameters:
+            url (str): The export URL.
+        Returns:
+            str: The spool file path.
+        """
+        return os.path.join(self.cache_dir, self.entry_key(url, None) + ".part")
+
+    def lookup(self, url, year):
+        """
+        Purpose:
+            Reads the metadata of a cached export.
+        Parameters:
+            url (str): The export URL.
+            year (int): The year filter applied, or None.
+        Returns:
+            dict or None: The entry metadata, or None if nothing usable is
+                          cached.
+        """
+        meta_path, data_path = self._paths(self.entry_key(url, year))
+        if not os.path.exists(data_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, meta):
+        """
+        Purpose:
+            Checks whether an entry is young enough to skip revalidation.
+        Parameters:
+            meta (dict): The entry metadata.
+        Returns:
+            bool: True if the entry is within its TTL.
+        """
+        return time.time() - meta.get("fetched_at", 0) < self.ttl
+
+    @staticmethod
+    def conditional_headers(meta):
+        """
+        Purpose:
+            Builds the request headers for a conditional GET.
+        Parameters:
+            meta (dict): The entry metadata, or None.
+        Returns:
+            dict: If-None-Match/If-Modified-Since headers, possibly empty.
+        """
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def load(self, url, year, record_type):
+        """
+        Purpose:
+            Opens a cached export as a RecordStore backed by a memory map, so
+            nothing is parsed or copied and processes share the pages.
+        Parameters:
+            url (str): The export URL.
+            year (int): The year filter applied, or None.
+            record_type (type): The record class of the dataset.
+        Returns:
+            RecordStore or None: The cached store, or None if the entry is
+                                 missing or unreadable.
+        """
+        key = self.entry_key(url, year)
+        meta_path, data_path = self._paths(key)
+        try:
+            store = open_columns(data_path, record_type)
+            os.utime(meta_path)  # Mark as recently used for eviction
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning("Ignoring unreadable cache entry %s: %s", key, e)
+            return None
+        return store
+
+    def save(self, url, year, store, etag=None, last_modified=None):
+        """
+        Purpose:
+            Writes a parsed export and its validators to the cache, then trims
+            the cache to its size limit.
+        Parameters:
+            url (str): The export URL.
+            year (int): The year filter applied, or None.
+            store (RecordStore): The parsed columns.
+            etag (str): The ETag response header, if any.
+            last_modified (str): The Last-Modified response header, if any.
+        Returns:
+            Nothing
+        """
+        key = self.entry_key(url, year)
+        meta_path, data_path = self._paths(key)
+        meta = {
+            "url": url,
+            "year": year,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+            "rows": len(store),
+        }
+        with self._lock:
+            # Write to temporary files first so readers never see half an entry
+            # Processes with the old file mapped keep reading the old copy
+            save_columns(data_path, store)
+            with open(meta_path + ".tmp", "w", encoding="utf-8") as meta_file:
+                json.dump(meta, meta_file)
+            os.replace(meta_path + ".tmp", meta_path)
+            self._enforce_size_limit(keep=key)
+
+    def touch(self, url, year):
+        """
+        Purpose:
+            Restarts the TTL of an entry after the server confirmed it is
+            unchanged.
+        Parameters:
+            url (str): The export URL.
+            year (int): The year filter applied, or None.
+        Returns:
+            Nothing
+        """
+        meta = self.lookup(url, year)
+        if meta is None:
+            return
+        meta["fetched_at"] = time.time()
+        meta_path, _ = self._paths(self.entry_key(url, year))
+        with self._lock:
+            with open(meta_path + ".tmp", "w", encoding="utf-8") as meta_file:
+                json.dump(meta, meta_file)
+            os.replace(meta_path + ".tmp", meta_path)
+
+    def _enforce_size_limit(self, keep=None):
+        """
+        Purpose:
+            Deletes the least recently used entries until the cache fits in
+            max_bytes. The entry just written is never evicted.
+        Parameters:
+            keep (str): The key of an entry to keep regardless of size.
+        Returns:
+            Nothing
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[: -len(".json")]
+            meta_path, data_path = self._paths(key)
+            try:
+                size = os.path.getsize(meta_path) + os.path.getsize(data_path)
+                used_at = os.path.getmtime(meta_path)
+            except OSError:
+                continue
+            entries.append((used_at, key, size))
+            total += size
+
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            logger.info("Evicted cache entry %s (%d bytes).", key, size)
+
+    def clear(self):
+        """
+        Purpose:
+            Deletes every cache entry.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith((".json", ".cols", ".tmp", ".part")):
+                    os.remove(os.path.join(self.cache_dir, name))
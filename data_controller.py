@@ -5,7 +5,12 @@ Final Project
 This is the controller file for the final project.
 """
 
+from concurrent.futures import ThreadPoolExecutor  # For off-GUI data prep
+from functools import partial  # For binding the time window to a query
+from instrumentation import RECORDER, instrument, untimed  # Latency histograms
 
+
+@instrument
 class DataController:
     """
     Purpose:
@@ -16,36 +21,86 @@ class DataController:
         view (DataView): The GUI view.
     """
 
-    def __init__(self, model, view):
+    def __init__(self, model, view, refresh=None):
         """
         Purpose:
             Initializes the controller with the model and view.
         Parameters:
             model (DataModel): The data model.
             view (DataView): The GUI view.
+            refresh (callable): Fetches newly issued records into the model and
+                                returns (permits_added, licenses_added), or
+                                None if refreshing is not available.
         Returns:
             Nothing
         """
         self.model = model
         self.view = view
+        # Chart data is prepared on this thread so the Tk loop never blocks
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="chart-data"
+        )
+        self._latest_request = 0  # Only the newest click gets rendered
+        self._last_chart = None  # (prepare, render, neighborhood) last shown
+        # Refreshes download data, so they get their own thread to keep chart
+        # clicks responsive meanwhile
+        self._refresh = refresh
+        self._refresh_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="refresh"
+        )
+        self._refreshing = False
 
         # Set up button actions
         self.view.bar_chart_button.configure(command=self.show_grouped_bar_chart)
         self.view.line_chart_button.configure(command=self.show_line_chart)
+        self.view.timings_button.configure(command=self.show_timings)
+        if refresh is not None:
+            self.view.refresh_button.configure(command=self.refresh_data)
 
     def normalize_neighborhood(self, neighborhood):
         """
         Purpose:
-            Normalizes user input for neighborhood names.
+            Resolves user input to a canonical neighborhood name through the
+            model's neighborhood index, so casing, punctuation, unique
+            prefixes and small typos still find the right area.
         Parameters:
             neighborhood (str): The raw user input.
         Returns:
-            str or None: The normalized name or None if "all".
+            str or None: The canonical name or None if "all" (or empty).
+        Raises:
+            ValueError: If the input matches no loaded neighborhood, or more
+                        than one.
         """
-        neighborhood = neighborhood.strip().title()
-        if neighborhood.lower() == "all":
+        neighborhood = neighborhood.strip()
+        if neighborhood.lower() in ("all", ""):
             return None
-        return neighborhood
+        index = self.model.neighborhood_index()
+        if len(index) == 0:
+            return neighborhood.title()  # Nothing loaded yet to check against
+        resolved = index.resolve(neighborhood)
+        if resolved is None:
+            message = f"Unknown neighborhood: {neighborhood}."
+            suggestions = index.suggest(neighborhood)
+            if suggestions:
+                message += f" Did you mean {', '.join(suggestions)}?"
+            raise ValueError(message)
+        return resolved
+
+    def time_window(self):
+        """
+        Purpose:
+            Reads the charted time window and granularity from the view.
+            An empty date leaves that end of the window open.
+        Parameters:
+            Nothing
+        Returns:
+            dict: 'start', 'end' and 'granularity' for the model queries.
+        """
+        return {
+            "start": self.view.start_var.get().strip(),
+            "end": self.view.end_var.get().strip(),
+            "granularity": self.view.granularity_var.get().strip() or None,
+        }
 
     def show_grouped_bar_chart(self):
         """
@@ -54,11 +109,21 @@ class DataController:
         Parameters:
             Nothing
         Returns:
-            Nothing
+            Future or None: The pending data preparation, or None if the
+                            neighborhood was rejected.
         """
-        neighborhood = self.normalize_neighborhood(self.view.neighborhood_var.get())
-        data = self.model.prepare_grouped_bar_data(neighborhood)
-        self.view.render_grouped_bar_chart(data)
+        try:
+            neighborhood = self.normalize_neighborhood(self.view.neighborhood_var.get())
+        except ValueError as error:
+            self.view.show_error(str(error))  # Rejected before any data work
+            return None
+        window = self.time_window()
+        del window["granularity"]  # Totals do not depend on the bucket size
+        return self.request_chart(
+            partial(self.model.prepare_grouped_bar_data, **window),
+            self.view.render_grouped_bar_chart,
+            neighborhood,
+        )
 
     def show_line_chart(self):
         """
@@ -66,13 +131,138 @@ class DataController:
             Prepares data and delegates rendering of the line chart to the view.
         Parameters:
             Nothing
+        Returns:
+            Future or None: The pending data preparation, or None if the
+                            neighborhood was rejected.
+        """
+        try:
+            neighborhood = self.normalize_neighborhood(self.view.neighborhood_var.get())
+        except ValueError as error:
+            self.view.show_error(str(error))  # Rejected before any data work
+            return None
+        return self.request_chart(
+            partial(self.model.prepare_line_chart_data, **self.time_window()),
+            self.view.render_line_chart,
+            neighborhood,
+        )
+
+    def request_chart(self, prepare, render, neighborhood):
+        """
+        Purpose:
+            Prepares chart data on the worker thread and hands the result to
+            the view on the Tk thread. Results of requests superseded by a
+            newer click are discarded.
+        Parameters:
+            prepare (callable): The model method preparing the data.
+            render (callable): The view method rendering the data.
+            neighborhood (str): The normalized neighborhood, or None for all.
+        Returns:
+            Future: The pending data preparation.
+        """
+        self._latest_request += 1
+        request_id = self._latest_request
+        self._last_chart = (prepare, render, neighborhood)
+        future = self._executor.submit(prepare, neighborhood)
+        future.add_done_callback(
+            lambda done: self.view.post(self._deliver_chart, request_id, done, render)
+        )
+        return future
+
+    def _deliver_chart(self, request_id, future, render):
+        """
+        Purpose:
+            Renders prepared chart data if it belongs to the latest request.
+            Runs on the Tk thread.
+        Parameters:
+            request_id (int): The request the data was prepared for.
+            future (Future): The finished data preparation.
+            render (callable): The view method rendering the data.
+        Returns:
+            Nothing
+        """
+        if request_id != self._latest_request:
+            return
+        error = future.exception()
+        if error is not None:
+            self.view.show_error(f"Could not prepare chart data: {error}")
+            return
+        render(future.result())
+
+    def refresh_data(self):
+        """
+        Purpose:
+            Fetches newly issued records on the refresh thread, then redraws
+            the chart last shown. Ignored while a refresh is running.
+        Parameters:
+            Nothing
+        Returns:
+            Future or None: The pending refresh, or None if one is running.
+        """
+        if self._refresh is None or self._refreshing:
+            return None
+        self._refreshing = True
+        self.view.refresh_started()
+        future = self._refresh_executor.submit(self._refresh)
+        future.add_done_callback(
+            lambda done: self.view.post(self._refresh_done, done)
+        )
+        return future
+
+    def _refresh_done(self, future):
+        """
+        Purpose:
+            Reports a finished refresh and redraws the current chart with the
+            new data. Runs on the Tk thread.
+        Parameters:
+            future (Future): The finished refresh.
         Returns:
             Nothing
         """
-        neighborhood = self.normalize_neighborhood(self.view.neighborhood_var.get())
-        data = self.model.prepare_line_chart_data(neighborhood)
-        self.view.render_line_chart(data)
+        self._refreshing = False
+        error = future.exception()
+        if error is not None:
+            self.view.refresh_finished(None, None)
+            self.view.show_error(f"Could not refresh data: {error}")
+            return
+        self.view.refresh_finished(*future.result())
+        if self._last_chart is not None:
+            self.request_chart(*self._last_chart)
+
+    def show_timings(self):
+        """
+        Purpose:
+            Shows the per-stage latency histograms of the model, controller
+            and view recorded so far, and the model's query cache counters.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        stats = self.model.query_cache_stats()
+        self.view.show_timings(
+            RECORDER.format_table()
+            + f"\n\nQuery cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['evictions']} evictions, {stats['size']}/{stats['max_entries']} "
+            f"entries ({stats['hit_rate']:.0%} hit rate)"
+        )
+
+    def schedule_refresh(self, interval_ms):
+        """
+        Purpose:
+            Refreshes the data every interval_ms milliseconds using the Tk
+            timer.
+        Parameters:
+            interval_ms (int): The time between refreshes.
+        Returns:
+            Nothing
+        """
+        def tick():
+            self.refresh_data()
+            self.view.root.after(interval_ms, tick)
+
+        self.view.root.after(interval_ms, tick)
 
+    @untimed
     def run(self):
         """
         Purpose:
@@ -82,4 +272,8 @@ class DataController:
         Returns:
             Nothing
         """
-        self.view.start()
+        try:
+            self.view.start()
+        finally:
+            self._executor.shutdown(wait=False)
+            self._refresh_executor.shutdown(wait=False)
@@ -5,64 +5,179 @@ Final Project
 This is the dashboard driver file for the final project.
 """
 
-from data_model import DataModel
+import argparse  # For command line options
+import logging  # For leveled log output
+import threading  # For loading data without blocking the GUI
+from data_cache import DataCache
+from data_model import DataModel, LICENSES_URL, PERMITS_URL
+from date_parser import DATE_PARSER
+from instrumentation import Profiler, RECORDER, add_profiling_options
+from log_config import configure_logging
 from data_controller import DataController
-from data_view import DataView
 
+logger = logging.getLogger(__name__)
 
-def main():
+
+def parse_args(argv=None):
+    """
+    Purpose:
+        Parses the command line options of the dashboard.
+
+    Parameters:
+        argv (list): The arguments to parse, or None to use sys.argv.
+
+    Returns:
+        Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(description="Vancouver permits and licenses dashboard")
+    parser.add_argument(
+        "--refresh", action="store_true",
+        help="download both exports even if the cached copies are current",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="do not read or write the on-disk cache",
+    )
+    parser.add_argument(
+        "--cache-dir", default=None,
+        help="cache directory (default: $DASHBOARD_CACHE_DIR or ~/.cache)",
+    )
+    parser.add_argument(
+        "--refresh-every", type=float, default=0, metavar="MINUTES",
+        help="fetch newly issued records every MINUTES (default: off)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="processes parsing each export; above 1 the exports are spooled "
+             "to disk and parsed in parallel (default: 1)",
+    )
+    parser.add_argument(
+        "--log-level", default=None,
+        help="DEBUG, INFO, WARNING or ERROR (default: $DASHBOARD_LOG_LEVEL or INFO)",
+    )
+    add_profiling_options(parser)
+    args = parser.parse_args(argv)
+    try:
+        args.profiler = Profiler.from_options(args, "dashboard")
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def load_failure_message(permits_loaded, licenses_loaded):
     """
     Purpose:
-        Entry point for the program. Sets up the model, view, and controller.
+        Describes which datasets failed to load.
+
+    Parameters:
+        permits_loaded (bool): Whether the permits export loaded.
+        licenses_loaded (bool): Whether the licenses export loaded.
+
+    Returns:
+        str or None: The error message, or None if both loaded.
+    """
+    if not permits_loaded and not licenses_loaded:
+        return "Failed to load permits and licenses data."
+    elif not permits_loaded:
+        return "Failed to load permits data."
+    elif not licenses_loaded:
+        return "Failed to load licenses data."
+    return None
+
+
+def start_background_load(data_model, data_view, force_refresh=False,
+                          on_finished=None):
+    """
+    Purpose:
+        Loads both datasets on a worker thread while the window is already
+        open. Progress and results are posted to the view, which applies them
+        on the Tk thread.
+
+    Parameters:
+        data_model (DataModel): The model to load.
+        data_view (DataView): The view receiving progress updates.
+        force_refresh (bool): Download even if valid cached copies exist.
+        on_finished (callable): Called with no arguments on the Tk thread once
+                                both datasets have finished loading, or None.
+
+    Returns:
+        Thread: The started worker thread.
+    """
+    def on_progress(dataset, bytes_read, rows_parsed):
+        data_view.post(data_view.show_progress, dataset, bytes_read, rows_parsed)
+
+    def on_loaded(dataset, loaded):
+        data_view.post(data_view.dataset_loaded, dataset, loaded)
+
+    def load():
+        logger.info("Loading data...")
+        # Both exports are streamed concurrently; every year is kept so the
+        # charts can show any time window without loading again
+        permits_loaded, licenses_loaded = data_model.load_datasets(
+            PERMITS_URL, LICENSES_URL, year=None, force_refresh=force_refresh,
+            progress=on_progress, on_loaded=on_loaded,
+        )
+        message = load_failure_message(permits_loaded, licenses_loaded)
+        if message:
+            logger.error(message)
+            data_view.post(data_view.show_error, message)
+        logger.info("Date parsing stats: %s", DATE_PARSER.stats())
+        if on_finished is not None:
+            data_view.post(on_finished)
+
+    thread = threading.Thread(target=load, name="data-loader", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    """
+    Purpose:
+        Entry point for the program. Sets up the model, view, and controller,
+        then loads the data in the background.
     
     Parameters:
-        Nothing
+        argv (list): The command line arguments, or None to use sys.argv.
 
     Returns:
         Nothing
     """
+    args = parse_args(argv)
+    configure_logging(args.log_level)
+
     # Initialize the Model
-    data_model = DataModel()
-
-    # Load data into the model
-    print("Loading data...")
-    permits_url = (
-        "https://opendata.vancouver.ca/api/explore/v2.1/catalog/datasets/"
-        "issued-building-permits/exports/csv?lang=en&timezone=America%2FLos_"
-        "Angeles&use_labels=true&delimiter=%3B"
-    )
-    licenses_url = (
-        "https://opendata.vancouver.ca/api/explore/v2.1/catalog/datasets/"
-        "business-licences/exports/csv?lang=en&timezone=America%2FLos_"
-        "Angeles&use_labels=true&delimiter=%3B"
-    )
+    cache = None if args.no_cache else DataCache(args.cache_dir)
+    data_model = DataModel(cache, workers=args.workers)
 
-    # Download and parse data
-    permits_data = data_model.download_data(permits_url)
-    licenses_data = data_model.download_data(licenses_url)
-
-    if not permits_data and not licenses_data:
-        print("Failed to load permits and licenses data.")
-        return
-    elif not permits_data:
-        print("Failed to load permits data.")
-        return
-    elif not licenses_data:
-        print("Failed to load licenses data.")
-        return
-
-    data_model.parse_permit_data(permits_data)
-    data_model.parse_license_data(licenses_data)
-    data_model.filter_data_2024()
-
-    # Initialize the View
+    # Initialize the View; it opens right away with the chart buttons disabled.
+    # Tk and matplotlib are only imported here, once the options are valid.
+    from data_view import DataView
     data_view = DataView()
 
-    # Initialize the Controller
-    data_controller = DataController(data_model, data_view)
+    # Initialize the Controller; its refresh fetches only new records
+    data_controller = DataController(
+        data_model, data_view,
+        refresh=lambda: data_model.refresh_datasets(
+            PERMITS_URL, LICENSES_URL, year=None
+        ),
+    )
+
+    # Load data into the model without blocking the GUI, then start the
+    # refresh timer if one was requested
+    on_finished = None
+    if args.refresh_every > 0:
+        interval_ms = int(args.refresh_every * 60 * 1000)
+        on_finished = lambda: data_controller.schedule_refresh(interval_ms)
+    start_background_load(data_model, data_view, args.refresh, on_finished)
 
-    # Start the application
-    data_controller.run()
+    # Start the application, capturing a profile if one was requested
+    args.profiler.start()
+    try:
+        data_controller.run()
+    finally:
+        args.profiler.stop()
+        if args.timings_json:
+            RECORDER.dump_json(args.timings_json)
 
 
 if __name__ == "__main__":
@@ -5,129 +5,1213 @@ Final Project
 This is the model file for the final project.
 """
 
-import requests  # For downloading data from the web
-import pandas as pd  # For data manipulation and parsing
+import io  # For the progress-reporting stream wrapper
+import logging  # For leveled log output
+import os  # For spooling exports to a temporary file
+import tempfile  # For the spool directory of parallel parsing
+import threading  # For creating the HTTP client once
+from urllib.parse import urlencode  # For the delta refresh query string
+import numpy as np  # For formatting day ordinals in API filters
+from concurrent.futures import ThreadPoolExecutor  # For concurrent downloads
 from io import StringIO  # For treating strings as file-like objects
 from building_permits import BuildingPermit  # Import BuildingPermit class
 from business_licenses import BusinessLicense  # Import BusinessLicense class
+from dataset_schema import SCHEMAS  # Columns and dtypes read per dataset
+from record_store import (  # Columnar storage and time bucketing
+    MEASURES,
+    RecordStore,
+    bucket_label,
+    bucket_span,
+    parse_day,
+    year_day_range,
+)
+from neighborhood_index import NeighborhoodIndex  # Canonical area lookup
+from column_file import open_columns, save_columns  # Memory-mapped columns
+from arrow_export import export_datasets, import_dataset  # Parquet/Arrow files
+from log_config import PhaseCounter  # Per-phase summary lines
+from instrumentation import instrument  # Per-method latency histograms
+from query_cache import QueryCache  # Chart results by query and data version
 
+CHUNK_SIZE = 50000  # Rows parsed per chunk when streaming an export
+DEFAULT_YEAR = 2024  # The time window charted until another is chosen
+DOWNLOAD_TIMEOUT = 60  # Seconds to wait for the server between reads
+SPOOL_BLOCK = 1 << 20  # Bytes copied at a time when spooling an export
+QUERY_CACHE_SIZE = 256  # Chart results kept by each model
 
+logger = logging.getLogger(__name__)
+
+PERMITS_URL = (
+    "https://opendata.vancouver.ca/api/explore/v2.1/catalog/datasets/"
+    "issued-building-permits/exports/csv?lang=en&timezone=America%2FLos_"
+    "Angeles&use_labels=true&delimiter=%3B"
+)
+LICENSES_URL = (
+    "https://opendata.vancouver.ca/api/explore/v2.1/catalog/datasets/"
+    "business-licences/exports/csv?lang=en&timezone=America%2FLos_"
+    "Angeles&use_labels=true&delimiter=%3B"
+)
+
+
+def delta_url(url, dataset, since_day):
+    """
+    Purpose:
+        Builds the export URL restricted to records issued on or after a day,
+        using the Open Data API's where and order_by filters.
+    Parameters:
+        url (str): The URL of the full CSV export.
+        dataset (str): 'permits' or 'licenses'.
+        since_day (int): The first day to fetch, in days since 1970-01-01.
+    Returns:
+        str: The filtered export URL.
+    """
+    field = SCHEMAS[dataset].api_date_field
+    since = np.datetime64(since_day, "D")
+    query = urlencode({"where": f"{field} >= date'{since}'", "order_by": field})
+    return f"{url}{'&' if '?' in url else '?'}{query}"
+
+
+def _series(labels, permits, licenses):
+    """
+    Purpose:
+        Combines bucket labels and counts into line chart entries.
+    Parameters:
+        labels (list): The label of each bucket.
+        permits (ndarray): The permit count of each bucket.
+        licenses (ndarray): The license count of each bucket.
+    Returns:
+        list: One dictionary per bucket with 'period', 'permits' and
+        'licenses'.
+    """
+    return [
+        {"period": label, "permits": int(permit_count), "licenses": int(license_count)}
+        for label, permit_count, license_count
+        in zip(labels, np.asarray(permits).tolist(), np.asarray(licenses).tolist())
+    ]
+
+
+class ProgressReader(io.RawIOBase):
+    """
+    Purpose:
+        Wraps a binary stream so the number of bytes read can be reported
+        while a CSV reader consumes it.
+    Attributes:
+        bytes_read (int): The number of bytes read so far.
+    """
+
+    def __init__(self, raw):
+        """
+        Purpose:
+            Wraps the given stream.
+        Parameters:
+            raw (file): A binary file-like object.
+        Returns:
+            Nothing
+        """
+        super().__init__()
+        self._raw = raw
+        self.bytes_read = 0
+
+    def readable(self):
+        """
+        Purpose:
+            Reports that the stream can be read.
+        Parameters:
+            Nothing
+        Returns:
+            bool: True
+        """
+        return True
+
+    def readinto(self, buffer):
+        """
+        Purpose:
+            Reads into a buffer and counts the bytes.
+        Parameters:
+            buffer (bytearray): The buffer to fill.
+        Returns:
+            int: The number of bytes read, 0 at the end of the stream.
+        """
+        data = self._raw.read(len(buffer))
+        size = len(data)
+        buffer[:size] = data
+        self.bytes_read += size
+        return size
+
+
+@instrument
 class DataModel:
     """
     Purpose:
         Handles data downloading, cleaning, parsing, and analysis.
     Attributes:
-        permits (list): A list to store BuildingPermit objects.
-        licenses (list): A list to store BusinessLicense objects.
+        permits (list): The BuildingPermit objects, materialized on demand.
+        licenses (list): The BusinessLicense objects, materialized on demand.
+        cache (DataCache): The on-disk cache of parsed exports, or None.
+        workers (int): Processes used to parse an export; 1 parses while
+                       streaming, more spool the export to disk and parse
+                       byte ranges in parallel.
+        window (tuple): (first day, day after the last) charted by default,
+                        either end None for the extent of the data.
+        granularity (str): The default bucket size of the line chart.
+        query_cache (QueryCache): Chart results by query and data version.
+        http (HttpClient): The pooled client every download goes through,
+                           created by the first download.
     """
 
-    def __init__(self):
+    def __init__(self, cache=None, workers=1):
         """
         Purpose:
-            Initializes the DataModel with empty lists for permits & licenses.
+            Initializes the DataModel with empty stores for permits & licenses.
         Parameters:
-            None
+            cache (DataCache): An on-disk cache for loaded exports, or None to
+                               always download.
+            workers (int): The number of processes parsing each export.
         Returns:
             Nothing
         """
-        self.permits = []  # List to store BuildingPermit objects
-        self.licenses = []  # List to store BusinessLicense objects
-        print("Initialized DataModel with empty permits and licenses lists.")
+        self.cache = cache
+        self.workers = workers
+        self.window = year_day_range(DEFAULT_YEAR)
+        self.granularity = "month"
+        self._permit_store = RecordStore(BuildingPermit)
+        self._license_store = RecordStore(BusinessLicense)
+        self._index = None  # NeighborhoodIndex of the currently loaded data
+        self._index_key = None  # The data version it was built from
+        self.query_cache = QueryCache(QUERY_CACHE_SIZE)
+        self._cached_version = None  # The data version query_cache holds
+        self.http = None
+        self._http_lock = threading.Lock()  # Guards creating self.http
+        logger.debug("Initialized DataModel with empty permits and licenses stores.")
+
+    @property
+    def permits(self):
+        """
+        Purpose:
+            Returns the parsed permits as BuildingPermit objects. The objects
+            are only built the first time they are requested.
+        Parameters:
+            Nothing
+        Returns:
+            list: A list of BuildingPermit objects.
+        """
+        return self._permit_store.records()
+
+    @property
+    def licenses(self):
+        """
+        Purpose:
+            Returns the parsed licenses as BusinessLicense objects. The objects
+            are only built the first time they are requested.
+        Parameters:
+            Nothing
+        Returns:
+            list: A list of BusinessLicense objects.
+        """
+        return self._license_store.records()
+
+    def data_version(self):
+        """
+        Purpose:
+            Identifies the data currently held; it changes whenever either
+            dataset is loaded, refreshed or modified, so it can key caches of
+            query results.
+        Parameters:
+            Nothing
+        Returns:
+            tuple: The data generations of both stores. Generations are
+                   unique across all stores of the process, so a new store
+                   never repeats the version of a freed one.
+        """
+        return (self._permit_store.version, self._license_store.version)
+
+    def neighborhood_index(self):
+        """
+        Purpose:
+            Returns the index of canonical area names across both datasets,
+            rebuilt only after a dataset is loaded or changed.
+        Parameters:
+            Nothing
+        Returns:
+            NeighborhoodIndex: The index of the loaded area names.
+        """
+        permit_store, license_store = self._permit_store, self._license_store
+        key = (permit_store.version, license_store.version)  # As data_version()
+        if self._index is None or self._index_key != key:
+            self._index = NeighborhoodIndex(
+                permit_store.area_names + license_store.area_names
+            )
+            self._index_key = key
+            logger.debug("Indexed %d neighborhoods.", len(self._index))
+        return self._index
+
+    def resolve_neighborhood(self, text):
+        """
+        Purpose:
+            Resolves user input to a canonical neighborhood name of the loaded
+            data, tolerating case, punctuation, prefixes and small typos.
+        Parameters:
+            text (str): The user input.
+        Returns:
+            str or None: The canonical name, or None if nothing matches
+                         unambiguously.
+        """
+        return self.neighborhood_index().resolve(text)
+
+    def suggest_neighborhoods(self, text):
+        """
+        Purpose:
+            Lists loaded neighborhood names resembling the input.
+        Parameters:
+            text (str): The user input.
+        Returns:
+            list: Up to three canonical names.
+        """
+        return self.neighborhood_index().suggest(text)
+
+    def permits_in_area(self, neighborhood):
+        """
+        Purpose:
+            Returns the permits of one neighborhood via the per-area offsets,
+            without scanning or materializing the others.
+        Parameters:
+            neighborhood (str): The canonical neighborhood name.
+        Returns:
+            list: The BuildingPermit objects of that neighborhood.
+        """
+        return self._permit_store.records_in_area(neighborhood)
+
+    def licenses_in_area(self, neighborhood):
+        """
+        Purpose:
+            Returns the licenses of one neighborhood via the per-area offsets,
+            without scanning or materializing the others.
+        Parameters:
+            neighborhood (str): The canonical neighborhood name.
+        Returns:
+            list: The BusinessLicense objects of that neighborhood.
+        """
+        return self._license_store.records_in_area(neighborhood)
+
+    def _client(self):
+        """
+        Purpose:
+            Returns the HTTP client, creating it on the first download so
+            that importing the model or loading from the cache never imports
+            requests. The two loader threads share one client, and with it
+            the pooled connections.
+        Parameters:
+            Nothing
+        Returns:
+            HttpClient: The pooled client.
+        """
+        if self.http is None:
+            with self._http_lock:
+                if self.http is None:
+                    from http_client import HttpClient  # Pooled, retrying downloads
+                    self.http = HttpClient(timeout=DOWNLOAD_TIMEOUT)
+        return self.http
 
     def download_data(self, url):
         """
         Purpose:
-            Downloads data from the given URL.
+            Downloads data from the given URL into memory. Prefer
+            load_permit_data/load_license_data, which stream the export.
         Parameters:
             url (str): The URL to download data from.
         Returns:
             str or None: The content of the response decoded as 'utf-8',
             or None if an error occurs.
         """
-        print(f"Attempting to download data from URL: {url}")
+        logger.info("Attempting to download data from URL: %s", url)
+        http = self._client()
+        from requests.exceptions import RequestException  # Loaded with the client
         try:
-            response = requests.get(url)  # Send a GET request to the URL
+            response = http.get(url)  # Send a GET request to the URL
             response.raise_for_status()  # Raise an HTTPError if the response
             # was unsuccessful
-            print("Data downloaded successfully.")
+            logger.info("Data downloaded successfully.")
             return response.content.decode("utf-8")  # Decode response content
-        except requests.exceptions.RequestException as e:
-            print(f"Error downloading data: {e}")  # Print an error message
+        except RequestException as e:
+            logger.error("Error downloading data: %s", e)  # Log an error message
             return None  # Return None if an error occurs
 
+    def load_permit_data(self, url, year=2024, chunksize=CHUNK_SIZE,
+                         force_refresh=False, progress=None):
+        """
+        Purpose:
+            Streams the permits export from the given URL and parses it chunk
+            by chunk, replacing the permits held by the model. Only the date
+            and area columns are kept, so memory stays bounded by the chunk
+            size rather than the size of the export.
+        Parameters:
+            url (str): The URL of the permits CSV export.
+            year (int): Keep only permits issued in this year, or None for all.
+            chunksize (int): The number of rows parsed per chunk.
+            force_refresh (bool): Download even if a valid cached copy exists.
+            progress (callable): Called as progress(bytes_read, rows_parsed)
+                                 while loading, from the loading thread.
+        Returns:
+            bool: True if the export was loaded, False if an error occurred.
+        """
+        store = self._load_store(
+            "permits", url, year, chunksize, force_refresh, progress
+        )
+        if store is None:
+            return False
+        self._permit_store = store  # Swapped in whole, after it is complete
+        return True
+
+    def load_license_data(self, url, year=2024, chunksize=CHUNK_SIZE,
+                          force_refresh=False, progress=None):
+        """
+        Purpose:
+            Streams the licenses export from the given URL and parses it chunk
+            by chunk, replacing the licenses held by the model. Only the date
+            and area columns are kept, so memory stays bounded by the chunk
+            size rather than the size of the export.
+        Parameters:
+            url (str): The URL of the licenses CSV export.
+            year (int): Keep only licenses issued in this year, or None for all.
+            chunksize (int): The number of rows parsed per chunk.
+            force_refresh (bool): Download even if a valid cached copy exists.
+            progress (callable): Called as progress(bytes_read, rows_parsed)
+                                 while loading, from the loading thread.
+        Returns:
+            bool: True if the export was loaded, False if an error occurred.
+        """
+        store = self._load_store(
+            "licenses", url, year, chunksize, force_refresh, progress
+        )
+        if store is None:
+            return False
+        self._license_store = store  # Swapped in whole, after it is complete
+        return True
+
+    def load_datasets(self, permits_url, licenses_url, year=2024,
+                      chunksize=CHUNK_SIZE, force_refresh=False, progress=None,
+                      on_loaded=None):
+        """
+        Purpose:
+            Streams and parses the permits and licenses exports at the same
+            time, so loading takes about as long as the slower of the two.
+        Parameters:
+            permits_url (str): The URL of the permits CSV export.
+            licenses_url (str): The URL of the licenses CSV export.
+            year (int): Keep only records issued in this year, or None for all.
+            chunksize (int): The number of rows parsed per chunk.
+            force_refresh (bool): Download even if valid cached copies exist.
+            progress (callable): Called as progress(dataset, bytes_read,
+                                 rows_parsed) from the loading threads.
+            on_loaded (callable): Called as on_loaded(dataset, loaded) as soon
+                                  as each dataset finishes, from its thread.
+        Returns:
+            tuple: (permits_loaded, licenses_loaded) as booleans.
+        """
+        def run(dataset, load, url):
+            dataset_progress = None
+            if progress is not None:
+                def dataset_progress(bytes_read, rows_parsed):
+                    progress(dataset, bytes_read, rows_parsed)
+            loaded = load(url, year, chunksize, force_refresh, dataset_progress)
+            if on_loaded is not None:
+                on_loaded(dataset, loaded)
+            return loaded
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            permits_future = executor.submit(
+                run, "permits", self.load_permit_data, permits_url
+            )
+            licenses_future = executor.submit(
+                run, "licenses", self.load_license_data, licenses_url
+            )
+            return permits_future.result(), licenses_future.result()
+
+    def refresh_permit_data(self, url, year=2024, progress=None):
+        """
+        Purpose:
+            Fetches only the permits issued since the newest one held and
+            merges them into the permits store and its counts.
+        Parameters:
+            url (str): The URL of the full permits CSV export.
+            year (int): Keep only permits issued in this year, or None for all.
+            progress (callable): Called as progress(bytes_read, rows_parsed)
+                                 while loading, from the loading thread.
+        Returns:
+            int or None: The number of rows added, or None if an error
+                         occurred.
+        """
+        store, added = self._refresh_store(
+            "permits", self._permit_store, url, year, progress
+        )
+        if store is not None:
+            self._permit_store = store  # Swapped in whole, after it is merged
+        return added
+
+    def refresh_license_data(self, url, year=2024, progress=None):
+        """
+        Purpose:
+            Fetches only the licenses issued since the newest one held and
+            merges them into the licenses store and its counts.
+        Parameters:
+            url (str): The URL of the full licenses CSV export.
+            year (int): Keep only licenses issued in this year, or None for all.
+            progress (callable): Called as progress(bytes_read, rows_parsed)
+                                 while loading, from the loading thread.
+        Returns:
+            int or None: The number of rows added, or None if an error
+                         occurred.
+        """
+        store, added = self._refresh_store(
+            "licenses", self._license_store, url, year, progress
+        )
+        if store is not None:
+            self._license_store = store  # Swapped in whole, after it is merged
+        return added
+
+    def refresh_datasets(self, permits_url, licenses_url, year=2024,
+                         progress=None):
+        """
+        Purpose:
+            Refreshes the permits and licenses at the same time.
+        Parameters:
+            permits_url (str): The URL of the full permits CSV export.
+            licenses_url (str): The URL of the full licenses CSV export.
+            year (int): Keep only records issued in this year, or None for all.
+            progress (callable): Called as progress(dataset, bytes_read,
+                                 rows_parsed) from the loading threads.
+        Returns:
+            tuple: (permits_added, licenses_added), each None on error.
+        """
+        def run(dataset, refresh, url):
+            dataset_progress = None
+            if progress is not None:
+                def dataset_progress(bytes_read, rows_parsed):
+                    progress(dataset, bytes_read, rows_parsed)
+            return refresh(url, year, dataset_progress)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            permits_future = executor.submit(
+                run, "permits", self.refresh_permit_data, permits_url
+            )
+            licenses_future = executor.submit(
+                run, "licenses", self.refresh_license_data, licenses_url
+            )
+            return permits_future.result(), licenses_future.result()
+
+    def _refresh_store(self, dataset, current, url, year, progress=None):
+        """
+        Purpose:
+            Streams the records issued on or after the newest day held and
+            merges them into a copy of the current store. The newest day is
+            fetched again because more records may have been issued on it
+            since the last load; older rows are neither downloaded nor
+            parsed again.
+        Parameters:
+            dataset (str): 'permits' or 'licenses'.
+            current (RecordStore): The store currently held.
+            url (str): The URL of the full CSV export.
+            year (int): Keep only rows issued in this year, or None for all.
+            progress (callable): Called as progress(bytes_read, rows_parsed).
+        Returns:
+            tuple: (store, added) where store is the merged store, or None if
+                   there was nothing to merge into or an error occurred.
+        """
+        since_day = current.latest_day()
+        if since_day is None:
+            logger.info("No %s loaded yet; nothing to refresh.", dataset)
+            return None, 0
+        refresh_url = delta_url(url, dataset, since_day)
+        logger.info("Fetching new %s from URL: %s", dataset, refresh_url)
+        http = self._client()
+        from requests.exceptions import RequestException  # Loaded with the client
+        try:
+            with http.open(refresh_url) as response:
+                response.raise_for_status()
+                delta = self._read_csv_stream(
+                    ProgressReader(response), dataset, year, CHUNK_SIZE,
+                    progress,
+                )
+        except RequestException as e:
+            logger.error("Error downloading data: %s", e)
+            return None, None
+        except Exception as e:
+            logger.error("Error parsing data from %s: %s", refresh_url, e)
+            return None, None
+
+        store = current.copy()
+        store.month_cube()
+        removed, fetched = store.merge_since(since_day, delta)
+        if fetched < len(delta):
+            logger.warning("Ignored %d %s issued before the refresh window; the "
+                           "server did not apply the filter.",
+                           len(delta) - fetched, dataset)
+        added = fetched - removed
+        logger.info("Refreshed %s: %d new rows, %d total.", dataset, added, len(store))
+        if self.cache is not None:
+            meta = self.cache.lookup(url, year) or {}
+            try:
+                self.cache.save(url, year, store, meta.get("etag"),
+                                meta.get("last_modified"))
+            except OSError as e:
+                logger.warning("Error writing cache for URL %s: %s", url, e)
+        return store, added
+
+    def _load_store(self, dataset, url, year, chunksize, force_refresh,
+                    progress=None):
+        """
+        Purpose:
+            Loads one export into a new store. A cached copy is used directly
+            while within its TTL, otherwise it is revalidated with a
+            conditional GET; the export is only streamed and parsed when the
+            server reports a change or nothing is cached. The count cube is
+            built before returning so a finished store can be swapped in
+            while the GUI thread is querying the model.
+        Parameters:
+            dataset (str): 'permits' or 'licenses'.
+            url (str): The URL of the CSV export.
+            year (int): Keep only rows issued in this year, or None for all.
+            chunksize (int): The number of rows parsed per chunk.
+            force_refresh (bool): Ignore any cached copy.
+            progress (callable): Called as progress(bytes_read, rows_parsed).
+        Returns:
+            RecordStore or None: The filled store, or None if an error occurs.
+        """
+        record_type = SCHEMAS[dataset].record_type
+        meta = None
+        if self.cache is not None and not force_refresh:
+            meta = self.cache.lookup(url, year)
+            if meta is not None and self.cache.is_fresh(meta):
+                store = self.cache.load(url, year, record_type)
+                if store is not None:
+                    logger.info("Loaded %d rows from cache for URL: %s", len(store), url)
+                    return self._finish_store(store, progress)
+                meta = None
+
+        logger.info("Streaming data from URL: %s", url)
+        headers = self.cache.conditional_headers(meta) if self.cache else {}
+        http = self._client()
+        from requests.exceptions import RequestException  # Loaded with the client
+        try:
+            with http.open(
+                url, headers, self.cache.spool_path(url) if self.cache else None,
+                keep_body=self.workers > 1,
+            ) as response:
+                if response.status_code == 304 and meta is not None:
+                    store = self.cache.load(url, year, record_type)
+                    if store is not None:
+                        self.cache.touch(url, year)
+                        logger.info("Cached data for URL is still current: %s", url)
+                        return self._finish_store(store, progress)
+                    # The entry vanished; fetch the full export instead
+                    return self._load_store(
+                        dataset, url, year, chunksize, True, progress
+                    )
+                response.raise_for_status()
+                stream = ProgressReader(response)
+                if self.workers > 1:
+                    store = self._parse_spooled(
+                        stream, dataset, year, progress, response.body_path
+                    )
+                else:
+                    store = self._read_csv_stream(
+                        stream, dataset, year, chunksize, progress
+                    )
+                validators = (
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                )
+        except RequestException as e:
+            logger.error("Error downloading data: %s", e)
+            return None
+        except Exception as e:
+            logger.error("Error parsing data from %s: %s", url, e)
+            return None
+
+        if self.cache is not None:
+            try:
+                self.cache.save(url, year, store, *validators)
+            except OSError as e:
+                logger.warning("Error writing cache for URL %s: %s", url, e)
+        return self._finish_store(store, progress, stream.bytes_read)
+
+    @staticmethod
+    def _finish_store(store, progress=None, bytes_read=0):
+        """
+        Purpose:
+            Builds the count cube of a loaded store and reports its final size.
+        Parameters:
+            store (RecordStore): The loaded store.
+            progress (callable): Called as progress(bytes_read, rows_parsed),
+                                 or None.
+            bytes_read (int): The bytes downloaded, 0 when loaded from cache.
+        Returns:
+            RecordStore: The same store.
+        """
+        store.month_cube()
+        if progress is not None:
+            progress(bytes_read, len(store))
+        return store
+
+    def load_csv_file(self, path, dataset, year=None):
+        """
+        Purpose:
+            Loads a CSV export already on disk, replacing the dataset held.
+            With more than one worker the file is parsed in parallel.
+        Parameters:
+            path (str): The CSV export.
+            dataset (str): 'permits' or 'licenses'.
+            year (int): Keep only rows issued in this year, or None for all.
+        Returns:
+            bool: True if the export was loaded, False if an error occurred.
+        """
+        try:
+            if self.workers > 1:
+                from parallel_parse import parse_csv_parallel  # Multi-core ingest
+                store = parse_csv_parallel(
+                    path, SCHEMAS[dataset], year, self.workers, f"{dataset} export"
+                )
+            else:
+                with open(path, "rb") as file:
+                    store = self._read_csv_stream(
+                        ProgressReader(file), dataset, year, CHUNK_SIZE
+                    )
+        except Exception as e:
+            logger.error("Error parsing data from %s: %s", path, e)
+            return False
+        store.month_cube()
+        if dataset == "permits":
+            self._permit_store = store
+        else:
+            self._license_store = store
+        return True
+
+    def save_columns(self, directory):
+        """
+        Purpose:
+            Persists the parsed columns of both datasets as memory-mappable
+            column files, 'permits.cols' and 'licenses.cols'.
+        Parameters:
+            directory (str): The directory to write to; created if missing.
+        Returns:
+            int: The total size written, in bytes.
+        """
+        os.makedirs(directory, exist_ok=True)
+        size = 0
+        for dataset, store in (("permits", self._permit_store),
+                               ("licenses", self._license_store)):
+            size += save_columns(os.path.join(directory, f"{dataset}.cols"), store)
+        logger.info("Saved %d bytes of columns to %s", size, directory)
+        return size
+
+    def open_columns(self, directory):
+        """
+        Purpose:
+            Reopens columns written by save_columns without parsing. The
+            columns are memory-mapped, so opening costs almost nothing and
+            processes on the same host share the page cache.
+        Parameters:
+            directory (str): The directory written by save_columns.
+        Returns:
+            bool: True if both datasets were opened, False if an error
+                  occurred.
+        """
+        try:
+            permit_store = open_columns(
+                os.path.join(directory, "permits.cols"), BuildingPermit
+            )
+            license_store = open_columns(
+                os.path.join(directory, "licenses.cols"), BusinessLicense
+            )
+        except (OSError, ValueError) as e:
+            logger.error("Error opening columns in %s: %s", directory, e)
+            return False
+        self._permit_store = self._finish_store(permit_store)
+        self._license_store = self._finish_store(license_store)
+        logger.info("Opened %d permits and %d licenses from %s",
+                    len(permit_store), len(license_store), directory)
+        return True
+
+    def export_arrow(self, directory, file_format="parquet"):
+        """
+        Purpose:
+            Exports the cleaned permits and licenses, partitioned by year, and
+            their neighborhood x month counts as Parquet or Arrow IPC datasets
+            for other tools. Needs pyarrow.
+        Parameters:
+            directory (str): The export directory; created if missing.
+            file_format (str): 'parquet' or 'arrow'.
+        Returns:
+            int: The total size written, in bytes.
+        Raises:
+            ImportError: If pyarrow is not installed.
+            ValueError: If the format is unknown.
+        """
+        return export_datasets(
+            {"permits": self._permit_store, "licenses": self._license_store},
+            directory, file_format,
+        )
+
+    def import_arrow(self, directory, file_format="parquet"):
+        """
+        Purpose:
+            Loads datasets written by export_arrow, without any CSV parsing.
+            Needs pyarrow.
+        Parameters:
+            directory (str): The export directory.
+            file_format (str): 'parquet' or 'arrow'.
+        Returns:
+            bool: True if both datasets were loaded, False if an error
+                  occurred.
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        try:
+            stores = [import_dataset(directory, dataset, SCHEMAS[dataset].record_type,
+                                     file_format)
+                      for dataset in ("permits", "licenses")]
+        except (OSError, ValueError) as e:
+            logger.error("Error importing %s files from %s: %s",
+                         file_format, directory, e)
+            return False
+        self._permit_store = self._finish_store(stores[0])
+        self._license_store = self._finish_store(stores[1])
+        logger.info("Imported %d permits and %d licenses from %s",
+                    len(stores[0]), len(stores[1]), directory)
+        return True
+
+    def _parse_spooled(self, stream, dataset, year, progress=None, body_path=None):
+        """
+        Purpose:
+            Downloads an export to a file, then parses it on self.workers
+            processes. When the HTTP client already spools the body to disk,
+            that file is parsed and no second copy is written.
+        Parameters:
+            stream (ProgressReader): The CSV export, counting bytes read.
+            dataset (str): 'permits' or 'licenses'.
+            year (int): Keep only rows issued in this year, or None for all.
+            progress (callable): Called as progress(bytes_read, rows_parsed)
+                                 while downloading and once parsed.
+            body_path (str): The file the client writes the body to, deleted
+                             once parsed; None to copy it to a temporary file.
+        Returns:
+            RecordStore: The filled store.
+        """
+        from parallel_parse import parse_csv_parallel  # Multi-core ingest
+        schema, label = SCHEMAS[dataset], f"{dataset} export"
+        if body_path is not None:
+            self._copy_stream(stream, None, progress)
+            try:
+                store = parse_csv_parallel(body_path, schema, year, self.workers, label)
+            finally:
+                os.remove(body_path)
+        else:
+            with tempfile.TemporaryDirectory(prefix="dashboard-") as spool_dir:
+                path = os.path.join(spool_dir, f"{dataset}.csv")
+                with open(path, "wb") as spool:
+                    self._copy_stream(stream, spool, progress)
+                store = parse_csv_parallel(path, schema, year, self.workers, label)
+        if progress is not None:
+            progress(stream.bytes_read, len(store))
+        return store
+
+    @staticmethod
+    def _copy_stream(stream, file, progress=None):
+        """
+        Purpose:
+            Reads a stream to the end, writing it to a file.
+        Parameters:
+            stream (ProgressReader): The CSV export, counting bytes read.
+            file (file): The binary file written to, or None to only read.
+            progress (callable): Called as progress(bytes_read, 0) per block.
+        Returns:
+            Nothing
+        """
+        while True:
+            block = stream.read(SPOOL_BLOCK)
+            if not block:
+                break
+            if file is not None:
+                file.write(block)
+            if progress is not None:
+                progress(stream.bytes_read, 0)
+
+    def _read_csv_stream(self, stream, dataset, year, chunksize, progress=None):
+        """
+        Purpose:
+            Feeds a file-like stream into a chunked CSV reader and appends each
+            parsed chunk to a new store.
+        Parameters:
+            stream (ProgressReader): The CSV export, counting bytes read.
+            dataset (str): 'permits' or 'licenses'.
+            year (int): Keep only rows issued in this year, or None for all.
+            chunksize (int): The number of rows parsed per chunk.
+            progress (callable): Called as progress(bytes_read, rows_parsed)
+                                 after each chunk.
+        Returns:
+            RecordStore: The filled store.
+        """
+        import pandas as pd  # Deferred: only parsing needs pandas
+        schema = SCHEMAS[dataset]
+        store = RecordStore(schema.record_type)
+        reader = pd.read_csv(stream, chunksize=chunksize, **schema.read_options())
+        phase = PhaseCounter(logger, f"Parsed {dataset} export")
+        with phase, reader:
+            for chunk in reader:
+                phase.add("chunks")
+                phase.add("rows", len(chunk))
+                phase.add(
+                    "kept",
+                    store.append(
+                        chunk.get(schema.date_column),
+                        chunk.get(schema.area_column),
+                        year,
+                    ),
+                )
+                if progress is not None:
+                    progress(stream.bytes_read, phase.counts["rows"])
+            phase.add("bytes", stream.bytes_read)
+        return store
+
     def parse_permit_data(self, csv_data):
         """
         Purpose:
-            Parses CSV data into BuildingPermit objects.
+            Parses CSV data into the permits store. Only the schema's date and
+            area columns are read, and they are parsed in one vectorized pass;
+            rows without a valid date are dropped.
         Parameters:
             csv_data (str): The CSV data as a string.
         Returns:
             Nothing
         """
-        print("Parsing building permits data...")
+        import pandas as pd  # Deferred: only parsing needs pandas
         try:
-            data = pd.read_csv(StringIO(csv_data), delimiter=";")
-            for _, row in data.iterrows():
-                issued_date = row.get("IssueDate", None)
-                geo_local_area = row.get("GeoLocalArea", None)
-                issued_date = str(issued_date).strip() if pd.notna(issued_date) else ""
-                geo_local_area = (
-                    str(geo_local_area).strip() if pd.notna(geo_local_area) else ""
+            with PhaseCounter(logger, "Parsed building permits data") as phase:
+                schema = SCHEMAS["permits"]
+                data = pd.read_csv(StringIO(csv_data), **schema.read_options())
+                phase.add("rows", len(data))
+                phase.add(
+                    "kept",
+                    self._permit_store.append(
+                        data.get(schema.date_column), data.get(schema.area_column)
+                    ),
                 )
-                permit = BuildingPermit(issued_date, geo_local_area)
-                if permit.issued_date:  # Only add valid permits
-                    self.permits.append(permit)
-                    print(f"Added permit: {permit}")
-            print(f"Total permits parsed: {len(self.permits)}")
+                phase.add("total", len(self._permit_store))
         except Exception as e:
-            print(f"Error parsing building permits data: {e}")
+            logger.error("Error parsing building permits data: %s", e)
 
     def parse_license_data(self, csv_data):
         """
         Purpose:
-            Parses CSV data into BusinessLicense objects.
+            Parses CSV data into the licenses store. Only the schema's date and
+            area columns are read, and they are parsed in one vectorized pass;
+            rows without a valid date are dropped.
         Parameters:
             csv_data (str): The CSV data as a string.
         Returns:
             Nothing
         """
-        print("Parsing business licenses data...")
+        import pandas as pd  # Deferred: only parsing needs pandas
         try:
-            data = pd.read_csv(StringIO(csv_data), delimiter=";")
-            for _, row in data.iterrows():
-                issued_date = row.get("IssuedDate", None)
-                local_area = row.get("LocalArea", None)
-                issued_date = str(issued_date).strip() if pd.notna(issued_date) else ""
-                local_area = str(local_area).strip() if pd.notna(local_area) else ""
-                license = BusinessLicense(issued_date, local_area)
-                if license.issued_date:  # Only add valid licenses
-                    self.licenses.append(license)
-                    print(f"Added license: {license}")
-            print(f"Total licenses parsed: {len(self.licenses)}")
+            with PhaseCounter(logger, "Parsed business licenses data") as phase:
+                schema = SCHEMAS["licenses"]
+                data = pd.read_csv(StringIO(csv_data), **schema.read_options())
+                phase.add("rows", len(data))
+                phase.add(
+                    "kept",
+                    self._license_store.append(
+                        data.get(schema.date_column), data.get(schema.area_column)
+                    ),
+                )
+                phase.add("total", len(self._license_store))
         except Exception as e:
-            print(f"Error parsing business licenses data: {e}")
+            logger.error("Error parsing business licenses data: %s", e)
 
     def filter_data_2024(self):
         """
         Purpose:
             Filters permits and licenses to include only those issued in the
-            year 2024.
+            year 2024. See filter_data_year.
         Parameters:
             None
         Returns:
             Nothing
         """
-        print("Filtering data for the year 2024...")
-        initial_permits_count = len(self.permits)
-        initial_licenses_count = len(self.licenses)
-        self.permits = [permit for permit in self.permits if permit.year == 2024]
-        self.licenses = [license for license in self.licenses if license.year == 2024]
-        print(f"Filtered permits from {initial_permits_count} to {len(self.permits)}.")
-        print(
-            f"Filtered licenses from {initial_licenses_count} to "
-            f"{len(self.licenses)}."
+        self.filter_data_year(2024)
+
+    def filter_data_year(self, year):
+        """
+        Purpose:
+            Filters permits and licenses to include only those issued in the
+            given year, charts that year, then builds the (neighborhood x
+            month) count cubes used by the chart queries. Loading with
+            year=None and choosing a window with set_time_window keeps the
+            other years available instead.
+        Parameters:
+            year (int): The year to keep.
+        Returns:
+            Nothing
+        """
+        with PhaseCounter(logger, f"Filtered data for the year {year}") as phase:
+            phase.add("permits_before", len(self._permit_store))
+            phase.add("licenses_before", len(self._license_store))
+            self._permit_store.filter_year(year)
+            self._license_store.filter_year(year)
+            self.window = year_day_range(year)
+            # Build the count cubes now so chart queries are lookups from here on
+            self._permit_store.month_cube()
+            self._license_store.month_cube()
+            phase.add("permits_after", len(self._permit_store))
+            phase.add("licenses_after", len(self._license_store))
+
+    def set_time_window(self, start=None, end=None, granularity=None):
+        """
+        Purpose:
+            Sets the time window and line chart granularity used when a chart
+            query does not give its own.
+        Parameters:
+            start (str): The first day, as 'YYYY', 'YYYY-MM' or 'YYYY-MM-DD',
+                         or None for the earliest record.
+            end (str): The last day, inclusive, in the same forms (a partial
+                       date means its first day), or None for the latest
+                       record.
+            granularity (str): 'day', 'week', 'month' or 'year', or None to
+                               keep the current one.
+        Returns:
+            Nothing
+        Raises:
+            ValueError: If a date or the granularity is invalid.
+        """
+        window = self._window(start, end, (None, None))
+        if granularity is not None:
+            bucket_span(0, 1, granularity)  # Raises for an unknown granularity
+            self.granularity = granularity
+        self.window = window
+
+    def _cached_query(self, key, compute):
+        """
+        Purpose:
+            Returns a chart query's result from the query cache, computing and
+            storing it on a miss. Results of data that has since been loaded,
+            refreshed or filtered are dropped on the first query after.
+        Parameters:
+            key (tuple): The query, neighborhood, window and granularity.
+            compute (callable): Computes the result when it is not cached.
+        Returns:
+            object: The result, as computed by compute.
+        """
+        version = self.data_version()
+        if version != self._cached_version:
+            self.query_cache.clear()
+            self._cached_version = version
+        key = key + (version,)
+        result = self.query_cache.get(key)
+        if result is None:
+            result = compute()
+            self.query_cache.put(key, result)
+        return result
+
+    def query_cache_stats(self):
+        """
+        Purpose:
+            Returns the hit, miss and eviction counters of the query cache.
+        Parameters:
+            Nothing
+        Returns:
+            dict: See QueryCache.stats.
+        """
+        return self.query_cache.stats()
+
+    def _window(self, start, end, default=None):
+        """
+        Purpose:
+            Converts window bounds given as dates to day ordinals.
+        Parameters:
+            start (str): The first day, '' for an open start, or None for the
+                         default.
+            end (str): The last day, inclusive, '' for an open end, or None
+                       for the default.
+            default (tuple): The (start, end) days used for missing bounds;
+                             the model's window if None.
+        Returns:
+            tuple: (first day, day after the last), either may be None.
+        """
+        default_start, default_end = self.window if default is None else default
+        start_day = default_start if start is None else (
+            parse_day(start) if start else None
+        )
+        end_day = default_end if end is None else (
+            parse_day(end) + 1 if end else None
+        )
+        return start_day, end_day
+
+    def _query_window(self, start, end):
+        """
+        Purpose:
+            Resolves the window of a chart query, filling open ends from the
+            extent of the loaded data.
+        Parameters:
+            start (str): The first day, '' for the earliest record, or None
+                         for the model's window.
+            end (str): The last day, inclusive, '' for the latest record, or
+                       None for the model's window.
+        Returns:
+            tuple: (first day, day after the last) as ints.
+        """
+        start_day, end_day = self._window(start, end)
+        if start_day is None or end_day is None:
+            ranges = [r for r in (self._permit_store.day_range(),
+                                  self._license_store.day_range()) if r]
+            if start_day is None:
+                start_day = min((r[0] for r in ranges), default=0)
+            if end_day is None:
+                end_day = max((r[1] for r in ranges), default=start_day)
+        return start_day, end_day
+
+    def aggregate(self, measures=MEASURES, neighborhood=None, start=None,
+                  end=None, granularity=None):
+        """
+        Purpose:
+            Computes any combination of chart measures for both datasets with
+            one binning pass over each (or none, when the count cube already
+            holds the answer), so a new chart reuses the same pass instead of
+            adding a scan.
+        Parameters:
+            measures (tuple): Names from record_store.MEASURES: 'series',
+                              'total', 'area_totals' and 'area_series'.
+            neighborhood (str): The neighborhood to filter by, or None for all
+                                neighborhoods.
+            start (str): The first day, '' for the earliest record, or None
+                         for the model's window.
+            end (str): The last day, inclusive, '' for the latest record, or
+                       None for the model's window.
+            granularity (str): 'day', 'week', 'month' or 'year', or None for
+                               the model's granularity.
+        Returns:
+            dict: 'labels' (the bucket labels, empty unless a series was
+            requested) and, for 'permits' and
+            'licenses', a dictionary of the requested measures as returned
+            by RecordStore.aggregate.
+        Raises:
+            ValueError: If a measure, date or the granularity is invalid.
+        """
+        start_day, end_day = self._query_window(start, end)
+        return self._aggregate(measures, neighborhood, start_day, end_day,
+                               granularity or self.granularity)
+
+    def _aggregate(self, measures, neighborhood, start_day, end_day, granularity):
+        """
+        Purpose:
+            Computes chart measures for both datasets over a resolved window.
+        Parameters:
+            measures (tuple): Names from record_store.MEASURES.
+            neighborhood (str): The neighborhood, or None for all.
+            start_day (int): The first day of the window.
+            end_day (int): The day after the last day of the window.
+            granularity (str): 'day', 'week', 'month' or 'year'.
+        Returns:
+            dict: See aggregate.
+        """
+        labels = []
+        if "series" in measures or "area_series" in measures:
+            first, n_buckets = bucket_span(start_day, end_day, granularity)
+            labels = [bucket_label(first + offset, granularity)
+                      for offset in range(max(n_buckets, 0))]
+        return {
+            "labels": labels,
+            "permits": self._permit_store.aggregate(
+                start_day, end_day, granularity, neighborhood, measures
+            ),
+            "licenses": self._license_store.aggregate(
+                start_day, end_day, granularity, neighborhood, measures
+            ),
+        }
+
+    def prepare_time_series(self, neighborhood=None, start=None, end=None,
+                            granularity=None):
+        """
+        Purpose:
+            Counts permits and licenses per day, week, month or year over a
+            time window, including empty buckets, by binning day ordinals.
+        Parameters:
+            neighborhood (str): The neighborhood to filter by, or None for all
+                                neighborhoods.
+            start (str): The first day, '' for the earliest record, or None
+                         for the model's window.
+            end (str): The last day, inclusive, '' for the latest record, or
+                       None for the model's window.
+            granularity (str): 'day', 'week', 'month' or 'year', or None for
+                               the model's granularity.
+        Returns:
+            list: One dictionary per bucket with the 'period' label and the
+            'permits' and 'licenses' counts.
+        """
+        start_day, end_day = self._query_window(start, end)
+        return self._time_series(
+            neighborhood, start_day, end_day, granularity or self.granularity
         )
 
+    def _time_series(self, neighborhood, start_day, end_day, granularity):
+        """
+        Purpose:
+            Counts permits and licenses per bucket of a resolved window.
+        Parameters:
+            neighborhood (str): The neighborhood to filter by, or None for all
+                                neighborhoods.
+            start_day (int): The first day of the window.
+            end_day (int): The day after the last day of the window.
+            granularity (str): 'day', 'week', 'month' or 'year'.
+        Returns:
+            list: See prepare_time_series.
+        """
+        counts = self._aggregate(("series",), neighborhood, start_day, end_day,
+                                 granularity)
+        return _series(counts["labels"], counts["permits"]["series"],
+                       counts["licenses"]["series"])
+
+    def prepare_report_data(self, start=None, end=None, granularity=None):
+        """
+        Purpose:
+            Prepares the line and bar chart data of the whole city and of
+            every neighborhood in one pass over each dataset, instead of one
+            query per neighborhood.
+        Parameters:
+            start (str): The first day, '' for the earliest record, or None
+                         for the model's window.
+            end (str): The last day, inclusive, '' for the latest record, or
+                       None for the model's window.
+            granularity (str): 'day', 'week', 'month' or 'year', or None for
+                               the model's granularity.
+        Returns:
+            list: (neighborhood, line data, bar data) tuples, the city first
+            with neighborhood None, then each neighborhood by name; the data
+            have the formats of prepare_line_chart_data and
+            prepare_grouped_bar_data.
+        """
+        counts = self.aggregate(("series", "area_series"), None, start, end,
+                                granularity)
+        labels = counts["labels"]
+        zeros = np.zeros(len(labels), dtype=np.int64)
+
+        tables = []
+        for dataset in ("permits", "licenses"):
+            rows = dict(counts[dataset]["area_series"])
+            rows[None] = counts[dataset]["series"]
+            tables.append(rows)
+
+        report = []
+        for neighborhood in [None] + self.neighborhood_index().names:
+            permits = tables[0].get(neighborhood, zeros)
+            licenses = tables[1].get(neighborhood, zeros)
+            line = _series(labels, permits, licenses)
+            for entry in line:
+                entry["month"] = entry["period"]
+            bar = {
+                "Building Permits": int(permits.sum()),
+                "Business Licenses": int(licenses.sum()),
+            }
+            report.append((neighborhood, line, bar))
+        return report
+
     def count_permits_by_month(self, neighborhood=None):
         """
         Purpose:
@@ -139,14 +1223,8 @@ class DataModel:
         Returns:
             dict: A dictionary with 'YYYY-MM' as keys and counts as values.
         """
-        print(f"Counting permits by month for neighborhood: {neighborhood}")
-        counts = {}
-        for permit in self.permits:
-            if neighborhood is None or permit.geo_local_area == neighborhood:
-                if permit.year_month not in counts:
-                    counts[permit.year_month] = 0
-                counts[permit.year_month] += 1
-        print(f"Permit counts by month: {counts}")
+        counts = self._permit_store.count_by_month(neighborhood)
+        logger.debug("Permit counts by month for %s: %s", neighborhood, counts)
         return counts
 
     def count_licenses_by_month(self, neighborhood=None):
@@ -160,73 +1238,68 @@ class DataModel:
         Returns:
             dict: A dictionary with 'YYYY-MM' as keys and counts as values.
         """
-        print(f"Counting licenses by month for neighborhood: {neighborhood}")
-        counts = {}
-        for license in self.licenses:
-            if neighborhood is None or license.local_area == neighborhood:
-                if license.year_month not in counts:
-                    counts[license.year_month] = 0
-                counts[license.year_month] += 1
-        print(f"License counts by month: {counts}")
+        counts = self._license_store.count_by_month(neighborhood)
+        logger.debug("License counts by month for %s: %s", neighborhood, counts)
         return counts
 
-    def prepare_line_chart_data(self, neighborhood=None):
+    def prepare_line_chart_data(self, neighborhood=None, start=None, end=None,
+                                granularity=None):
         """
         Purpose:
-            Prepares data for the line chart visualization.
+            Prepares data for the line chart visualization. Repeated queries
+            for the same data are answered from the query cache.
         Parameters:
             neighborhood (str): The neighborhood to filter by, or None for all
                                 neighborhoods.
+            start (str): The first day, '' for the earliest record, or None
+                         for the model's window.
+            end (str): The last day, inclusive, '' for the latest record, or
+                       None for the model's window.
+            granularity (str): 'day', 'week', 'month' or 'year', or None for
+                               the model's granularity.
         Returns:
-            list: A list of dictionaries containing month, permits,
-            and licenses counts.
-        """
-        print(f"Preparing line chart data for neighborhood: {neighborhood}")
-        permit_counts = self.count_permits_by_month(neighborhood)
-        license_counts = self.count_licenses_by_month(neighborhood)
-
-        # Ensure all months are represented
-        months = [f"2024-{month:02d}" for month in range(1, 13)]
-        data = []
-        for month in months:
-            data.append(
-                {
-                    "month": month,
-                    "permits": permit_counts.get(month, 0),
-                    "licenses": license_counts.get(month, 0),
-                }
-            )
-        print(f"Line chart data: {data}")
-        return data
+            list: A list of dictionaries containing period, permits,
+            and licenses counts; 'month' repeats the period label.
+        """
+        granularity = granularity or self.granularity
+        window = self._query_window(start, end)
+
+        def compute():
+            # Every bucket of the window is represented, even without records
+            series = self._time_series(neighborhood, *window, granularity)
+            for entry in series:
+                entry["month"] = entry["period"]
+            return series
+
+        data = self._cached_query(("line", neighborhood, window, granularity), compute)
+        logger.debug("Line chart data for %s: %s", neighborhood, data)
+        return [dict(entry) for entry in data]  # Callers may modify their copy
 
-    def prepare_grouped_bar_data(self, neighborhood=None):
+    def prepare_grouped_bar_data(self, neighborhood=None, start=None, end=None):
         """
         Purpose:
-            Prepares data for the grouped bar chart visualization.
+            Prepares data for the grouped bar chart visualization. Repeated
+            queries for the same data are answered from the query cache.
         Parameters:
             neighborhood (str): The neighborhood to filter by, or None for all
                                 neighborhoods.
+            start (str): The first day, '' for the earliest record, or None
+                         for the model's window.
+            end (str): The last day, inclusive, '' for the latest record, or
+                       None for the model's window.
         Returns:
             dict: A dictionary containing total permits and total licenses.
         """
-        print(f"Preparing grouped bar chart data for neighborhood: {neighborhood}")
-        total_permits = len(
-            [
-                permit
-                for permit in self.permits
-                if neighborhood is None or permit.geo_local_area == neighborhood
-            ]
-        )
-        total_licenses = len(
-            [
-                license
-                for license in self.licenses
-                if neighborhood is None or license.local_area == neighborhood
-            ]
-        )
-        grouped_data = {
-            "Building Permits": total_permits,
-            "Business Licenses": total_licenses,
-        }
-        print(f"Grouped bar chart data: {grouped_data}")
-        return grouped_data
+        window = self._query_window(start, end)
+
+        def compute():
+            counts = self._aggregate(("total",), neighborhood, *window,
+                                     self.granularity)
+            return {
+                "Building Permits": counts["permits"]["total"],
+                "Business Licenses": counts["licenses"]["total"],
+            }
+
+        grouped_data = self._cached_query(("bar", neighborhood, window), compute)
+        logger.debug("Grouped bar chart data for %s: %s", neighborhood, grouped_data)
+        return dict(grouped_data)  # Callers may modify their copy
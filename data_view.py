@@ -5,13 +5,25 @@ Final Project
 This is the view file for the final project.
 """
 
+import queue  # For handing events from worker threads to the Tk loop
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
+from instrumentation import instrument, timed, untimed  # Latency histograms
+from chart_drawing import (  # Chart drawing shared with the report renderer
+    draw_grouped_bar_chart,
+    draw_line_chart,
+    set_count_limit,
+)
 
+POLL_INTERVAL_MS = 100  # How often queued events are applied to the GUI
+GRANULARITIES = ("day", "week", "month", "year")
+DATASET_LABELS = {"permits": "Permits", "licenses": "Licenses"}
 
+
+@instrument
 class DataView:
     """
     Purpose:
@@ -23,7 +35,15 @@ class DataView:
         neighborhood_entry (Entry): The entry widget for neighborhood selection.
         bar_chart_button (Button): The button for showing the grouped bar chart.
         line_chart_button (Button): The button for showing the line chart.
+        refresh_button (Button): The button fetching newly issued records.
+        timings_button (Button): The button showing the latency histograms.
+        start_var (StringVar): The first day charted, 'YYYY-MM-DD'.
+        end_var (StringVar): The last day charted, 'YYYY-MM-DD'.
+        granularity_var (StringVar): The line chart bucket size.
         chart_frame (Frame): The frame for displaying
+        figure (Figure): The persistent figure all charts are drawn on.
+        canvas (FigureCanvasTkAgg): The persistent canvas showing the figure.
+        status_var (StringVar): The loading progress shown under the chart.
     """
 
     def __init__(self):
@@ -37,9 +57,13 @@ class DataView:
         """
         self.root = tk.Tk()
         self.root.title("Data Visualization Dashboard")
+        self._events = queue.Queue()  # (callback, args) posted by other threads
+        self._progress = {}  # Dataset -> (bytes_read, rows_parsed)
+        self._dataset_state = {name: "loading" for name in DATASET_LABELS}
 
         # Create layout
         self.create_widgets()
+        self.root.after(POLL_INTERVAL_MS, self._process_events)
 
     def create_widgets(self):
         """
@@ -60,79 +84,232 @@ class DataView:
         )
         self.neighborhood_entry.grid(row=0, column=1, padx=5, pady=5)
 
-        # Buttons for visualizations
-        self.bar_chart_button = ttk.Button(self.root, text="Show Grouped Bar Chart")
+        # Buttons for visualizations, enabled once a dataset has loaded
+        self.bar_chart_button = ttk.Button(
+            self.root, text="Show Grouped Bar Chart", state="disabled"
+        )
         self.bar_chart_button.grid(row=1, column=0, padx=5, pady=5)
 
-        self.line_chart_button = ttk.Button(self.root, text="Show Line Chart")
+        self.line_chart_button = ttk.Button(
+            self.root, text="Show Line Chart", state="disabled"
+        )
         self.line_chart_button.grid(row=1, column=1, padx=5, pady=5)
 
-        # Area for displaying the chart
+        self.refresh_button = ttk.Button(
+            self.root, text="Refresh Data", state="disabled"
+        )
+        self.refresh_button.grid(row=0, column=2, padx=5, pady=5)
+
+        # Time window and granularity of the charts
+        window_frame = tk.Frame(self.root)
+        window_frame.grid(row=1, column=2, padx=5, pady=5)
+        tk.Label(window_frame, text="From:").pack(side="left")
+        self.start_var = tk.StringVar(value="2024-01-01")
+        ttk.Entry(window_frame, textvariable=self.start_var, width=11).pack(side="left")
+        tk.Label(window_frame, text="To:").pack(side="left")
+        self.end_var = tk.StringVar(value="2024-12-31")
+        ttk.Entry(window_frame, textvariable=self.end_var, width=11).pack(side="left")
+        self.granularity_var = tk.StringVar(value="month")
+        ttk.Combobox(
+            window_frame, textvariable=self.granularity_var,
+            values=GRANULARITIES, state="readonly", width=7,
+        ).pack(side="left", padx=(5, 0))
+
+        # Area for displaying the chart; one figure and canvas are reused for
+        # every chart so repeated clicks do not create new widgets
         self.chart_frame = tk.Frame(self.root, width=800, height=600)
-        self.chart_frame.grid(row=2, column=0, columnspan=2, padx=10, pady=10)
+        self.chart_frame.grid(row=2, column=0, columnspan=3, padx=10, pady=10)
+        self.figure = Figure(figsize=(8, 6))
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.chart_frame)
+        self.canvas.get_tk_widget().pack()
+        # The actual drawing happens later, when Tk is idle; time it too
+        self.canvas.draw = timed("DataView.canvas.draw")(self.canvas.draw)
+        self._chart_kind = None  # 'bar' or 'line' once a chart is shown
+        self._artists = None  # The artists of the current chart
+
+        # Loading progress
+        self.status_var = tk.StringVar(value="Loading data...")
+        tk.Label(self.root, textvariable=self.status_var, anchor="w").grid(
+            row=3, column=0, columnspan=2, padx=5, pady=5, sticky="we"
+        )
+        self.timings_button = ttk.Button(self.root, text="Show Timings")
+        self.timings_button.grid(row=3, column=2, padx=5, pady=5)
 
-    def display_chart(self, figure):
+    def post(self, callback, *args):
         """
         Purpose:
-            Displays a matplotlib figure in the GUI.
+            Schedules a GUI update from any thread. Tk is not thread-safe, so
+            worker threads queue their updates and the Tk loop applies them.
         Parameters:
-            figure (Figure): A Matplotlib figure to display.
+            callback (callable): The view method to call on the Tk thread.
+            args: The arguments to pass to the callback.
         Returns:
             Nothing
         """
-        for widget in self.chart_frame.winfo_children():
-            widget.destroy()
+        self._events.put((callback, args))
 
-        canvas = FigureCanvasTkAgg(figure, master=self.chart_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack()
+    def _process_events(self):
+        """
+        Purpose:
+            Applies the queued updates, then reschedules itself with after().
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        while True:
+            try:
+                callback, args = self._events.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+        self.root.after(POLL_INTERVAL_MS, self._process_events)
+
+    def show_progress(self, dataset, bytes_read, rows_parsed):
+        """
+        Purpose:
+            Records the loading progress of a dataset and refreshes the status.
+        Parameters:
+            dataset (str): 'permits' or 'licenses'.
+            bytes_read (int): The bytes of the export read so far.
+            rows_parsed (int): The rows of the export parsed so far.
+        Returns:
+            Nothing
+        """
+        self._progress[dataset] = (bytes_read, rows_parsed)
+        self._update_status()
+
+    def dataset_loaded(self, dataset, loaded):
+        """
+        Purpose:
+            Marks a dataset as ready or failed; the chart buttons are enabled
+            as soon as any dataset is ready.
+        Parameters:
+            dataset (str): 'permits' or 'licenses'.
+            loaded (bool): Whether the dataset loaded successfully.
+        Returns:
+            Nothing
+        """
+        self._dataset_state[dataset] = "ready" if loaded else "failed"
+        if loaded:
+            self.bar_chart_button.configure(state="normal")
+            self.line_chart_button.configure(state="normal")
+            self.refresh_button.configure(state="normal")
+        self._update_status()
+
+    def refresh_started(self):
+        """
+        Purpose:
+            Disables the refresh button while new records are fetched.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        self.refresh_button.configure(state="disabled")
+        self.status_var.set("Refreshing data...")
+
+    def refresh_finished(self, permits_added, licenses_added):
+        """
+        Purpose:
+            Re-enables the refresh button and reports what was added.
+        Parameters:
+            permits_added (int or None): New permits, or None on failure.
+            licenses_added (int or None): New licenses, or None on failure.
+        Returns:
+            Nothing
+        """
+        self.refresh_button.configure(state="normal")
+        parts = []
+        for label, added in (("Permits", permits_added), ("Licenses", licenses_added)):
+            parts.append(f"{label}: refresh failed" if added is None
+                         else f"{label}: {added:+,} rows")
+        self.status_var.set("Refreshed. " + " | ".join(parts))
+
+    def _update_status(self):
+        """
+        Purpose:
+            Shows the state and progress of each dataset in the status line.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        parts = []
+        for dataset, label in DATASET_LABELS.items():
+            state = self._dataset_state[dataset]
+            bytes_read, rows_parsed = self._progress.get(dataset, (0, 0))
+            if state == "loading":
+                parts.append(
+                    f"{label}: loading, {bytes_read / 1e6:.1f} MB, "
+                    f"{rows_parsed:,} rows"
+                )
+            else:
+                parts.append(f"{label}: {state}")
+        self.status_var.set(" | ".join(parts))
+
+    def _chart_axes(self, kind):
+        """
+        Purpose:
+            Returns the axes for a chart kind. The persistent figure is only
+            cleared when switching between chart kinds.
+        Parameters:
+            kind (str): 'bar' or 'line'.
+        Returns:
+            tuple: (axes, reused) where reused is True if the existing chart
+                   of this kind can be updated in place.
+        """
+        if self._chart_kind == kind:
+            return self.figure.axes[0], True
+        self.figure.clear()
+        self._chart_kind = kind
+        self._artists = None
+        return self.figure.add_subplot(111), False
 
     def render_grouped_bar_chart(self, data):
         """
         Purpose:
-            Renders a grouped bar chart with the given data.
+            Renders a grouped bar chart with the given data, updating the bar
+            heights in place when the bar chart is already shown.
         Parameters:
             data (dict): A dictionary with category names as keys and counts as values.
         Returns:
             Nothing
         """
-        figure = Figure(figsize=(8, 6))
-        ax = figure.add_subplot(111)
-        ax.bar(data.keys(), data.values())
-        ax.set_title("Grouped Bar Chart")
-        ax.set_xlabel("Category")
-        ax.set_ylabel("Count (Permits/Licenses)")
-
-        self.display_chart(figure)
+        categories = list(data.keys())
+        values = list(data.values())
+        ax, reused = self._chart_axes("bar")
+        if reused and self._artists["categories"] == categories:
+            for bar, value in zip(self._artists["bars"], values):
+                bar.set_height(value)
+            set_count_limit(ax, values)
+        else:
+            self._artists = draw_grouped_bar_chart(ax, data)
+        self.canvas.draw_idle()
 
     def render_line_chart(self, data):
         """
         Purpose:
-            Renders a line chart with the given data.
+            Renders a line chart with the given data, updating the line data
+            in place when the line chart for the same periods is already shown.
         Parameters:
-            data (list): A list of dictionaries containing month, permits, and licenses counts.
+            data (list): A list of dictionaries containing period, permits, and licenses counts.
         Returns:
             Nothing
         """
-        figure = Figure(figsize=(8, 6))
-        ax = figure.add_subplot(111)
-
-        months = [entry["month"] for entry in data]
+        periods = [entry["period"] for entry in data]
         permits = [entry["permits"] for entry in data]
         licenses = [entry["licenses"] for entry in data]
 
-        ax.plot(months, permits, label="Building Permits", marker="o")
-        ax.plot(months, licenses, label="Business Licenses", marker="o")
-        ax.set_title("Line Chart")
-        ax.set_xlabel("Time (Month)")
-        ax.set_ylabel("Count (Permits/Licenses)")
-        ax.legend()
-
-        # Rotate x-axis labels for better readability
-        ax.set_xticks(months)
-        ax.set_xticklabels(months, rotation=45, ha="right")
-
-        self.display_chart(figure)
+        ax, reused = self._chart_axes("line")
+        if reused and self._artists["periods"] == periods:
+            self._artists["permits"].set_ydata(permits)
+            self._artists["licenses"].set_ydata(licenses)
+            set_count_limit(ax, permits + licenses)
+        else:
+            self._artists = draw_line_chart(ax, data)
+            self.figure.tight_layout()
+        self.canvas.draw_idle()
 
     def show_error(self, message):
         """
@@ -145,6 +322,24 @@ class DataView:
         """
         messagebox.showerror("Error", message)
 
+    def show_timings(self, table):
+        """
+        Purpose:
+            Shows the latency histograms in a separate window.
+        Parameters:
+            table (str): The formatted table of stages.
+        Returns:
+            Nothing
+        """
+        window = tk.Toplevel(self.root)
+        window.title("Timings")
+        text = tk.Text(window, width=100, height=min(table.count("\n") + 2, 40),
+                       font="TkFixedFont", wrap="none")
+        text.insert("1.0", table)
+        text.configure(state="disabled")
+        text.pack(fill="both", expand=True)
+
+    @untimed
     def start(self):
         """
         Purpose:
@@ -0,0 +1,87 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the dataset schema file for the final project.
+"""
+
+from building_permits import BuildingPermit  # Import BuildingPermit class
+from business_licenses import BusinessLicense  # Import BusinessLicense class
+
+DELIMITER = ";"  # The portal exports are semicolon separated
+
+
+class DatasetSchema:
+    """
+    Purpose:
+        Declares the parts of an export the model reads, so the CSV reader
+        only converts those columns and reads them as categoricals: each
+        distinct date and area string is stored once and parsed once, however
+        wide the export is.
+    Attributes:
+        name (str): 'permits' or 'licenses'.
+        record_type (type): The record class materialized on demand.
+        date_column (str): The issued date column label in the export.
+        area_column (str): The local area column label in the export.
+        api_date_field (str): The API field name of the issued date, used in
+                              where/order_by filters.
+    """
+
+    def __init__(self, name, record_type, date_column, area_column, api_date_field):
+        """
+        Purpose:
+            Initializes the schema.
+        Parameters:
+            name (str): 'permits' or 'licenses'.
+            record_type (type): The record class materialized on demand.
+            date_column (str): The issued date column label.
+            area_column (str): The local area column label.
+            api_date_field (str): The API field name of the issued date.
+        Returns:
+            Nothing
+        """
+        self.name = name
+        self.record_type = record_type
+        self.date_column = date_column
+        self.area_column = area_column
+        self.api_date_field = api_date_field
+
+    @property
+    def columns(self):
+        """
+        Purpose:
+            Returns the labels of the columns read.
+        Parameters:
+            Nothing
+        Returns:
+            tuple: (date column, area column).
+        """
+        return (self.date_column, self.area_column)
+
+    def read_options(self):
+        """
+        Purpose:
+            Returns the pd.read_csv options projecting the export onto the
+            declared columns. A missing column is simply absent from the
+            result, so an export without it parses to no valid rows.
+        Parameters:
+            Nothing
+        Returns:
+            dict: Keyword arguments for pd.read_csv.
+        """
+        columns = self.columns
+        return {
+            "delimiter": DELIMITER,
+            "usecols": lambda column: column in columns,
+            "dtype": {column: "category" for column in columns},
+        }
+
+
+SCHEMAS = {
+    "permits": DatasetSchema(
+        "permits", BuildingPermit, "IssueDate", "GeoLocalArea", "issuedate"
+    ),
+    "licenses": DatasetSchema(
+        "licenses", BusinessLicense, "IssuedDate", "LocalArea", "issueddate"
+    ),
+}
@@ -0,0 +1,281 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the shared date parsing engine file for the final project.
+"""
+
+import re  # For recognizing ISO dates
+import threading  # For sharing one parser between loader threads
+from collections import OrderedDict  # For the bounded memo cache
+import numpy as np  # For day ordinal arrays
+
+DEFAULT_CACHE_SIZE = 65536  # Distinct date strings remembered by parse()
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+ISO_DATETIME = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}")
+# An ISO date, alone or starting a timestamp; its first 10 characters are the
+# local calendar date whatever UTC offset follows
+ISO_PREFIX = r"^\d{4}-\d{2}-\d{2}(?:$|[T ]\d{2}:\d{2})"
+INVALID_DAY = np.iinfo(np.int64).min  # NaT as int64; marks unparseable values
+
+
+def factorize_strings(values):
+    """
+    Purpose:
+        Splits a column of strings into integer codes and its distinct
+        stripped values. A categorical column already holds both, so only its
+        categories are touched; other columns are factorized.
+    Parameters:
+        values (Series): The raw strings, plain or categorical; missing values
+                         allowed.
+    Returns:
+        tuple: (codes, uniques) where codes is an int array with -1 for
+               missing values and uniques is an object array of the stripped
+               strings.
+    """
+    import pandas as pd  # Deferred: only parsing needs pandas
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        uniques = pd.Series(values.cat.categories).astype("string").str.strip()
+    else:
+        codes, uniques = pd.factorize(values.astype("string").str.strip())
+    return codes, np.asarray(uniques, dtype=object)
+
+
+class DateParser:
+    """
+    Purpose:
+        Parses issued date strings. The format of each column is detected from
+        its first non-empty value, matching strings take a strict fast path,
+        distinct strings are memoized in a bounded cache, and only strings that
+        miss the fast path fall back to flexible pandas parsing.
+    Attributes:
+        max_entries (int): The size limit of the memo cache.
+        date_format (str): The format detected for the latest column parsed,
+                           or None before any; only reported in stats().
+        hits (int): Lookups answered without parsing.
+        misses (int): Distinct strings that had to be parsed.
+        fast_path (int): Misses parsed by the strict format.
+        fallback (int): Misses that needed flexible parsing.
+        failures (int): Misses that could not be parsed at all.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        """
+        Purpose:
+            Initializes an empty parser.
+        Parameters:
+            max_entries (int): The size limit of the memo cache.
+        Returns:
+            Nothing
+        """
+        self.max_entries = max_entries
+        self.date_format = None
+        self._cache = OrderedDict()  # Date string -> Timestamp or None
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        Purpose:
+            Sets all counters back to zero.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        self.hits = 0
+        self.misses = 0
+        self.fast_path = 0
+        self.fallback = 0
+        self.failures = 0
+
+    def stats(self):
+        """
+        Purpose:
+            Returns the counters and the cache hit rate.
+        Parameters:
+            Nothing
+        Returns:
+            dict: The counters, 'hit_rate' and 'cache_size'.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "fast_path": self.fast_path,
+            "fallback": self.fallback,
+            "failures": self.failures,
+            "cache_size": len(self._cache),
+            "date_format": self.date_format,
+        }
+
+    def detect_format(self, sample):
+        """
+        Purpose:
+            Detects the date format from a sample value. It is detected again
+            for every column, since the parser is shared by exports in
+            different formats.
+        Parameters:
+            sample (str): A non-empty date string.
+        Returns:
+            str: '%Y-%m-%d' or 'ISO8601', or None to parse flexibly.
+        """
+        if ISO_DATE.match(sample):
+            return "%Y-%m-%d"
+        if ISO_DATETIME.match(sample):
+            return "ISO8601"
+        return None
+
+    def parse(self, date_str):
+        """
+        Purpose:
+            Parses one date string, using the memo cache when possible.
+        Parameters:
+            date_str (str): The date string to be parsed.
+        Returns:
+            Timestamp or None: The parsed date, or None if parsing fails or no
+                               date is provided.
+        """
+        if not date_str:
+            return None
+        date_str = date_str.strip()
+        with self._lock:
+            if date_str in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(date_str)
+                return self._cache[date_str]
+            self.misses += 1
+
+        import pandas as pd  # Deferred: only parsing needs pandas
+        parsed = None
+        if ISO_DATE.match(date_str):
+            try:
+                parsed = pd.Timestamp(
+                    int(date_str[0:4]), int(date_str[5:7]), int(date_str[8:10])
+                )
+            except ValueError:
+                parsed = None  # e.g. 2024-02-30; let the fallback decide
+        with self._lock:
+            if parsed is not None:
+                self.fast_path += 1
+            else:
+                self.fallback += 1
+        if parsed is None:
+            parsed = self._parse_flexible(date_str)
+
+        with self._lock:
+            if parsed is None:
+                self.failures += 1
+            self._cache[date_str] = parsed
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return parsed
+
+    @staticmethod
+    def _parse_flexible(date_str):
+        """
+        Purpose:
+            Parses a date string with pandas' general-purpose parser.
+        Parameters:
+            date_str (str): The date string to be parsed.
+        Returns:
+            Timestamp or None: The parsed date, or None if parsing fails.
+        """
+        import pandas as pd  # Deferred: only parsing needs pandas
+        try:
+            parsed = pd.to_datetime(date_str, errors="coerce")
+        except (ValueError, TypeError, OverflowError):
+            return None
+        if pd.isna(parsed):
+            return None
+        return parsed
+
+    def parse_days(self, values):
+        """
+        Purpose:
+            Parses a whole column of date strings into day ordinals. Each
+            distinct string is parsed once: strictly with the detected format
+            first, then flexibly for the ones that miss. A categorical column
+            is parsed through its categories alone.
+        Parameters:
+            values (Series): The raw date strings, plain or categorical;
+                             missing values allowed.
+        Returns:
+            tuple: (days, valid) where days is an int64 array of days since
+                   1970-01-01 and valid is a boolean mask of parsed rows.
+        """
+        codes, uniques = factorize_strings(values)
+        unique_days = self._parse_unique(uniques)
+        with self._lock:
+            self.hits += int((codes >= 0).sum()) - len(uniques)
+            self.misses += len(uniques)
+
+        days = np.full(len(codes), INVALID_DAY, dtype=np.int64)
+        present = codes >= 0
+        days[present] = unique_days[codes[present]]
+        return days, days != INVALID_DAY
+
+    def _parse_unique(self, uniques):
+        """
+        Purpose:
+            Parses distinct date strings into day ordinals.
+        Parameters:
+            uniques (ndarray): Distinct date strings.
+        Returns:
+            ndarray: int64 day ordinals, INVALID_DAY where parsing failed.
+        """
+        import pandas as pd  # Deferred: only parsing needs pandas
+        days = np.full(len(uniques), INVALID_DAY, dtype=np.int64)
+        non_empty = [i for i, value in enumerate(uniques) if value]
+        if not non_empty:
+            return days
+
+        date_format = self.detect_format(uniques[non_empty[0]])
+        with self._lock:
+            self.date_format = date_format or ""  # "" once detected as flexible
+        if date_format:
+            # The date part of ISO dates and timestamps, parsed in one call;
+            # this keeps local wall dates, and mixed UTC offsets cannot fail it
+            values = pd.Series(uniques, dtype="string")
+            iso_dates = values.str.slice(0, 10).where(values.str.match(ISO_PREFIX))
+            parsed = pd.to_datetime(iso_dates, format="%Y-%m-%d", errors="coerce")
+            days = _to_days(pd.DatetimeIndex(parsed))
+        strict = int((days != INVALID_DAY).sum())
+
+        retry = [i for i in non_empty if days[i] == INVALID_DAY]
+        failed = 0
+        for i in retry:
+            parsed = self._parse_flexible(uniques[i])
+            if parsed is None:
+                failed += 1
+            else:
+                days[i] = _to_days(pd.DatetimeIndex([parsed]))[0]
+        with self._lock:
+            self.fast_path += strict
+            self.fallback += len(retry)
+            self.failures += failed
+        return days
+
+
+def _to_days(parsed):
+    """
+    Purpose:
+        Converts parsed datetimes to day ordinals, keeping local wall time
+        for values that carry a UTC offset.
+    Parameters:
+        parsed (DatetimeIndex): The parsed values; NaT allowed.
+    Returns:
+        ndarray: int64 days since 1970-01-01, INVALID_DAY for NaT.
+    """
+    if parsed.tz is not None:
+        parsed = parsed.tz_localize(None)
+    return parsed.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(
+        np.int64
+    )
+
+
+# One engine shared by the record classes and the columnar store
+DATE_PARSER = DateParser()
@@ -0,0 +1,595 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the HTTP client file for the final project.
+
+All downloads go through one pooled requests.Session that asks for gzip or
+deflate compression, retries failed requests with exponential backoff, and
+resumes a body cut off partway with an HTTP Range request instead of starting
+over. With a spool path the compressed bytes are also written to disk, so a
+download interrupted in one run is resumed by the next. The spool is locked
+while in use; a second download of the same export skips it.
+"""
+
+import fcntl  # For locking a spool file against other processes
+import http.client  # For the errors of a connection dropped mid-body
+import io  # For the readable stream interface
+import json  # For the spool metadata
+import logging  # For leveled log output
+import os  # For spool files
+import time  # For backoff delays
+import zlib  # For decoding gzip/deflate bodies
+import requests  # For the pooled session
+from requests.adapters import HTTPAdapter  # For the connection pool size
+from urllib3.exceptions import ProtocolError, ReadTimeoutError  # Mid-body failures
+
+DEFAULT_TIMEOUT = 60  # Seconds to wait for the server between reads
+DEFAULT_RETRIES = 4  # Attempts after the first, per request or resume
+DEFAULT_BACKOFF = 0.5  # Seconds before the first retry; doubled each time
+MAX_BACKOFF = 30  # Longest wait between attempts, in seconds
+POOL_SIZE = 4  # Connections kept open per host
+READ_BLOCK = 1 << 16  # Compressed bytes read from the network at a time
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Errors after which a request is retried or a body is resumed. Others, such
+# as an invalid URL, fail the same way every time and are raised at once.
+TRANSIENT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    ProtocolError,
+    ReadTimeoutError,
+    http.client.IncompleteRead,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ResumeError(requests.exceptions.RequestException):
+    """
+    Purpose:
+        Raised when a cut-off body cannot be resumed, e.g. because the export
+        changed on the server in the meantime.
+    """
+
+
+def _decoder(encoding):
+    """
+    Purpose:
+        Returns a streaming decoder for a Content-Encoding.
+    Parameters:
+        encoding (str): The Content-Encoding header, or None.
+    Returns:
+        object or None: A zlib decompress object, or None for identity.
+    Raises:
+        ResumeError: If the encoding is not supported.
+    """
+    encoding = (encoding or "identity").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return zlib.decompressobj(zlib.MAX_WBITS)
+    if encoding == "identity":
+        return None
+    raise ResumeError(f"Unsupported Content-Encoding: {encoding}")
+
+
+def _validator(headers):
+    """
+    Purpose:
+        Returns the validator used in If-Range to make sure a resumed body
+        belongs to the same version of the export.
+    Parameters:
+        headers (Mapping): The response headers.
+    Returns:
+        str or None: A strong ETag, else Last-Modified, else None.
+    """
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def _lock_spool(spool_path):
+    """
+    Purpose:
+        Takes an exclusive lock on a spool file, so two processes downloading
+        the same export never write or truncate each other's part.
+    Parameters:
+        spool_path (str): The spool file.
+    Returns:
+        int or None: The descriptor holding the lock, or None if another
+                     download holds it or the lock file cannot be created.
+    """
+    try:
+        os.makedirs(os.path.dirname(spool_path) or ".", exist_ok=True)
+        fd = os.open(spool_path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+class HttpClient:
+    """
+    Purpose:
+        A pooled, retrying HTTP client shared by every download of a model.
+    Attributes:
+        session (Session): The pooled session.
+        timeout (float): Seconds to wait for the server between reads.
+        retries (int): Attempts after the first, per request or resume.
+        backoff (float): Seconds before the first retry; doubled each time.
+        max_backoff (float): The longest wait between attempts.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, max_backoff=MAX_BACKOFF,
+                 pool_size=POOL_SIZE):
+        """
+        Purpose:
+            Creates the session and its connection pool.
+        Parameters:
+            timeout (float): Seconds to wait for the server between reads.
+            retries (int): Attempts after the first, per request or resume.
+            backoff (float): Seconds before the first retry.
+            max_backoff (float): The longest wait between attempts.
+            pool_size (int): Connections kept open per host.
+        Returns:
+            Nothing
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+
+    def close(self):
+        """
+        Purpose:
+            Closes the pooled connections.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        self.session.close()
+
+    def delay(self, attempt, response=None):
+        """
+        Purpose:
+            Returns the wait before a retry: exponential backoff, or the
+            server's Retry-After if it asks for longer.
+        Parameters:
+            attempt (int): The retry number, from 0.
+            response (Response): The failed response, or None.
+        Returns:
+            float: Seconds to wait.
+        """
+        wait = min(self.max_backoff, self.backoff * 2 ** attempt)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            wait = max(wait, min(self.max_backoff, float(retry_after)))
+        return wait
+
+    def get(self, url, headers=None, stream=False):
+        """
+        Purpose:
+            Sends a GET request, retrying connection failures, timeouts and
+            429/5xx answers with exponential backoff.
+        Parameters:
+            url (str): The URL.
+            headers (dict): Extra request headers, or None.
+            stream (bool): Leave the body unread for streaming.
+        Returns:
+            Response: The last response; it may still be an error status.
+        Raises:
+            RequestException: If every attempt failed to connect.
+        """
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = self.session.get(
+                    url, headers=headers, stream=stream, timeout=self.timeout
+                )
+            except TRANSIENT_ERRORS as e:
+                if last_attempt:
+                    raise
+                wait = self.delay(attempt)
+                logger.warning("GET %s failed (%s); retrying in %.1fs", url, e, wait)
+            else:
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    return response
+                wait = self.delay(attempt, response)
+                logger.warning("GET %s answered %d; retrying in %.1fs",
+                               url, response.status_code, wait)
+                response.close()
+            time.sleep(wait)
+
+    def open(self, url, headers=None, spool_path=None, keep_body=False):
+        """
+        Purpose:
+            Starts a resumable download and returns it as a readable stream
+            of the decoded body.
+        Parameters:
+            url (str): The URL.
+            headers (dict): Extra request headers, e.g. conditional ones.
+            spool_path (str): Where to keep the compressed body while it
+                              downloads, so a later run can resume it; None
+                              to keep nothing on disk. Ignored while
+                              another download holds the spool.
+            keep_body (bool): Keep an uncompressed spooled body once complete
+                              instead of deleting it; see Download.body_path.
+        Returns:
+            Download: The download; check status_code before reading.
+        Raises:
+            RequestException: If the request failed.
+        """
+        return Download(self, url, headers, spool_path, keep_body)
+
+
+class Download(io.RawIOBase):
+    """
+    Purpose:
+        The decoded body of one GET request as a readable stream. When the
+        connection drops, the rest of the compressed body is requested with
+        Range/If-Range and decoding carries on where it stopped. A spooled
+        partial body from an earlier run is replayed before the network.
+    Attributes:
+        url (str): The URL.
+        status_code (int): The status of the response.
+        headers (Mapping): The headers of the response.
+        resumes (int): The number of times the body was resumed.
+        body_path (str): With keep_body, the spool file when it holds the
+                         body as served without compression; it is complete,
+                         and the caller's to delete, once the stream is read
+                         to the end. None otherwise.
+    """
+
+    def __init__(self, client, url, headers=None, spool_path=None,
+                 keep_body=False):
+        """
+        Purpose:
+            Sends the request, asking for the rest of a spooled partial body
+            if there is one.
+        Parameters:
+            client (HttpClient): The client sending the requests.
+            url (str): The URL.
+            headers (dict): Extra request headers, or None.
+            spool_path (str): The spool file, or None. It stays locked until
+                              the download is closed; if another download
+                              holds it, nothing is spooled.
+            keep_body (bool): Keep an uncompressed spooled body once complete.
+        Returns:
+            Nothing
+        Raises:
+            RequestException: If the request failed.
+        """
+        super().__init__()
+        self.url = url
+        self.resumes = 0
+        self.body_path = None
+        self._client = client
+        self._headers = dict(headers or {})
+        self._lock_fd = None  # Holds the spool lock while downloading
+        if spool_path is not None:
+            self._lock_fd = _lock_spool(spool_path)
+            if self._lock_fd is None:
+                logger.info("%s is in use by another download; "
+                            "downloading without a spool", spool_path)
+                spool_path = None
+        self._spool_path = spool_path
+        self._spool = None  # The open spool file while downloading
+        self._replay = None  # A spooled part being replayed
+        self._offset = 0  # Compressed bytes of the body received so far
+        self._pending = b""  # Decoded bytes not yet returned
+        self._done = False
+
+        partial = self._read_spool_meta()
+        request_headers = dict(self._headers)
+        if partial:
+            request_headers["Range"] = f"bytes={partial['size']}-"
+            request_headers["If-Range"] = partial["validator"]
+        try:
+            self._response = client.get(url, request_headers, stream=True)
+            if self._response.status_code == 416 and partial:
+                # The spooled part is as long as the export or longer; start over
+                logger.warning("Discarding unusable partial download of %s", url)
+                self._response.close()
+                self._remove_spool()
+                partial = None
+                self._response = client.get(url, self._headers, stream=True)
+        except BaseException:
+            self._unlock_spool()
+            raise
+        self.status_code = self._response.status_code
+        self.headers = self._response.headers
+
+        if self.status_code == 206 and partial:
+            # The server kept our version: replay the spooled part first
+            self.headers = dict(self._response.headers)
+            self.headers["Content-Encoding"] = partial["encoding"] or "identity"
+            self._validator = partial["validator"]
+            self._decoder = _decoder(partial["encoding"])
+            self._replay = open(spool_path, "rb")
+            self._open_spool("ab")
+        elif self.status_code == 200:
+            self._validator = _validator(self.headers)
+            self._decoder = _decoder(self.headers.get("Content-Encoding"))
+            if spool_path is not None:
+                self._open_spool("wb")
+        else:
+            self._done = True
+        if keep_body and self._spool is not None and self._decoder is None:
+            self.body_path = spool_path
+
+    def _meta_path(self):
+        """
+        Purpose:
+            Returns the path of the spool metadata file.
+        Parameters:
+            Nothing
+        Returns:
+            str: The spool path with '.json' appended.
+        """
+        return self._spool_path + ".json"
+
+    def _read_spool_meta(self):
+        """
+        Purpose:
+            Returns what is known about a partial body left in the spool by an
+            earlier, interrupted download of the same URL.
+        Parameters:
+            Nothing
+        Returns:
+            dict or None: 'size', 'validator' and 'encoding', or None if
+                          there is nothing to resume.
+        """
+        if self._spool_path is None:
+            return None
+        try:
+            with open(self._meta_path(), encoding="utf-8") as file:
+                meta = json.load(file)
+            size = os.path.getsize(self._spool_path)
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != self.url or not meta.get("validator") or size == 0:
+            return None
+        meta["size"] = size
+        return meta
+
+    def _open_spool(self, mode):
+        """
+        Purpose:
+            Opens the spool file and records how to resume it.
+        Parameters:
+            mode (str): 'wb' for a new body, 'ab' to extend a partial one.
+        Returns:
+            Nothing
+        """
+        if self._spool_path is None or not self._validator:
+            return
+        os.makedirs(os.path.dirname(self._spool_path) or ".", exist_ok=True)
+        meta = {
+            "url": self.url,
+            "validator": self._validator,
+            "encoding": self.headers.get("Content-Encoding"),
+        }
+        with open(self._meta_path(), "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        self._spool = open(self._spool_path, mode)
+
+    def raise_for_status(self):
+        """
+        Purpose:
+            Raises for an error status, like Response.raise_for_status.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        Raises:
+            HTTPError: If the status is 400 or above.
+        """
+        self._response.raise_for_status()
+
+    def readable(self):
+        """
+        Purpose:
+            Reports that the stream can be read.
+        Parameters:
+            Nothing
+        Returns:
+            bool: True
+        """
+        return True
+
+    def readinto(self, buffer):
+        """
+        Purpose:
+            Fills a buffer with decoded body bytes.
+        Parameters:
+            buffer (bytearray): The buffer to fill.
+        Returns:
+            int: The number of bytes read, 0 at the end of the body.
+        """
+        while not self._pending and not self._done:
+            self._pending = self._decode(self._next_block())
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def _decode(self, block):
+        """
+        Purpose:
+            Decodes a block of the compressed body.
+        Parameters:
+            block (bytes): Compressed bytes; empty at the end of the body.
+        Returns:
+            bytes: The decoded bytes.
+        """
+        if self._decoder is None:
+            return block
+        if block:
+            return self._decoder.decompress(block)
+        return self._decoder.flush()
+
+    def _next_block(self):
+        """
+        Purpose:
+            Returns the next block of the compressed body, from the replayed
+            spool or the network, resuming after a dropped connection.
+        Parameters:
+            Nothing
+        Returns:
+            bytes: The block; empty at the end of the body.
+        Raises:
+            RequestException: If the body could not be resumed.
+        """
+        if self._replay is not None:
+            block = self._replay.read(READ_BLOCK)
+            if block:
+                self._offset += len(block)
+                return block
+            self._replay.close()
+            self._replay = None
+
+        attempt = 0
+        while True:
+            try:
+                block = self._response.raw.read(READ_BLOCK, decode_content=False)
+            except TRANSIENT_ERRORS as e:
+                if attempt >= self._client.retries:
+                    raise ResumeError(
+                        f"Download of {self.url} failed after {self._offset} bytes: {e}"
+                    ) from e
+                wait = self._client.delay(attempt)
+                logger.warning("Download of %s dropped after %d bytes (%s); "
+                               "resuming in %.1fs", self.url, self._offset, e, wait)
+                time.sleep(wait)
+                attempt += 1
+                self._resume()
+                continue
+            if not block:
+                self._finish()
+                return b""
+            self._offset += len(block)
+            if self._spool is not None:
+                self._spool.write(block)
+            return block
+
+    def _resume(self):
+        """
+        Purpose:
+            Requests the rest of the body from the current offset. A server
+            without range support sends the whole body again, and the part
+            already received is skipped, provided it is the same version.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        Raises:
+            ResumeError: If the export changed or the answer cannot be used.
+        """
+        self._response.close()
+        headers = dict(self._headers)
+        headers["Range"] = f"bytes={self._offset}-"
+        if self._validator:
+            headers["If-Range"] = self._validator
+        response = self._client.get(self.url, headers, stream=True)
+        self._response = response
+        self.resumes += 1
+        if response.status_code == 206:
+            start = response.headers.get("Content-Range", "").partition(" ")[2]
+            if not start.startswith(f"{self._offset}-"):
+                raise ResumeError(f"Unexpected Content-Range from {self.url}: {start}")
+            return
+        if response.status_code == 200 and self._validator and (
+            _validator(response.headers) == self._validator
+        ):
+            skip = self._offset
+            while skip:
+                block = response.raw.read(min(skip, READ_BLOCK), decode_content=False)
+                if not block:
+                    raise ResumeError(f"Body of {self.url} became shorter")
+                skip -= len(block)
+            return
+        raise ResumeError(
+            f"Cannot resume {self.url}: answered {response.status_code} "
+            "for a different version of the export"
+        )
+
+    def _finish(self):
+        """
+        Purpose:
+            Marks the body as complete and removes its spool files, which
+            are no longer needed to resume.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        self._done = True
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+            if self.body_path is None:
+                self._remove_spool()
+            else:
+                os.remove(self._meta_path())  # Complete: nothing to resume
+
+    def _remove_spool(self):
+        """
+        Purpose:
+            Deletes the spool file and its metadata, if they exist.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        for path in (self._spool_path, self._meta_path()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _unlock_spool(self):
+        """
+        Purpose:
+            Releases the spool lock, if this download holds it.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # Closing the descriptor drops the lock
+            self._lock_fd = None
+
+    def close(self):
+        """
+        Purpose:
+            Releases the connection and the spool lock. A partial body stays
+            in the spool so a later download can resume it.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        if self._replay is not None:
+            self._replay.close()
+            self._replay = None
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        self._response.close()
+        self._unlock_spool()
+        super().close()
@@ -0,0 +1,474 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the timing and profiling file for the final project.
+
+Every public method of the model, the controller and the view is timed into a
+per-stage latency histogram. The histograms can be shown from the dashboard or
+dumped as JSON, and a cProfile and/or tracemalloc capture can be switched on
+with --profile or $DASHBOARD_PROFILE:
+
+    python data_dashboard.py --profile cprofile,tracemalloc --timings-json timings.json
+"""
+
+import bisect  # For finding the histogram bucket of a latency
+import functools  # For keeping the wrapped method's name and docstring
+import inspect  # For finding the plain methods of a class
+import json  # For dumping the histograms
+import logging  # For leveled log output
+import os  # For the profiling environment variable and output paths
+import threading  # For recording from several threads
+import time  # For the timer
+from contextlib import contextmanager  # For the timing context
+
+PROFILE_ENV = "DASHBOARD_PROFILE"
+PROFILE_MODES = ("cprofile", "tracemalloc")
+# Upper bounds of the histogram buckets, in milliseconds; slower calls land
+# in a last, open-ended bucket
+BUCKET_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+                    1000, 2500, 5000, 10000)
+TOP_STATS = 25  # Lines of profile output logged
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """
+    Purpose:
+        Summarizes the latencies of one stage in fixed, roughly logarithmic
+        buckets, so recording costs the same however many calls are made.
+    Attributes:
+        count (int): The number of calls recorded.
+        total (float): Their total duration in seconds.
+        max (float): The slowest call in seconds.
+        buckets (list): The number of calls per bucket of BUCKET_BOUNDS_MS,
+                        plus one for slower calls.
+    """
+
+    def __init__(self):
+        """
+        Purpose:
+            Initializes an empty histogram.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def add(self, seconds):
+        """
+        Purpose:
+            Records one call.
+        Parameters:
+            seconds (float): The duration of the call.
+        Returns:
+            Nothing
+        """
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, seconds * 1000)] += 1
+
+    def percentile(self, fraction):
+        """
+        Purpose:
+            Estimates a latency percentile as the upper bound of the bucket
+            holding it.
+        Parameters:
+            fraction (float): The percentile as a fraction, e.g. 0.95.
+        Returns:
+            float: The estimate in milliseconds; the slowest call if it falls
+                   in the open-ended bucket, 0 if nothing was recorded.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, calls in zip(BUCKET_BOUNDS_MS, self.buckets):
+            seen += calls
+            if seen >= rank:
+                return min(float(bound), self.max * 1000)
+        return self.max * 1000
+
+    def to_dict(self):
+        """
+        Purpose:
+            Returns the histogram as JSON-serializable values.
+        Parameters:
+            Nothing
+        Returns:
+            dict: Count, mean, p50, p95 and max in milliseconds, and the
+                  non-empty buckets keyed by their upper bound.
+        """
+        labels = [f"<={bound}ms" for bound in BUCKET_BOUNDS_MS]
+        labels.append(f">{BUCKET_BOUNDS_MS[-1]}ms")
+        return {
+            "count": self.count,
+            "mean_ms": self.total * 1000 / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": self.max * 1000,
+            "buckets": {label: calls for label, calls
+                        in zip(labels, self.buckets) if calls},
+        }
+
+
+class LatencyRecorder:
+    """
+    Purpose:
+        Collects one latency histogram per stage, from any thread.
+    Attributes:
+        enabled (bool): Whether calls are recorded.
+    """
+
+    def __init__(self):
+        """
+        Purpose:
+            Initializes an empty recorder.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        self.enabled = True
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        """
+        Purpose:
+            Records one call of a stage.
+        Parameters:
+            stage (str): The stage name, e.g. 'DataModel.prepare_line_chart_data'.
+            seconds (float): The duration of the call.
+        Returns:
+            Nothing
+        """
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def stats(self):
+        """
+        Purpose:
+            Returns every stage's histogram.
+        Parameters:
+            Nothing
+        Returns:
+            dict: Stage name -> LatencyHistogram.to_dict(), sorted by name.
+        """
+        with self._lock:
+            return {stage: self._histograms[stage].to_dict()
+                    for stage in sorted(self._histograms)}
+
+    def reset(self):
+        """
+        Purpose:
+            Forgets every recorded call.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        with self._lock:
+            self._histograms.clear()
+
+    def dump_json(self, path):
+        """
+        Purpose:
+            Writes the histograms to a JSON file.
+        Parameters:
+            path (str): The file to write.
+        Returns:
+            Nothing
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.stats(), file, indent=2)
+        logger.info("Wrote latency histograms to %s", path)
+
+    def format_table(self):
+        """
+        Purpose:
+            Formats the histograms as a fixed-width table, slowest total
+            first, for display in the dashboard.
+        Parameters:
+            Nothing
+        Returns:
+            str: The table, or a note if nothing was recorded.
+        """
+        stats = self.stats()
+        if not stats:
+            return "No calls recorded yet."
+        rows = sorted(stats.items(),
+                      key=lambda item: item[1]["mean_ms"] * item[1]["count"],
+                      reverse=True)
+        width = max(len(stage) for stage in stats)
+        lines = [f"{'Stage':<{width}} {'Calls':>7} {'Mean ms':>9} "
+                 f"{'p50 ms':>9} {'p95 ms':>9} {'Max ms':>9}"]
+        for stage, row in rows:
+            lines.append(
+                f"{stage:<{width}} {row['count']:>7} {row['mean_ms']:>9.2f} "
+                f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['max_ms']:>9.2f}"
+            )
+        return "\n".join(lines)
+
+
+RECORDER = LatencyRecorder()  # Shared by every instrumented class
+
+
+@contextmanager
+def timing(stage, recorder=None):
+    """
+    Purpose:
+        Times the enclosed block as one call of a stage, even if it raises.
+    Parameters:
+        stage (str): The stage name.
+        recorder (LatencyRecorder): Where to record, or None for RECORDER.
+    Returns:
+        Nothing; used as a with statement.
+    """
+    recorder = recorder or RECORDER
+    if not recorder.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.record(stage, time.perf_counter() - start)
+
+
+def timed(stage, recorder=None):
+    """
+    Purpose:
+        Decorates a function so each call is timed as one call of a stage.
+    Parameters:
+        stage (str): The stage name.
+        recorder (LatencyRecorder): Where to record, or None for RECORDER.
+    Returns:
+        callable: The decorator.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            target = recorder or RECORDER
+            if not target.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                target.record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def untimed(function):
+    """
+    Purpose:
+        Marks a public method that instrument should leave alone, such as an
+        event loop that runs for the whole session.
+    Parameters:
+        function (callable): The method.
+    Returns:
+        callable: The same method, marked.
+    """
+    function.untimed = True
+    return function
+
+
+def instrument(cls):
+    """
+    Purpose:
+        Class decorator timing every public method defined on the class, each
+        as the stage 'ClassName.method'. Properties, static and class methods,
+        private methods and methods marked with untimed are left alone.
+    Parameters:
+        cls (type): The class to instrument.
+    Returns:
+        type: The same class.
+    """
+    for name, value in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.isfunction(value):
+            continue
+        if getattr(value, "untimed", False):
+            continue
+        setattr(cls, name, timed(f"{cls.__name__}.{name}")(value))
+    return cls
+
+
+def parse_profile_modes(value):
+    """
+    Purpose:
+        Parses a comma separated list of profiling modes.
+    Parameters:
+        value (str): e.g. 'cprofile,tracemalloc'; empty or None for none.
+    Returns:
+        tuple: The modes, in PROFILE_MODES order.
+    Raises:
+        ValueError: If a mode is not in PROFILE_MODES.
+    """
+    modes = {mode.strip().lower() for mode in (value or "").split(",") if mode.strip()}
+    unknown = modes - set(PROFILE_MODES)
+    if unknown:
+        raise ValueError(f"Unknown profile modes: {', '.join(sorted(unknown))}. "
+                         f"Use {' or '.join(PROFILE_MODES)}.")
+    return tuple(mode for mode in PROFILE_MODES if mode in modes)
+
+
+def add_profiling_options(parser):
+    """
+    Purpose:
+        Adds the --profile, --profile-dir and --timings-json options to a
+        command line parser.
+    Parameters:
+        parser (ArgumentParser): The parser.
+    Returns:
+        Nothing
+    """
+    parser.add_argument("--profile", default=None, metavar="MODES",
+                        help="comma separated capture modes: "
+                             f"{','.join(PROFILE_MODES)} (default: ${PROFILE_ENV})")
+    parser.add_argument("--profile-dir", default=".",
+                        help="directory for the profile files (default: .)")
+    parser.add_argument("--timings-json", default=None, metavar="PATH",
+                        help="write the per-stage latency histograms here on exit")
+
+
+class Profiler:
+    """
+    Purpose:
+        Captures a cProfile profile and/or tracemalloc allocation statistics
+        between start and stop, then writes them next to each other and logs
+        the top entries. cProfile covers the thread that started it, i.e.
+        the Tk thread in the dashboard.
+    Attributes:
+        modes (tuple): The capture modes, from PROFILE_MODES.
+        output_dir (str): The directory the captures are written to.
+        name (str): The file name prefix.
+    """
+
+    def __init__(self, modes, output_dir=".", name="dashboard"):
+        """
+        Purpose:
+            Initializes a stopped profiler.
+        Parameters:
+            modes (tuple): The capture modes, from PROFILE_MODES.
+            output_dir (str): The directory the captures are written to.
+            name (str): The file name prefix.
+        Returns:
+            Nothing
+        """
+        self.modes = tuple(modes)
+        self.output_dir = output_dir
+        self.name = name
+        self._profile = None
+
+    @classmethod
+    def from_options(cls, args, name="dashboard"):
+        """
+        Purpose:
+            Builds the profiler selected by the options of
+            add_profiling_options, falling back to $DASHBOARD_PROFILE.
+        Parameters:
+            args (Namespace): The parsed command line options.
+            name (str): The file name prefix.
+        Returns:
+            Profiler: The profiler, capturing nothing if no mode is selected.
+        Raises:
+            ValueError: If a mode is unknown.
+        """
+        value = args.profile if args.profile is not None else os.environ.get(PROFILE_ENV)
+        return cls(parse_profile_modes(value), args.profile_dir, name)
+
+    def start(self):
+        """
+        Purpose:
+            Starts the selected captures.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        if "tracemalloc" in self.modes:
+            import tracemalloc  # Only loaded when capturing
+            tracemalloc.start(10)
+        if "cprofile" in self.modes:
+            import cProfile  # Only loaded when capturing
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self):
+        """
+        Purpose:
+            Stops the captures and writes them: '<name>.prof' (load with
+            pstats or snakeviz) and '<name>-memory.txt'.
+        Parameters:
+            Nothing
+        Returns:
+            list: The paths written.
+        """
+        paths = []
+        if self.modes:
+            os.makedirs(self.output_dir, exist_ok=True)
+        if self._profile is not None:
+            import io  # For capturing the pstats report
+            import pstats  # For summarizing the profile
+            self._profile.disable()
+            path = os.path.join(self.output_dir, f"{self.name}.prof")
+            self._profile.dump_stats(path)
+            report = io.StringIO()
+            pstats.Stats(self._profile, stream=report).sort_stats(
+                "cumulative"
+            ).print_stats(TOP_STATS)
+            logger.info("cProfile top functions:\n%s", report.getvalue())
+            self._profile = None
+            paths.append(path)
+        if "tracemalloc" in self.modes:
+            import tracemalloc  # Only loaded when capturing
+            if tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                lines = [f"current={current / 1e6:.1f} MB peak={peak / 1e6:.1f} MB"]
+                lines += [str(stat) for stat
+                          in snapshot.statistics("lineno")[:TOP_STATS]]
+                path = os.path.join(self.output_dir, f"{self.name}-memory.txt")
+                with open(path, "w", encoding="utf-8") as file:
+                    file.write("\n".join(lines) + "\n")
+                logger.info("tracemalloc top allocations:\n%s", "\n".join(lines))
+                paths.append(path)
+        return paths
+
+    def __enter__(self):
+        """
+        Purpose:
+            Starts the captures.
+        Parameters:
+            Nothing
+        Returns:
+            Profiler: This profiler.
+        """
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Purpose:
+            Stops and writes the captures, even if the block raised.
+        Parameters:
+            exc_type (type): The exception type, if any.
+            exc_value (Exception): The exception, if any.
+            traceback (traceback): The traceback, if any.
+        Returns:
+            bool: False, so exceptions propagate.
+        """
+        self.stop()
+        return False
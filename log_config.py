@@ -0,0 +1,103 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the logging setup file for the final project.
+"""
+
+import logging  # For leveled, lazily formatted log records
+import os  # For the log level environment variable
+import time  # For timing phases
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+DEFAULT_LEVEL = "INFO"
+
+
+def configure_logging(level=None):
+    """
+    Purpose:
+        Configures the root logger for the dashboard. Debug output, including
+        the per-record messages, is only produced at the DEBUG level.
+    Parameters:
+        level (str): A level name such as 'DEBUG' or 'WARNING', or None to use
+                     $DASHBOARD_LOG_LEVEL (default INFO).
+    Returns:
+        int: The numeric level that was set.
+    """
+    if level is None:
+        level = os.environ.get("DASHBOARD_LOG_LEVEL", DEFAULT_LEVEL)
+    numeric_level = logging.getLevelName(str(level).upper())
+    if not isinstance(numeric_level, int):
+        numeric_level = logging.INFO
+    logging.basicConfig(level=numeric_level, format=LOG_FORMAT, force=True)
+    return numeric_level
+
+
+class PhaseCounter:
+    """
+    Purpose:
+        Counts events during one processing phase and logs a single summary
+        line when the phase ends, instead of one line per event.
+    Attributes:
+        logger (Logger): The logger that receives the summary.
+        phase (str): A short description of the phase.
+        counts (dict): The counter values, in insertion order.
+    """
+
+    def __init__(self, logger, phase, level=logging.INFO):
+        """
+        Purpose:
+            Initializes the counter for a phase.
+        Parameters:
+            logger (Logger): The logger that receives the summary.
+            phase (str): A short description of the phase.
+            level (int): The level of the summary line.
+        Returns:
+            Nothing
+        """
+        self.logger = logger
+        self.phase = phase
+        self.level = level
+        self.counts = {}
+        self._start = None
+
+    def add(self, name, amount=1):
+        """
+        Purpose:
+            Adds to a named counter.
+        Parameters:
+            name (str): The counter name.
+            amount (int): The amount to add.
+        Returns:
+            Nothing
+        """
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def __enter__(self):
+        """
+        Purpose:
+            Starts timing the phase.
+        Parameters:
+            Nothing
+        Returns:
+            PhaseCounter: This counter.
+        """
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Purpose:
+            Logs the summary line, unless the phase raised.
+        Parameters:
+            exc_type (type): The exception type, if any.
+            exc_value (Exception): The exception, if any.
+            traceback (traceback): The traceback, if any.
+        Returns:
+            bool: False, so exceptions propagate.
+        """
+        if exc_type is None and self.logger.isEnabledFor(self.level):
+            elapsed = time.perf_counter() - self._start
+            summary = ", ".join(f"{name}={value}" for name, value in self.counts.items())
+            self.logger.log(self.level, "%s: %s (%.3fs)", self.phase, summary, elapsed)
+        return False
@@ -0,0 +1,125 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the neighborhood index file for the final project.
+"""
+
+import difflib  # For fuzzy matching of mistyped names
+import re  # For normalizing names into lookup keys
+import sys  # For interning canonical names
+
+FUZZY_CUTOFF = 0.75  # Minimum similarity for a fuzzy match
+MAX_SUGGESTIONS = 3
+
+
+def name_key(name):
+    """
+    Purpose:
+        Normalizes a neighborhood name for lookups, ignoring case, spacing and
+        punctuation, so 'kensington cedar-cottage' matches
+        'Kensington-Cedar Cottage'.
+    Parameters:
+        name (str): The raw name.
+    Returns:
+        str: The lookup key.
+    """
+    return " ".join(re.split(r"[^0-9a-z]+", name.lower())).strip()
+
+
+class NeighborhoodIndex:
+    """
+    Purpose:
+        Holds the canonical neighborhood names found in the loaded data, each
+        with an interned string and a small integer ID, and resolves user input
+        to a canonical name by exact, normalized, prefix or fuzzy matching.
+    Attributes:
+        names (list): The canonical names, sorted; a name's ID is its position.
+        ids (dict): The ID of each canonical name.
+    """
+
+    def __init__(self, names):
+        """
+        Purpose:
+            Builds the index from the area names of the loaded datasets.
+        Parameters:
+            names (iterable): Area names; duplicates and empty names are
+                              ignored.
+        Returns:
+            Nothing
+        """
+        self.names = sorted({sys.intern(name) for name in names if name})
+        self.ids = {name: area_id for area_id, name in enumerate(self.names)}
+        self._by_key = {name_key(name): name for name in self.names}
+
+    def __len__(self):
+        """
+        Purpose:
+            Returns the number of canonical names.
+        Parameters:
+            Nothing
+        Returns:
+            int: The number of names.
+        """
+        return len(self.names)
+
+    def __contains__(self, name):
+        """
+        Purpose:
+            Checks whether a name is canonical.
+        Parameters:
+            name (str): The name to check.
+        Returns:
+            bool: True if the name is in the index.
+        """
+        return name in self.ids
+
+    def resolve(self, text):
+        """
+        Purpose:
+            Resolves user input to a canonical neighborhood name.
+        Parameters:
+            text (str): The user input.
+        Returns:
+            str or None: The canonical name, or None if the input matches no
+                         neighborhood or more than one.
+        """
+        text = text.strip()
+        if text in self.ids:
+            return text
+        key = name_key(text)
+        if not key:
+            return None
+        if key in self._by_key:
+            return self._by_key[key]
+        prefixed = [name for k, name in self._by_key.items() if k.startswith(key)]
+        if len(prefixed) == 1:
+            return prefixed[0]
+        if prefixed:
+            return None  # Ambiguous prefix such as 'k'
+        close = difflib.get_close_matches(key, self._by_key, n=2, cutoff=FUZZY_CUTOFF)
+        if len(close) == 1 or (
+            len(close) == 2
+            and difflib.SequenceMatcher(None, key, close[0]).ratio()
+            > difflib.SequenceMatcher(None, key, close[1]).ratio()
+        ):
+            return self._by_key[close[0]]
+        return None
+
+    def suggest(self, text):
+        """
+        Purpose:
+            Lists canonical names resembling the input, for error messages.
+        Parameters:
+            text (str): The user input.
+        Returns:
+            list: Up to MAX_SUGGESTIONS canonical names.
+        """
+        key = name_key(text)
+        prefixed = [name for k, name in self._by_key.items() if key and k.startswith(key)]
+        if prefixed:
+            return prefixed[:MAX_SUGGESTIONS]
+        close = difflib.get_close_matches(
+            key, self._by_key, n=MAX_SUGGESTIONS, cutoff=0.5
+        )
+        return [self._by_key[k] for k in close]
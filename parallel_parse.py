@@ -0,0 +1,213 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the parallel parsing file for the final project.
+"""
+
+import io  # For parsing a byte range as a file
+import logging  # For leveled log output
+import mmap  # For scanning the export without reading it into memory
+import multiprocessing  # For the worker start method
+import os  # For the number of cores
+from concurrent.futures import ProcessPoolExecutor  # For parsing on every core
+from multiprocessing import shared_memory  # For returning arrays unpickled
+import numpy as np  # For the shared column arrays
+from record_store import RecordStore  # Columnar storage for parsed records
+from log_config import PhaseCounter  # Per-phase summary lines
+
+MIN_RANGE_BYTES = 1 << 20  # Smaller ranges cost more to schedule than to parse
+
+logger = logging.getLogger(__name__)
+
+
+def default_workers():
+    """
+    Purpose:
+        Returns the number of worker processes used when none is given.
+    Parameters:
+        Nothing
+    Returns:
+        int: The number of cores available to this process.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS and Windows
+        return os.cpu_count() or 1
+
+
+def pool_context():
+    """
+    Purpose:
+        Returns the start method of the worker processes. The pool is started
+        from the loader threads, and a forked child could inherit a lock
+        another thread holds (the date parser's, a logging handler's) and
+        deadlock, so workers start from a clean process instead.
+    Parameters:
+        Nothing
+    Returns:
+        BaseContext: The forkserver context, or spawn where unavailable.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+
+
+def split_ranges(path, parts, min_bytes=MIN_RANGE_BYTES):
+    """
+    Purpose:
+        Splits a CSV file into byte ranges that each hold whole records. A
+        range only ends at a newline outside quotes, found by tracking the
+        parity of quote characters, so quoted fields containing newlines are
+        never cut.
+    Parameters:
+        path (str): The CSV file.
+        parts (int): The number of ranges wanted.
+        min_bytes (int): The smallest range worth a separate task.
+    Returns:
+        tuple: (header, ranges) where header is the first line as bytes and
+               ranges is a list of (start, end, max_rows) tuples.
+    """
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b"", []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            header_end = data.find(b"\n") + 1 or size
+            header = data[:header_end]
+            target = max((size - header_end) // max(parts, 1) + 1, min_bytes)
+            ranges = []
+            start = header_end
+            while start < size:
+                cut = min(start + target, size)
+                odd = data[start:cut].count(b'"') & 1
+                while cut < size and (odd or data[cut - 1] != ord("\n")):
+                    newline = data.find(b"\n", cut)
+                    if newline < 0:
+                        cut = size
+                        break
+                    odd ^= data[cut:newline].count(b'"') & 1
+                    cut = newline + 1
+                # Every record ends in a newline except perhaps the last
+                ranges.append((start, cut, data[start:cut].count(b"\n") + 1))
+                start = cut
+    return header, ranges
+
+
+def _parse_range(path, header, start, end, schema, year, shm_name, row_offset):
+    """
+    Purpose:
+        Parses one byte range in a worker process and writes its day and area
+        code columns into the shared result block.
+    Parameters:
+        path (str): The CSV file.
+        header (bytes): The header line of the file.
+        start (int): The first byte of the range.
+        end (int): The byte after the range.
+        schema (DatasetSchema): The columns to read and how.
+        year (int): Keep only rows issued in this year, or None for all.
+        shm_name (str): The name of the shared result block.
+        row_offset (int): The first result row reserved for this range.
+    Returns:
+        tuple: (rows read, rows kept, area names of the local codes).
+    """
+    import pandas as pd  # Deferred: only the workers parse
+    with open(path, "rb") as file:
+        file.seek(start)
+        body = file.read(end - start)
+    data = pd.read_csv(io.BytesIO(header + body), **schema.read_options())
+    store = RecordStore(None)
+    kept = store.append(
+        data.get(schema.date_column), data.get(schema.area_column), year
+    )
+
+    block = shared_memory.SharedMemory(name=shm_name)
+    try:
+        days, codes = _result_arrays(block)
+        days[row_offset:row_offset + kept] = store.days
+        codes[row_offset:row_offset + kept] = store.codes
+        del days, codes  # Views must go before the block is closed
+    finally:
+        block.close()
+    return len(data), kept, store.area_names
+
+
+def _result_arrays(block):
+    """
+    Purpose:
+        Views a shared result block as its day and area code columns.
+    Parameters:
+        block (SharedMemory): A block holding two int32 columns of equal
+                              length.
+    Returns:
+        tuple: (days, codes) int32 arrays backed by the block.
+    """
+    capacity = int(np.frombuffer(block.buf, dtype=np.int64, count=1)[0])
+    days = np.ndarray(capacity, dtype=np.int32, buffer=block.buf, offset=8)
+    codes = np.ndarray(
+        capacity, dtype=np.int32, buffer=block.buf, offset=8 + capacity * 4
+    )
+    return days, codes
+
+
+def parse_csv_parallel(path, schema, year=None, workers=None, label="export",
+                       min_bytes=MIN_RANGE_BYTES):
+    """
+    Purpose:
+        Parses a CSV export on several cores. The file is split into byte
+        ranges on record boundaries, each range is parsed in a worker process,
+        and the workers write their columns straight into one shared memory
+        block, so only the few area names are pickled back.
+    Parameters:
+        path (str): The CSV file.
+        schema (DatasetSchema): The dataset's record class and the columns
+                                to read.
+        year (int): Keep only rows issued in this year, or None for all.
+        workers (int): The number of processes, or None for every core.
+        label (str): The name used in the log summary.
+        min_bytes (int): The smallest byte range given to one worker.
+    Returns:
+        RecordStore: The parsed records, in file order.
+    """
+    workers = workers or default_workers()
+    store = RecordStore(schema.record_type)
+    with PhaseCounter(logger, f"Parsed {label} in parallel") as phase:
+        header, ranges = split_ranges(path, workers, min_bytes)
+        phase.add("ranges", len(ranges))
+        phase.add("bytes", os.path.getsize(path))
+        if not ranges:
+            return store
+
+        offsets = np.cumsum([0] + [max_rows for _, _, max_rows in ranges])
+        capacity = int(offsets[-1])
+        block = shared_memory.SharedMemory(create=True, size=8 + capacity * 8)
+        try:
+            np.frombuffer(block.buf, dtype=np.int64, count=1)[0] = capacity
+            tasks = [
+                (path, header, start, end, schema, year, block.name,
+                 int(offset))
+                for (start, end, _), offset in zip(ranges, offsets)
+            ]
+            if workers == 1 or len(tasks) == 1:
+                results = [_parse_range(*task) for task in tasks]
+            else:
+                with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                                         mp_context=pool_context()) as pool:
+                    results = list(pool.map(_parse_range, *zip(*tasks)))
+
+            days, codes = _result_arrays(block)
+            part_days, part_codes = [], []
+            for (rows, kept, names), offset in zip(results, offsets):
+                phase.add("rows", rows)
+                phase.add("kept", kept)
+                remap = np.array([store.area_code(name) for name in names],
+                                 dtype=np.int32)
+                part_days.append(days[offset:offset + kept].copy())
+                part_codes.append(remap[codes[offset:offset + kept]])
+            del days, codes
+        finally:
+            block.close()
+            block.unlink()
+        store._set_columns(np.concatenate(part_days), np.concatenate(part_codes))
+    return store
@@ -0,0 +1,123 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the query result cache file for the final project.
+"""
+
+import threading  # For sharing the cache between threads
+from collections import OrderedDict  # For the least-recently-used order
+
+DEFAULT_SIZE = 256  # Results kept when no size is given
+
+
+class QueryCache:
+    """
+    Purpose:
+        A thread-safe, size-bounded cache of query results, evicting the least
+        recently used entry when full. Callers put the data version in the
+        key, so results of older data are simply never looked up again.
+    Attributes:
+        max_entries (int): The number of results kept.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that had to be computed.
+        evictions (int): Results dropped to make room or by clear().
+    """
+
+    def __init__(self, max_entries=DEFAULT_SIZE):
+        """
+        Purpose:
+            Initializes an empty cache.
+        Parameters:
+            max_entries (int): The number of results kept.
+        Returns:
+            Nothing
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """
+        Purpose:
+            Returns the number of cached results.
+        Parameters:
+            Nothing
+        Returns:
+            int: The number of entries.
+        """
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Purpose:
+            Returns a cached result and marks it as recently used.
+        Parameters:
+            key (tuple): The query key.
+        Returns:
+            object or None: The result, or None if not cached.
+        """
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        """
+        Purpose:
+            Stores a result, evicting the least recently used one if full.
+        Parameters:
+            key (tuple): The query key.
+            result (object): The result; None is not cached.
+        Returns:
+            Nothing
+        """
+        if result is None:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Purpose:
+            Drops every cached result, e.g. once the data they came from was
+            replaced.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        with self._lock:
+            self.evictions += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Purpose:
+            Returns the cache counters.
+        Parameters:
+            Nothing
+        Returns:
+            dict: size, max_entries, hits, misses, evictions and hit_rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
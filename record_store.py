@@ -0,0 +1,903 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the columnar record store file for the final project.
+"""
+
+import itertools  # For process-wide data generations
+import sys  # For interning area names
+import numpy as np  # For the compact column arrays
+from date_parser import DATE_PARSER, factorize_strings  # Shared parsing engine
+
+EPOCH_YEAR = 1970  # Day and month ordinals count from 1970-01-01
+EPOCH_WEEKDAY = 3  # 1970-01-01 was a Thursday; weeks start on Monday
+GRANULARITIES = ("day", "week", "month", "year")
+# Results RecordStore.aggregate can compute together
+MEASURES = ("series", "total", "area_totals", "area_series")
+# Data generations shared by every store, so no two different contents of any
+# stores ever carry the same version, even after a store is freed
+GENERATIONS = itertools.count(1)
+
+
+class RecordStore:
+    """
+    Purpose:
+        Holds parsed records as a struct of arrays instead of one Python object
+        per row: an int32 day ordinal and an int32 area code per record, plus
+        one interned name per distinct area. Record objects are only built
+        when a caller asks for them.
+    Attributes:
+        record_type (type): The record class (BuildingPermit or
+                            BusinessLicense) materialized on demand.
+        days (ndarray): int32 days since 1970-01-01 of each record.
+        codes (ndarray): int32 index into area_names of each record.
+        area_names (list): The distinct area names, indexed by code.
+        version (int): The data generation, unique across all stores; it
+                       changes whenever the stored rows change.
+    """
+
+    def __init__(self, record_type):
+        """
+        Purpose:
+            Initializes an empty store for the given record type.
+        Parameters:
+            record_type (type): The record class to materialize on demand.
+        Returns:
+            Nothing
+        """
+        self.record_type = record_type
+        self._days = np.empty(0, dtype=np.int32)
+        self._codes = np.empty(0, dtype=np.int32)
+        self.area_names = []
+        self._area_lookup = {}  # Area name -> code
+        self._pending = []  # Appended (days, codes) chunks not yet merged
+        self._records = None  # Cached list of materialized records
+        self._cube = None  # Cached MonthCube, rebuilt after the data changes
+        self._offsets = None  # Cached (order, starts) grouping rows by area
+        self.version = next(GENERATIONS)  # Renewed whenever the rows change
+
+    def _merge_pending(self):
+        """
+        Purpose:
+            Concatenates appended chunks into the main arrays, once, so that
+            streamed appends are not copied per chunk.
+        Parameters:
+            Nothing
+        Returns:
+            Nothing
+        """
+        if self._pending:
+            self._days = np.concatenate([self._days] + [d for d, _ in self._pending])
+            self._codes = np.concatenate([self._codes] + [c for _, c in self._pending])
+            self._pending = []
+
+    @property
+    def days(self):
+        """
+        Purpose:
+            Returns the day ordinal column.
+        Parameters:
+            Nothing
+        Returns:
+            ndarray: int32 days since 1970-01-01.
+        """
+        self._merge_pending()
+        return self._days
+
+    @property
+    def codes(self):
+        """
+        Purpose:
+            Returns the area code column.
+        Parameters:
+            Nothing
+        Returns:
+            ndarray: int32 codes into area_names.
+        """
+        self._merge_pending()
+        return self._codes
+
+    def _set_columns(self, days, codes):
+        """
+        Purpose:
+            Replaces both columns and drops everything derived from them.
+        Parameters:
+            days (ndarray): int32 day ordinals.
+            codes (ndarray): int32 area codes.
+        Returns:
+            Nothing
+        """
+        self._days = days
+        self._codes = codes
+        self._pending = []
+        self._records = None
+        self._cube = None
+        self._offsets = None
+        self.version = next(GENERATIONS)
+
+    def __len__(self):
+        """
+        Purpose:
+            Returns the number of records held.
+        Parameters:
+            Nothing
+        Returns:
+            int: The number of records.
+        """
+        return len(self._days) + sum(len(days) for days, _ in self._pending)
+
+    def __getitem__(self, index):
+        """
+        Purpose:
+            Builds a single record object without materializing the others.
+        Parameters:
+            index (int): The position of the record.
+        Returns:
+            object: A record of the store's record type.
+        """
+        day = int(self.days[index])
+        area = self.area_names[self.codes[index]]
+        return self.record_type.from_parsed(day_to_timestamp(day), area)
+
+    def area_code(self, name):
+        """
+        Purpose:
+            Returns the code of an area name, adding the name if it is new.
+        Parameters:
+            name (str): The area name.
+        Returns:
+            int: The area code.
+        """
+        code = self._area_lookup.get(name)
+        if code is None:
+            code = len(self.area_names)
+            name = sys.intern(name)
+            self.area_names.append(name)
+            self._area_lookup[name] = code
+        return code
+
+    def append(self, date_values, area_values, year=None):
+        """
+        Purpose:
+            Parses raw date and area columns in one vectorized pass and appends
+            the rows with a valid date. Categorical columns are decoded
+            through their categories, without a string per row.
+        Parameters:
+            date_values (Series or None): The raw issued date strings.
+            area_values (Series or None): The raw local area strings.
+            year (int): If given, rows issued in other years are dropped.
+        Returns:
+            int: The number of rows added.
+        """
+        if date_values is None:
+            return 0  # Without a date column no row can be valid
+        all_days, valid = DATE_PARSER.parse_days(date_values)
+        if area_values is None:
+            area_codes = np.full(len(all_days), -1, dtype=np.int64)
+            names = np.array([""], dtype=object)
+        else:
+            area_codes, names = factorize_strings(area_values)
+            names = np.append(names, "")  # Missing areas (code -1) read as ""
+
+        if year is not None:
+            start, end = year_day_range(year)
+            valid &= (all_days >= start) & (all_days < end)
+        if not valid.any():
+            return 0
+        days = all_days[valid].astype(np.int32)
+        import pandas as pd  # Deferred: only parsing needs pandas
+        local_codes, used = pd.factorize(area_codes[valid])
+        remap = np.array([self.area_code(str(names[code])) for code in used],
+                         dtype=np.int32)
+        self._pending.append((days, remap[local_codes]))
+        self._records = None
+        self._cube = None
+        self._offsets = None
+        self.version = next(GENERATIONS)
+        return len(days)
+
+    def filter_year(self, year):
+        """
+        Purpose:
+            Keeps only the records issued in the given year.
+        Parameters:
+            year (int): The year to keep.
+        Returns:
+            Nothing
+        """
+        start, end = year_day_range(year)
+        days = self.days
+        mask = (days >= start) & (days < end)
+        self._set_columns(days[mask], self.codes[mask])
+
+    def month_cube(self):
+        """
+        Purpose:
+            Returns the (area x month) count cube of the stored records,
+            building it on first use after the data changes.
+        Parameters:
+            Nothing
+        Returns:
+            MonthCube: The count cube.
+        """
+        if self._cube is None:
+            self._cube = MonthCube(self.days, self.codes, self.area_names)
+        return self._cube
+
+    def count_by_month(self, neighborhood=None):
+        """
+        Purpose:
+            Counts records per 'YYYY-MM' month, optionally for one
+            neighborhood.
+        Parameters:
+            neighborhood (str): The neighborhood to filter by, or None for all
+                                neighborhoods.
+        Returns:
+            dict: A dictionary with 'YYYY-MM' as keys and counts as values.
+        """
+        return self.month_cube().count_by_month(neighborhood)
+
+    def latest_day(self):
+        """
+        Purpose:
+            Returns the newest issued day held.
+        Parameters:
+            Nothing
+        Returns:
+            int or None: Days since 1970-01-01, or None if the store is empty.
+        """
+        if len(self) == 0:
+            return None
+        return int(self.days.max())
+
+    def copy(self):
+        """
+        Purpose:
+            Returns an independent store sharing the (never mutated) column
+            arrays, so a copy can be updated while readers use the original.
+        Parameters:
+            Nothing
+        Returns:
+            RecordStore: The copy, with a copy of the count cube if built.
+        """
+        store = RecordStore(self.record_type)
+        store.area_names = list(self.area_names)
+        store._area_lookup = dict(self._area_lookup)
+        store._set_columns(self.days, self.codes)
+        store.version = self.version
+        if self._cube is not None:
+            store._cube = self._cube.copy()
+        return store
+
+    def merge_since(self, day, delta):
+        """
+        Purpose:
+            Merges the records fetched for days on or after the given day:
+            rows held for those days are replaced by the fetched ones, older
+            rows are kept as they are, and the count cube is adjusted by the
+            difference instead of being rebuilt. Fetched records before the
+            day are dropped, since the rows held already cover them.
+        Parameters:
+            day (int): The first day covered by the fetched records.
+            delta (RecordStore): The fetched records.
+        Returns:
+            tuple: (removed, added) row counts.
+        """
+        days, codes = self.days, self.codes
+        stale = days >= day
+        cube = self._cube
+        fresh = delta.days >= day
+        remap = np.array([self.area_code(name) for name in delta.area_names],
+                         dtype=np.int32)
+        new_days = delta.days[fresh]
+        new_codes = remap[delta.codes[fresh]] if len(delta) else delta.codes
+        self._set_columns(
+            np.concatenate([days[~stale], new_days]),
+            np.concatenate([codes[~stale], new_codes]),
+        )
+        if cube is not None:
+            cube.add(days[stale], codes[stale], self.area_names, sign=-1)
+            cube.add(new_days, new_codes, self.area_names)
+            self._cube = cube
+        return int(stale.sum()), len(new_days)
+
+    def area_offsets(self):
+        """
+        Purpose:
+            Groups the row positions by area: the rows of area code c are
+            order[starts[c]:starts[c + 1]], in insertion order. Built with one
+            stable sort on first use after the data changes.
+        Parameters:
+            Nothing
+        Returns:
+            tuple: (order, starts) as int64 arrays.
+        """
+        if self._offsets is None:
+            codes = self.codes
+            order = np.argsort(codes, kind="stable")
+            starts = np.searchsorted(
+                codes[order], np.arange(len(self.area_names) + 1)
+            )
+            self._offsets = (order, starts)
+        return self._offsets
+
+    def area_rows(self, neighborhood):
+        """
+        Purpose:
+            Returns the row positions of one area without scanning the others.
+        Parameters:
+            neighborhood (str): The area name.
+        Returns:
+            ndarray: The row positions, empty for an unknown area.
+        """
+        code = self._area_lookup.get(neighborhood)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        order, starts = self.area_offsets()
+        return order[starts[code]:starts[code + 1]]
+
+    def records_in_area(self, neighborhood):
+        """
+        Purpose:
+            Materializes only the records of one area.
+        Parameters:
+            neighborhood (str): The area name.
+        Returns:
+            list: The area's record objects, in insertion order.
+        """
+        return [self[int(row)] for row in self.area_rows(neighborhood)]
+
+    def day_range(self):
+        """
+        Purpose:
+            Returns the days covered by the stored records.
+        Parameters:
+            Nothing
+        Returns:
+            tuple or None: (first day, last day + 1), or None if empty.
+        """
+        if len(self) == 0:
+            return None
+        days = self.days
+        return int(days.min()), int(days.max()) + 1
+
+    def _window_days(self, start, end, neighborhood):
+        """
+        Purpose:
+            Selects the day ordinals of the records in a time window, going
+            straight to one area's rows when a neighborhood is given.
+        Parameters:
+            start (int): The first day of the window.
+            end (int): The day after the window.
+            neighborhood (str): The area name, or None for all areas.
+        Returns:
+            ndarray: The selected int32 days.
+        """
+        days = self.days
+        if neighborhood is not None:
+            days = days[self.area_rows(neighborhood)]
+        return days[(days >= start) & (days < end)]
+
+    def count_buckets(self, start, end, granularity="month", neighborhood=None):
+        """
+        Purpose:
+            Counts records per day, week, month or year within a time window
+            with one vectorized binning pass. Monthly counts over whole months
+            are read from the count cube instead.
+        Parameters:
+            start (int): The first day of the window.
+            end (int): The day after the window.
+            granularity (str): 'day', 'week', 'month' or 'year'.
+            neighborhood (str): The area name, or None for all areas.
+        Returns:
+            ndarray: int64 counts for each bucket from the one holding start
+                     to the one holding end - 1.
+        """
+        first, n_buckets = bucket_span(start, end, granularity)
+        if n_buckets <= 0:
+            return np.zeros(0, dtype=np.int64)
+        if granularity == "month" and whole_months(start, end):
+            return self._cube_months(first, n_buckets, neighborhood)
+        buckets = days_to_buckets(self._window_days(start, end, neighborhood),
+                                  granularity)
+        return np.bincount(buckets - first, minlength=n_buckets)
+
+    def count_area_buckets(self, start, end, granularity="month"):
+        """
+        Purpose:
+            Counts records per area and bucket within a time window with a
+            single bincount over all records, for reports covering every
+            area at once.
+        Parameters:
+            start (int): The first day of the window.
+            end (int): The day after the window.
+            granularity (str): 'day', 'week', 'month' or 'year'.
+        Returns:
+            ndarray: int64 counts with one row per area code and one column
+                     per bucket, as in count_buckets.
+        """
+        first, n_buckets = bucket_span(start, end, granularity)
+        n_areas = len(self.area_names)
+        if n_buckets <= 0:
+            return np.zeros((n_areas, 0), dtype=np.int64)
+        if granularity == "month" and whole_months(start, end):
+            return self._cube_area_months(first, n_buckets)
+        days, codes = self.days, self.codes
+        in_window = (days >= start) & (days < end)
+        cells = (codes[in_window].astype(np.int64) * n_buckets
+                 + days_to_buckets(days[in_window], granularity) - first)
+        return np.bincount(cells, minlength=n_areas * n_buckets).reshape(
+            n_areas, n_buckets
+        )
+
+    def _cube_months(self, first, n_months, neighborhood):
+        """
+        Purpose:
+            Reads a range of monthly counts from the count cube.
+        Parameters:
+            first (int): The first month, in months since 1970-01.
+            n_months (int): The number of months.
+            neighborhood (str): The area name, or None for all areas.
+        Returns:
+            ndarray: int64 counts, zero for months outside the data.
+        """
+        counts = np.zeros(n_months, dtype=np.int64)
+        cube = self.month_cube()
+        row = cube.row(neighborhood)
+        if row is None:
+            return counts
+        lo = max(first, cube.first_month)
+        hi = min(first + n_months, cube.first_month + len(row))
+        if lo < hi:
+            counts[lo - first:hi - first] = row[lo - cube.first_month:hi - cube.first_month]
+        return counts
+
+    def _cube_area_months(self, first, n_months):
+        """
+        Purpose:
+            Reads a range of monthly counts of every area from the count cube.
+        Parameters:
+            first (int): The first month, in months since 1970-01.
+            n_months (int): The number of months.
+        Returns:
+            ndarray: int64 counts with one row per area code, zero for months
+                     outside the data.
+        """
+        counts = np.zeros((len(self.area_names), n_months), dtype=np.int64)
+        cube = self.month_cube()
+        lo = max(first, cube.first_month)
+        hi = min(first + n_months, cube.first_month + cube.counts.shape[1])
+        if lo < hi:
+            counts[:len(cube.counts), lo - first:hi - first] = (
+                cube.counts[:, lo - cube.first_month:hi - cube.first_month]
+            )
+        return counts
+
+    def aggregate(self, start, end, granularity="month", neighborhood=None,
+                  measures=MEASURES):
+        """
+        Purpose:
+            Computes several results over a time window from a single binning
+            pass (or the count cube), so charts needing a series, totals and
+            per-area breakdowns do not each scan the records.
+        Parameters:
+            start (int): The first day of the window.
+            end (int): The day after the window.
+            granularity (str): 'day', 'week', 'month' or 'year'.
+            neighborhood (str): Restrict to one area, or None for all areas.
+            measures (tuple): Names from MEASURES:
+                              'series': counts per bucket (ndarray);
+                              'total': the count in the window (int);
+                              'area_totals': {area: count} of areas with
+                              records in the window;
+                              'area_series': {area: counts per bucket} of
+                              the same areas.
+        Returns:
+            dict: The requested measures by name.
+        Raises:
+            ValueError: If a measure or the granularity is unknown.
+        """
+        unknown = set(measures) - set(MEASURES)
+        if unknown:
+            raise ValueError(f"Unknown measures: {', '.join(sorted(unknown))}")
+        by_area = "area_totals" in measures or "area_series" in measures
+        if not by_area and "series" not in measures:
+            return {"total": self.count_window(start, end, neighborhood)}
+
+        if by_area and neighborhood is None:
+            matrix = self.count_area_buckets(start, end, granularity)
+            names = self.area_names
+            series = matrix.sum(axis=0)
+        else:
+            # One area's rows are reached through the area offsets
+            series = self.count_buckets(start, end, granularity, neighborhood)
+            matrix, names = series.reshape(1, -1), [neighborhood]
+
+        results = {}
+        if "series" in measures:
+            results["series"] = series
+        if "total" in measures:
+            results["total"] = int(series.sum())
+        if by_area:
+            totals = matrix.sum(axis=1)
+            present = np.flatnonzero(totals)
+            if "area_totals" in measures:
+                results["area_totals"] = {names[i]: int(totals[i]) for i in present}
+            if "area_series" in measures:
+                results["area_series"] = {names[i]: matrix[i] for i in present}
+        return results
+
+    def count_window(self, start, end, neighborhood=None):
+        """
+        Purpose:
+            Counts the records in a time window.
+        Parameters:
+            start (int): The first day of the window.
+            end (int): The day after the window.
+            neighborhood (str): The area name, or None for all areas.
+        Returns:
+            int: The number of matching records.
+        """
+        if whole_months(start, end):
+            first, n_months = bucket_span(start, end, "month")
+            return int(self._cube_months(first, n_months, neighborhood).sum())
+        return len(self._window_days(start, end, neighborhood))
+
+    def to_arrays(self):
+        """
+        Purpose:
+            Exports the columns as plain numpy arrays for binary storage.
+        Parameters:
+            Nothing
+        Returns:
+            dict: 'days' (int32 days since the epoch), 'area_codes' (int32
+                  codes) and 'area_names' (str names per code).
+        """
+        return {
+            "days": self.days,
+            "area_codes": self.codes,
+            "area_names": np.asarray(self.area_names, dtype=str),
+        }
+
+    @classmethod
+    def from_arrays(cls, record_type, days, area_codes, area_names):
+        """
+        Purpose:
+            Rebuilds a store from arrays produced by to_arrays without any
+            parsing.
+        Parameters:
+            record_type (type): The record class to materialize on demand.
+            days (ndarray): int32 days since the epoch.
+            area_codes (ndarray): Integer codes into area_names.
+            area_names (ndarray): The area name for each code.
+        Returns:
+            RecordStore: The rebuilt store.
+        """
+        store = cls(record_type)
+        for name in area_names:
+            store.area_code(str(name))
+        store._set_columns(
+            np.asarray(days, dtype=np.int32), np.asarray(area_codes, dtype=np.int32)
+        )
+        return store
+
+    def records(self):
+        """
+        Purpose:
+            Materializes the stored rows as record objects. The list is built
+            on first use and reused until the data changes; records issued on
+            the same day share one timestamp object.
+        Parameters:
+            Nothing
+        Returns:
+            list: The record objects, in insertion order.
+        """
+        if self._records is None:
+            unique_days, day_index = np.unique(self.days, return_inverse=True)
+            timestamps = [day_to_timestamp(int(day)) for day in unique_days]
+            names = self.area_names
+            make = self.record_type.from_parsed
+            self._records = [
+                make(timestamps[day], names[code])
+                for day, code in zip(day_index.tolist(), self.codes.tolist())
+            ]
+        return self._records
+
+
+class MonthCube:
+    """
+    Purpose:
+        A dense table of record counts indexed by area and month, so that
+        chart queries are a row lookup instead of a scan over the records.
+    Attributes:
+        counts (ndarray): int64 counts with one row per area and one column
+                          per month from first_month to the last month held.
+        first_month (int): The month of column 0, in months since 1970-01.
+        area_codes (dict): The row index of each area name.
+        area_totals (ndarray): The total count of each area.
+        month_totals (ndarray): The total count of each month.
+    """
+
+    def __init__(self, days, codes, area_names):
+        """
+        Purpose:
+            Builds the cube from the store columns with a single bincount.
+        Parameters:
+            days (ndarray): int32 day ordinals.
+            codes (ndarray): int32 area codes.
+            area_names (list): The area name of each code.
+        Returns:
+            Nothing
+        """
+        self.area_codes = {name: code for code, name in enumerate(area_names)}
+        n_areas = len(area_names)
+        if len(days) == 0:
+            self.first_month = 0
+            self.counts = np.zeros((n_areas, 0), dtype=np.int64)
+        else:
+            months = days_to_months(days)
+            self.first_month = int(months.min())
+            n_months = int(months.max()) - self.first_month + 1
+            cells = codes.astype(np.int64) * n_months + (months - self.first_month)
+            self.counts = np.bincount(
+                cells, minlength=n_areas * n_months
+            ).reshape(n_areas, n_months)
+        self.area_totals = self.counts.sum(axis=1)
+        self.month_totals = self.counts.sum(axis=0)
+
+    def copy(self):
+        """
+        Purpose:
+            Returns an independent copy of the cube.
+        Parameters:
+            Nothing
+        Returns:
+            MonthCube: The copy.
+        """
+        cube = MonthCube.__new__(MonthCube)
+        cube.area_codes = dict(self.area_codes)
+        cube.first_month = self.first_month
+        cube.counts = self.counts.copy()
+        cube.area_totals = self.area_totals.copy()
+        cube.month_totals = self.month_totals.copy()
+        return cube
+
+    def add(self, days, codes, area_names, sign=1):
+        """
+        Purpose:
+            Adds (or with sign=-1 removes) records from the counts in place,
+            growing the table for new areas or months.
+        Parameters:
+            days (ndarray): int32 day ordinals of the records.
+            codes (ndarray): int32 area codes of the records.
+            area_names (list): The area name of each code, including new ones.
+            sign (int): 1 to add the records, -1 to remove them.
+        Returns:
+            Nothing
+        """
+        self.area_codes = {name: code for code, name in enumerate(area_names)}
+        n_areas, n_months = self.counts.shape
+        first_month = self.first_month
+        months = days_to_months(days)
+        if len(months):
+            if n_months == 0:
+                first_month = int(months.min())
+            first_month = min(first_month, int(months.min()))
+            last_month = max(self.first_month + n_months - 1, int(months.max()))
+        else:
+            last_month = self.first_month + n_months - 1
+        width = last_month - first_month + 1
+        if len(area_names) != n_areas or width != n_months:
+            counts = np.zeros((len(area_names), width), dtype=np.int64)
+            offset = self.first_month - first_month
+            counts[:n_areas, offset:offset + n_months] = self.counts
+            self.counts = counts
+            self.first_month = first_month
+        if len(months):
+            cells = codes.astype(np.int64) * width + (months - first_month)
+            self.counts += sign * np.bincount(
+                cells, minlength=self.counts.size
+            ).reshape(self.counts.shape)
+        self.area_totals = self.counts.sum(axis=1)
+        self.month_totals = self.counts.sum(axis=0)
+
+    def row(self, neighborhood=None):
+        """
+        Purpose:
+            Returns the monthly counts of one area, or of all areas.
+        Parameters:
+            neighborhood (str): The area name, or None for all areas.
+        Returns:
+            ndarray or None: The counts per month, or None for an unknown
+                             area.
+        """
+        if neighborhood is None:
+            return self.month_totals
+        code = self.area_codes.get(neighborhood)
+        if code is None:
+            return None
+        return self.counts[code]
+
+    def count_by_month(self, neighborhood=None):
+        """
+        Purpose:
+            Returns the non-zero monthly counts of one area, or of all areas.
+        Parameters:
+            neighborhood (str): The area name, or None for all areas.
+        Returns:
+            dict: A dictionary with 'YYYY-MM' as keys and counts as values.
+        """
+        row = self.row(neighborhood)
+        if row is None:
+            return {}
+        return {
+            month_label(self.first_month + int(offset)): int(row[offset])
+            for offset in np.flatnonzero(row)
+        }
+
+
+def day_to_timestamp(day):
+    """
+    Purpose:
+        Converts a day ordinal to a pandas Timestamp at midnight.
+    Parameters:
+        day (int): Days since 1970-01-01.
+    Returns:
+        Timestamp: The matching timestamp.
+    """
+    import pandas as pd  # Deferred: Timestamp is the only pandas use here
+    return pd.Timestamp(np.datetime64(day, "D"))
+
+
+def days_to_months(days):
+    """
+    Purpose:
+        Converts day ordinals to month ordinals.
+    Parameters:
+        days (ndarray): Days since 1970-01-01.
+    Returns:
+        ndarray: int64 months since 1970-01.
+    """
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def month_label(month):
+    """
+    Purpose:
+        Formats a month ordinal as 'YYYY-MM'.
+    Parameters:
+        month (int): Months since 1970-01.
+    Returns:
+        str: The formatted month.
+    """
+    year, month_index = divmod(month, 12)
+    return f"{EPOCH_YEAR + year:04d}-{month_index + 1:02d}"
+
+
+def days_to_buckets(days, granularity):
+    """
+    Purpose:
+        Converts day ordinals to bucket ordinals of a granularity.
+    Parameters:
+        days (ndarray): Days since 1970-01-01.
+        granularity (str): 'day', 'week', 'month' or 'year'.
+    Returns:
+        ndarray: int64 days, Monday-based weeks, months or years since 1970.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    if granularity == "day":
+        return days
+    if granularity == "week":
+        return (days + EPOCH_WEEKDAY) // 7
+    months = days_to_months(days)
+    if granularity == "month":
+        return months
+    if granularity == "year":
+        return months // 12
+    raise ValueError(
+        f"Unknown granularity: {granularity}. Use one of {', '.join(GRANULARITIES)}."
+    )
+
+
+def bucket_start(bucket, granularity):
+    """
+    Purpose:
+        Returns the first day of a bucket.
+    Parameters:
+        bucket (int): The bucket ordinal.
+        granularity (str): 'day', 'week', 'month' or 'year'.
+    Returns:
+        int: Days since 1970-01-01.
+    """
+    if granularity == "day":
+        return int(bucket)
+    if granularity == "week":
+        return int(bucket) * 7 - EPOCH_WEEKDAY
+    unit = "M" if granularity == "month" else "Y"
+    return int(np.datetime64(int(bucket), unit).astype("datetime64[D]").astype(np.int64))
+
+
+def whole_months(start, end):
+    """
+    Purpose:
+        Checks whether a time window starts and ends on month boundaries, so
+        its counts can be read from the month cube.
+    Parameters:
+        start (int): The first day of the window.
+        end (int): The day after the window.
+    Returns:
+        bool: True if both ends fall on the first day of a month.
+    """
+    if end <= start:
+        return False
+    first, n_months = bucket_span(start, end, "month")
+    return (bucket_start(first, "month") == start
+            and bucket_start(first + n_months, "month") == end)
+
+
+def bucket_span(start, end, granularity):
+    """
+    Purpose:
+        Returns the buckets overlapping a time window.
+    Parameters:
+        start (int): The first day of the window.
+        end (int): The day after the window.
+        granularity (str): 'day', 'week', 'month' or 'year'.
+    Returns:
+        tuple: (first bucket, number of buckets).
+    """
+    if end <= start:
+        return int(days_to_buckets([start], granularity)[0]), 0
+    first, last = days_to_buckets([start, end - 1], granularity)
+    return int(first), int(last - first + 1)
+
+
+def bucket_label(bucket, granularity):
+    """
+    Purpose:
+        Formats a bucket for chart axes: 'YYYY-MM-DD' for days and weeks (the
+        Monday), 'YYYY-MM' for months and 'YYYY' for years.
+    Parameters:
+        bucket (int): The bucket ordinal.
+        granularity (str): 'day', 'week', 'month' or 'year'.
+    Returns:
+        str: The formatted bucket.
+    """
+    if granularity == "month":
+        return month_label(int(bucket))
+    if granularity == "year":
+        return f"{EPOCH_YEAR + int(bucket):04d}"
+    return str(np.datetime64(bucket_start(bucket, granularity), "D"))
+
+
+def parse_day(value):
+    """
+    Purpose:
+        Converts a date given as 'YYYY', 'YYYY-MM' or 'YYYY-MM-DD' to a day
+        ordinal; partial dates mean their first day.
+    Parameters:
+        value (str): The date.
+    Returns:
+        int: Days since 1970-01-01.
+    Raises:
+        ValueError: If the date cannot be read.
+    """
+    try:
+        return int(np.datetime64(str(value).strip(), "D").astype(np.int64))
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}. Use YYYY-MM-DD.") from None
+
+
+def year_day_range(year):
+    """
+    Purpose:
+        Returns the day ordinals bounding a calendar year.
+    Parameters:
+        year (int): The calendar year.
+    Returns:
+        tuple: (first day, first day of the next year) as ints.
+    """
+    start = np.datetime64(f"{year:04d}-01-01", "D").astype(np.int64)
+    end = np.datetime64(f"{year + 1:04d}-01-01", "D").astype(np.int64)
+    return int(start), int(end)
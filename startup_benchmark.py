@@ -0,0 +1,213 @@
+"""
+Zihan Jiang
+CS 5001, Fall 2024
+Final Project
+This is the startup benchmark file for the final project.
+
+Imports each entry point in fresh interpreters under `python -X importtime`
+and fails when one takes longer than its budget or loads a module it must
+not, such as Tk or matplotlib on a headless path:
+
+    python startup_benchmark.py
+    python startup_benchmark.py --runs 9 --top 12
+    python startup_benchmark.py --modules data_model --json startup.json
+"""
+
+import argparse  # For command line options
+import json  # For the results file
+import os  # For the working directory of the measured interpreters
+import statistics  # For the median of the runs
+import subprocess  # For importing in fresh interpreters
+import sys  # For the interpreter path and exit codes
+
+DEFAULT_RUNS = 5  # Fresh interpreters per entry point; the median is kept
+DEFAULT_TOP = 8  # Direct imports listed per entry point
+
+# Cumulative import time allowed per entry point, in milliseconds. Each one
+# needs about 100-150 ms on a laptop, nearly all of it numpy.
+BUDGETS_MS = {
+    "data_model": 250,
+    "api_server": 300,
+    "batch_report": 300,
+    "data_dashboard": 300,
+}
+
+# Loaded on first use only: pandas to parse, requests to download, Tk and
+# matplotlib to open the window or render a report
+DEFERRED_MODULES = ("pandas", "requests", "tkinter", "matplotlib")
+
+
+def parse_importtime(output):
+    """
+    Purpose:
+        Parses the report written to stderr by `python -X importtime`.
+    Parameters:
+        output (str): The stderr text.
+    Returns:
+        list: (name, depth, self_us, cumulative_us) per import, in the order
+              reported, i.e. each module after the modules it imported.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # The header line
+        name = name[1:]  # The space after the separator
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return imports
+
+
+def summarize(imports, module, top=DEFAULT_TOP):
+    """
+    Purpose:
+        Finds an entry point's own import time, the modules it loaded and its
+        slowest direct imports.
+    Parameters:
+        imports (list): The output of parse_importtime.
+        module (str): The entry point module.
+        top (int): The number of direct imports to keep.
+    Returns:
+        dict: 'ms' (cumulative milliseconds), 'modules' (sorted names loaded
+              while importing it) and 'top' ([name, ms] pairs, slowest first).
+    """
+    for end, (name, depth, _, cumulative_us) in enumerate(imports):
+        if name == module and depth == 0:
+            break
+    else:
+        raise ValueError(f"{module} was not imported")
+    start = end
+    while start > 0 and imports[start - 1][1] > 0:
+        start -= 1
+    subtree = imports[start:end]
+    direct = sorted(
+        ((name, us / 1000) for name, depth, _, us in subtree if depth == 1),
+        key=lambda item: item[1], reverse=True,
+    )
+    return {
+        "ms": cumulative_us / 1000,
+        "modules": sorted({name for name, _, _, _ in subtree}),
+        "top": [list(item) for item in direct[:top]],
+    }
+
+
+def measure(module, runs=DEFAULT_RUNS, top=DEFAULT_TOP):
+    """
+    Purpose:
+        Imports a module in fresh interpreters and keeps the median run.
+    Parameters:
+        module (str): The entry point module.
+        runs (int): The number of interpreters started.
+        top (int): The number of direct imports to keep.
+    Returns:
+        dict: The summarize() result of the median run, plus 'runs_ms'.
+    """
+    summaries = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            check=True, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stderr
+        summaries.append(summarize(parse_importtime(output), module, top))
+    times = [summary["ms"] for summary in summaries]
+    median = statistics.median_low(times)
+    result = summaries[times.index(median)]
+    result["runs_ms"] = times
+    return result
+
+
+def check_budgets(results, budgets=BUDGETS_MS, deferred=DEFERRED_MODULES):
+    """
+    Purpose:
+        Finds entry points over their import budget or loading a module that
+        should only be loaded on first use.
+    Parameters:
+        results (dict): Module -> measure() result.
+        budgets (dict): Module -> allowed milliseconds.
+        deferred (tuple): Packages no entry point may import eagerly.
+    Returns:
+        list: A message per violation.
+    """
+    problems = []
+    for module, result in results.items():
+        budget = budgets.get(module)
+        if budget is not None and result["ms"] > budget:
+            problems.append(
+                f"{module} imports in {result['ms']:.1f} ms, over its {budget} ms budget"
+            )
+        loaded = sorted({
+            package for package in deferred for name in result["modules"]
+            if name == package or name.startswith(package + ".")
+        })
+        if loaded:
+            problems.append(f"{module} imports {', '.join(loaded)} eagerly")
+    return problems
+
+
+def print_report(results, problems):
+    """
+    Purpose:
+        Prints each entry point's import time, budget and slowest imports,
+        followed by any violations.
+    Parameters:
+        results (dict): Module -> measure() result.
+        problems (list): The output of check_budgets.
+    Returns:
+        Nothing
+    """
+    print(f"{'module':<16} {'ms':>8} {'budget':>8}  slowest direct imports")
+    for module, result in results.items():
+        budget = BUDGETS_MS.get(module, "-")
+        slowest = ", ".join(f"{name} {ms:.1f}" for name, ms in result["top"])
+        print(f"{module:<16} {result['ms']:>8.1f} {budget:>8}  {slowest}")
+    for problem in problems:
+        print(f"OVER BUDGET {problem}")
+
+
+def parse_args(argv=None):
+    """
+    Purpose:
+        Parses the command line options of the benchmark.
+    Parameters:
+        argv (list): The arguments to parse, or None to use sys.argv.
+    Returns:
+        Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the startup imports")
+    parser.add_argument("--modules", default=",".join(BUDGETS_MS),
+                        help="comma separated entry point modules")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS,
+                        help="fresh interpreters per module; the median is reported")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP,
+                        help="direct imports listed per module")
+    parser.add_argument("--json", default=None, help="also write the results here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Purpose:
+        Measures every entry point, reports and checks the budgets.
+    Parameters:
+        argv (list): The command line arguments, or None to use sys.argv.
+    Returns:
+        int: 1 if a budget was exceeded, otherwise 0.
+    """
+    args = parse_args(argv)
+    results = {
+        module: measure(module, args.runs, args.top)
+        for module in args.modules.split(",") if module
+    }
+    problems = check_budgets(results)
+    print_report(results, problems)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as json_file:
+            json.dump(results, json_file, indent=2)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
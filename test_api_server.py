@@ -0,0 +1,110 @@
+import json
+import threading
+import unittest
+import requests
+from api_server import ApiServer
+from data_model import DataModel
+
+
+class TestApiServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """
+        Starts the server on a free port with a small loaded model.
+        """
+        cls.model = DataModel()
+        cls.model.parse_permit_data(
+            "IssueDate;GeoLocalArea\n"
+            "2024-01-01;Downtown\n"
+            "2024-02-15;Mount Pleasant\n"
+            "2023-12-31;Kitsilano\n"
+        )
+        cls.model.parse_license_data(
+            "IssuedDate;LocalArea\n"
+            "2024-01-05;Downtown\n"
+            "2024-03-20;Kitsilano\n"
+        )
+        cls.server = ApiServer(("127.0.0.1", 0), cls.model)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_bar_resolves_the_area(self):
+        """
+        Tests the bar totals of a neighborhood typed loosely.
+        """
+        response = requests.get(self.base_url + "/bar", params={"area": "downtown"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "area": "Downtown",
+            "data": {"Building Permits": 1, "Business Licenses": 1},
+        })
+
+    def test_line_matches_the_model(self):
+        """
+        Tests that /line returns prepare_line_chart_data for the parameters.
+        """
+        response = requests.get(
+            self.base_url + "/line",
+            params={"start": "", "end": "", "granularity": "year"},
+        )
+        self.assertEqual(response.json()["data"], self.model.prepare_line_chart_data(
+            None, "", "", "year"
+        ))
+
+    def test_conditional_requests_and_cache(self):
+        """
+        Tests that a repeated query is served from the cache and that a client
+        holding the current ETag gets 304 Not Modified.
+        """
+        url = self.base_url + "/bar?area=Kitsilano"
+        first = requests.get(url)
+        hits = self.server.responses.hits
+        second = requests.get(url, headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b"")
+        self.assertEqual(self.server.responses.hits, hits + 1)
+
+    def test_changed_data_gets_a_new_etag(self):
+        """
+        Tests that responses are not reused after the data changes.
+        """
+        model = DataModel()
+        model.parse_permit_data("IssueDate;GeoLocalArea\n2024-01-01;Fairview\n")
+        server = ApiServer(("127.0.0.1", 0), model)
+        first = server.respond("/bar", {"area": "Fairview"})
+        model.parse_permit_data("IssueDate;GeoLocalArea\n2024-01-02;Fairview\n")
+        second = server.respond("/bar", {"area": "Fairview"})
+        server.server_close()
+        self.assertNotEqual(first[2], second[2])
+        self.assertEqual(json.loads(second[1])["data"]["Building Permits"], 2)
+
+    def test_errors(self):
+        """
+        Tests unknown areas, invalid parameters and unknown paths.
+        """
+        response = requests.get(self.base_url + "/line", params={"area": "Kits"})
+        self.assertEqual(response.status_code, 200)
+        response = requests.get(self.base_url + "/bar", params={"area": "Atlantis"})
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("Unknown neighborhood", response.json()["error"])
+        response = requests.get(self.base_url + "/line", params={"granularity": "hour"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(requests.get(self.base_url + "/nothing").status_code, 404)
+
+    def test_areas(self):
+        """
+        Tests the list of neighborhoods.
+        """
+        response = requests.get(self.base_url + "/areas")
+        self.assertEqual(response.json(),
+                         {"areas": ["Downtown", "Kitsilano", "Mount Pleasant"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
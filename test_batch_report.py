@@ -0,0 +1,91 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from batch_report import main, render_reports, report_file_stem
+from data_model import DataModel
+from parallel_parse import pool_context
+
+
+class TestBatchReport(unittest.TestCase):
+    def setUp(self):
+        """
+        Sets up a model with sample data and an output directory.
+        """
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.model = DataModel()
+        self.model.parse_permit_data(
+            "IssueDate;GeoLocalArea\n"
+            "2024-01-01;Downtown\n"
+            "2024-02-15;Mount Pleasant\n"
+            "2023-12-31;Kensington-Cedar Cottage\n"
+            "2024-02-20;Downtown\n"
+        )
+        self.model.parse_license_data(
+            "IssuedDate;LocalArea\n"
+            "2024-01-05;Downtown\n"
+            "2024-03-20;Kensington-Cedar Cottage\n"
+        )
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_report_file_stem(self):
+        """
+        Tests the file names of the reports.
+        """
+        self.assertEqual(report_file_stem(None), "all-neighborhoods")
+        self.assertEqual(report_file_stem("Kensington-Cedar Cottage"),
+                         "kensington-cedar-cottage")
+
+    def test_report_data_matches_per_area_queries(self):
+        """
+        Tests that the one-pass report data equals the per-neighborhood chart
+        queries.
+        """
+        report = self.model.prepare_report_data()
+        self.assertEqual(
+            [neighborhood for neighborhood, _, _ in report],
+            [None, "Downtown", "Kensington-Cedar Cottage", "Mount Pleasant"],
+        )
+        for neighborhood, line_data, bar_data in report:
+            self.assertEqual(line_data, self.model.prepare_line_chart_data(neighborhood))
+            self.assertEqual(bar_data, self.model.prepare_grouped_bar_data(neighborhood))
+
+    def test_render_reports_in_parallel(self):
+        """
+        Tests that every report is written in every format by a process pool
+        whose workers are not forked.
+        """
+        report = self.model.prepare_report_data("", "", "year")
+        with mock.patch("batch_report.pool_context", wraps=pool_context) as context:
+            paths = render_reports(report, self.temp_dir.name, ("png", "svg"), workers=2)
+        context.assert_called_once_with()
+        self.assertEqual(len(paths), 8)
+        with open(os.path.join(self.temp_dir.name, "downtown.png"), "rb") as image:
+            self.assertEqual(image.read(8), b"\x89PNG\r\n\x1a\n")
+        with open(os.path.join(self.temp_dir.name, "downtown.svg"), "rb") as image:
+            self.assertIn(b"<svg", image.read(500))
+
+    def test_main_renders_saved_columns(self):
+        """
+        Tests the command line run on columns saved earlier.
+        """
+        columns = os.path.join(self.temp_dir.name, "columns")
+        output = os.path.join(self.temp_dir.name, "reports")
+        self.model.save_columns(columns)
+        timings = os.path.join(self.temp_dir.name, "timings.json")
+        self.assertEqual(
+            main(["--columns", columns, "--output-dir", output, "--workers", "1",
+                  "--log-level", "WARNING", "--timings-json", timings]),
+            0,
+        )
+        self.assertEqual(len(os.listdir(output)), 4)
+        with open(timings) as file:
+            self.assertIn("DataModel.prepare_report_data", json.load(file))
+        self.assertEqual(main(["--columns", output, "--log-level", "ERROR"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from benchmark_model import (
+    NEIGHBORHOODS,
+    compare_to_baseline,
+    generate_export,
+    parse_size,
+    run_size,
+)
+from data_model import DataModel
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_parse_size(self):
+        """
+        Tests the row count suffixes.
+        """
+        self.assertEqual(parse_size("10k"), 10000)
+        self.assertEqual(parse_size("1M"), 1000000)
+        self.assertEqual(parse_size("2.5k"), 2500)
+        self.assertEqual(parse_size("123"), 123)
+
+    def test_generated_export_is_parseable(self):
+        """
+        Tests that a synthetic export parses into the model with known areas
+        and a small share of invalid rows.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "permits.csv")
+            generate_export(path, "permits", 2000, seed=1)
+            with open(path, "r", encoding="utf-8") as export:
+                model = DataModel()
+                model.parse_permit_data(export.read())
+        self.assertGreater(len(model.permits), 1900)
+        areas = set(model._permit_store.area_names)
+        self.assertTrue(areas <= set(NEIGHBORHOODS) | {""})
+
+    def test_run_size_times_every_stage(self):
+        """
+        Tests that a tiny run reports every stage.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results = run_size(500, ["download", "parse", "load", "filter",
+                                     "line", "bar"], temp_dir)
+        stages = results["stages"]
+        self.assertEqual(
+            list(stages), ["download", "parse", "load", "filter", "line", "bar"]
+        )
+        self.assertGreater(results["peak_rss_mb"], 0)
+        self.assertNotIn("peak_rss_mb", stages["parse"])  # Not per stage
+        self.assertEqual(stages["bar"]["runs"], 3)  # Best of the default repeat
+        self.assertEqual(stages["parse"]["runs"], 1)  # Appends; runs once
+
+    def test_compare_to_baseline(self):
+        """
+        Tests that only slowdowns beyond the tolerance are regressions.
+        """
+        baseline = {"1000": {"stages": {"parse": {"seconds": 1.0},
+                                        "load": {"seconds": 1.0}}}}
+        results = {"1000": {"stages": {"parse": {"seconds": 1.2},
+                                       "load": {"seconds": 1.3},
+                                       "bar": {"seconds": 9.0}}}}
+        self.assertEqual(
+            compare_to_baseline(results, baseline, tolerance=0.25),
+            [("1000", "load", 1.0, 1.3)],
+        )
+
+    def test_compare_ignores_sub_millisecond_jitter(self):
+        """
+        Tests that a large relative slowdown of a tiny stage is not reported
+        while it stays under the absolute floor.
+        """
+        baseline = {"1000": {"stages": {"bar": {"seconds": 0.0002},
+                                        "line": {"seconds": 0.002}}}}
+        results = {"1000": {"stages": {"bar": {"seconds": 0.0009},
+                                       "line": {"seconds": 0.0040}}}}
+        self.assertEqual(
+            compare_to_baseline(results, baseline, tolerance=0.25),
+            [("1000", "line", 0.002, 0.004)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+import threading
+import time
+import unittest
+from data_controller import DataController
+from neighborhood_index import NeighborhoodIndex
+
+
+class FakeWidget:
+    """
+    Stands in for a Tk button or variable.
+    """
+
+    def __init__(self, value=None):
+        self.value = value
+        self.command = None
+
+    def configure(self, command=None, **options):
+        self.command = command
+
+    def get(self):
+        return self.value
+
+
+class FakeView:
+    """
+    Records what the controller asks the view to do, without Tk.
+    """
+
+    def __init__(self):
+        self.neighborhood_var = FakeWidget("all")
+        self.bar_chart_button = FakeWidget()
+        self.line_chart_button = FakeWidget()
+        self.refresh_button = FakeWidget()
+        self.timings_button = FakeWidget()
+        self.start_var = FakeWidget("2024-01-01")
+        self.end_var = FakeWidget("2024-12-31")
+        self.granularity_var = FakeWidget("month")
+        self.refreshes = []
+        self.events = []
+        self.rendered = []
+        self.errors = []
+
+    def post(self, callback, *args):
+        self.events.append((callback, args))
+
+    def process_events(self, expected=1):
+        # Done-callbacks may run just after the future's result is available
+        deadline = time.monotonic() + 5
+        while len(self.events) < expected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for callback, args in self.events:
+            callback(*args)
+        self.events = []
+
+    def render_grouped_bar_chart(self, data):
+        self.rendered.append(("bar", data))
+
+    def render_line_chart(self, data):
+        self.rendered.append(("line", data))
+
+    def show_error(self, message):
+        self.errors.append(message)
+
+    def show_timings(self, table):
+        self.timings = table
+
+    def refresh_started(self):
+        self.refreshes.append("started")
+
+    def refresh_finished(self, permits_added, licenses_added):
+        self.refreshes.append((permits_added, licenses_added))
+
+
+class FakeModel:
+    """
+    Returns canned chart data, optionally waiting until released.
+    """
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.release.set()
+        self.requests = []
+        self.index = NeighborhoodIndex(["Downtown", "Broken", "Kitsilano"])
+
+    def neighborhood_index(self):
+        return self.index
+
+    def query_cache_stats(self):
+        return {"size": 1, "max_entries": 8, "hits": 3, "misses": 1,
+                "evictions": 0, "hit_rate": 0.75}
+
+    def prepare_grouped_bar_data(self, neighborhood=None, **window):
+        self.release.wait(5)
+        self.requests.append(("bar", neighborhood))
+        self.window = window
+        if neighborhood == "Broken":
+            raise ValueError("boom")
+        return {"Building Permits": 1, "Business Licenses": 2}
+
+    def prepare_line_chart_data(self, neighborhood=None, **window):
+        self.release.wait(5)
+        self.requests.append(("line", neighborhood))
+        self.window = window
+        return [{"month": "2024-01", "permits": 1, "licenses": 2}]
+
+
+class TestDataController(unittest.TestCase):
+    def setUp(self):
+        """
+        Wires a controller to a fake model and view.
+        """
+        self.model = FakeModel()
+        self.view = FakeView()
+        self.controller = DataController(
+            self.model, self.view, refresh=lambda: (3, 0)
+        )
+
+    def tearDown(self):
+        self.controller._executor.shutdown(wait=True)
+        self.controller._refresh_executor.shutdown(wait=True)
+
+    def test_chart_data_is_prepared_off_the_gui_thread(self):
+        """
+        Tests that the button only schedules work; rendering happens when the
+        posted result is processed on the GUI thread.
+        """
+        self.view.neighborhood_var.value = " downtown "
+        self.view.bar_chart_button.command().result(timeout=5)
+        self.assertEqual(self.model.requests, [("bar", "Downtown")])
+        self.assertEqual(self.view.rendered, [])
+
+        self.view.process_events()
+        self.assertEqual(
+            self.view.rendered,
+            [("bar", {"Building Permits": 1, "Business Licenses": 2})],
+        )
+
+    def test_only_the_latest_request_is_rendered(self):
+        """
+        Tests that results of superseded clicks are dropped.
+        """
+        self.model.release.clear()
+        first = self.view.bar_chart_button.command()
+        second = self.view.line_chart_button.command()
+        self.model.release.set()
+        first.result(timeout=5)
+        second.result(timeout=5)
+
+        self.view.process_events(expected=2)
+        self.assertEqual([kind for kind, _ in self.view.rendered], ["line"])
+
+    def test_preparation_errors_are_shown(self):
+        """
+        Tests that an exception while preparing data becomes an error dialog.
+        """
+        self.view.neighborhood_var.value = "broken"
+        self.view.bar_chart_button.command().exception(timeout=5)
+        self.view.process_events()
+        self.assertEqual(self.view.rendered, [])
+        self.assertEqual(self.view.errors, ["Could not prepare chart data: boom"])
+
+    def test_fuzzy_input_resolves_to_canonical_name(self):
+        """
+        Tests that a misspelled neighborhood is resolved through the index.
+        """
+        self.view.neighborhood_var.value = "kitsilamo"
+        self.view.line_chart_button.command().result(timeout=5)
+        self.assertEqual(self.model.requests, [("line", "Kitsilano")])
+
+    def test_unknown_neighborhood_is_rejected_without_a_query(self):
+        """
+        Tests that an unknown neighborhood is reported at once and no chart
+        data is prepared.
+        """
+        self.view.neighborhood_var.value = "Atlantis"
+        self.assertIsNone(self.view.bar_chart_button.command())
+        self.assertEqual(self.model.requests, [])
+        self.assertEqual(self.view.errors, ["Unknown neighborhood: Atlantis."])
+
+    def test_time_window_is_passed_to_the_model(self):
+        """
+        Tests that the window fields reach the queries, with empty dates
+        leaving the window open.
+        """
+        self.view.start_var.value = " "
+        self.view.granularity_var.value = "week"
+        self.view.line_chart_button.command().result(timeout=5)
+        self.assertEqual(self.model.window, {"start": "", "end": "2024-12-31",
+                                             "granularity": "week"})
+        self.view.bar_chart_button.command().result(timeout=5)
+        self.assertEqual(self.model.window, {"start": "", "end": "2024-12-31"})
+
+    def test_refresh_redraws_the_current_chart(self):
+        """
+        Tests that a refresh reports its result and re-requests the chart
+        last shown, and that clicks during a refresh are ignored.
+        """
+        self.view.line_chart_button.command().result(timeout=5)
+        self.view.process_events()
+
+        refresh = self.view.refresh_button.command()
+        self.assertIsNone(self.view.refresh_button.command())
+        refresh.result(timeout=5)
+        self.view.process_events()
+        self.assertEqual(self.view.refreshes, ["started", (3, 0)])
+
+        self.view.process_events()  # The redrawn chart
+        self.assertEqual([kind for kind, _ in self.view.rendered], ["line", "line"])
+        self.assertEqual(self.model.requests, [("line", None), ("line", None)])
+
+    def test_timings_show_controller_stages(self):
+        """
+        Tests that controller methods are timed and the table reaches the view.
+        """
+        self.view.line_chart_button.command().result(timeout=5)
+        self.view.process_events()
+        self.view.timings_button.command()
+        self.assertIn("DataController.show_line_chart", self.view.timings)
+        self.assertIn("DataController.normalize_neighborhood", self.view.timings)
+        self.assertIn("Query cache: 3 hits, 1 misses", self.view.timings)
+
+
+if __name__ == "__main__":
+    unittest.main()
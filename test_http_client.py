@@ -0,0 +1,324 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import unittest
+import requests
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from data_model import DataModel
+from http_client import HttpClient, ResumeError
+
+ROWS = 2000
+
+
+def make_payload(area="Downtown"):
+    """
+    Builds a permits export large enough to be cut off halfway.
+    """
+    lines = ["IssueDate;GeoLocalArea"]
+    lines += [f"2024-{month:02d}-15;{area}" for month in range(1, 13)] * (ROWS // 12)
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class FaultHandler(BaseHTTPRequestHandler):
+    """
+    Serves one export over keep-alive connections with Range support, and
+    fails the requests the test queued faults for: 'unavailable' answers
+    503, 'drop' closes the connection halfway through the body and
+    'change' does the same and then replaces the export.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        server.ports.add(self.client_address[1])
+        fault = server.faults.pop(0) if server.faults else None
+        if fault == "unavailable":
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = server.body
+        etag = f'"v{server.version}"'
+        encoded = body
+        gzipped = server.use_gzip and "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            encoded = gzip.compress(body, mtime=0)
+        start = 0
+        requested = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if server.honour_range and requested and if_range in (None, etag):
+            start = int(requested[len("bytes="):].rstrip("-"))
+            if start >= len(encoded):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(encoded)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(encoded) - 1}/{len(encoded)}"
+            )
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(encoded) - start))
+        self.end_headers()
+        if fault in ("drop", "change"):
+            self.wfile.write(encoded[start:start + (len(encoded) - start) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            if fault == "change":
+                server.body = make_payload("Kitsilano")
+                server.version += 1
+            return
+        self.wfile.write(encoded[start:])
+
+    def log_message(self, format, *args):
+        pass  # Keep test output quiet
+
+
+class FaultServerTestCase(unittest.TestCase):
+    """
+    Runs a local HTTP server injecting faults during the tests.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FaultHandler)
+        cls.server.daemon_threads = True
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/permits.csv"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.body = make_payload()
+        self.server.version = 1
+        self.server.use_gzip = False
+        self.server.honour_range = True
+        self.server.faults = []
+        self.server.requests = []
+        self.server.ports = set()
+        self.client = HttpClient(timeout=5, retries=3, backoff=0)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.spool_path = os.path.join(self.temp_dir.name, "permits.part")
+
+    def tearDown(self):
+        self.client.close()
+        self.temp_dir.cleanup()
+
+    def download(self, spool_path=None):
+        """
+        Reads the whole export through the client.
+        """
+        with self.client.open(self.url, spool_path=spool_path) as download:
+            download.raise_for_status()
+            return download.read(), download.resumes
+
+
+class TestHttpClient(FaultServerTestCase):
+    """
+    Tests the pooled, retrying client against a faulty server.
+    """
+
+    def test_retries_unavailable_server(self):
+        """
+        Tests that 503 answers are retried until the server recovers.
+        """
+        self.server.faults = ["unavailable", "unavailable"]
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.server.body)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_gives_up_after_retries(self):
+        """
+        Tests that the last answer is returned once the retries run out, and
+        that a refused connection raises.
+        """
+        self.server.faults = ["unavailable"] * 5
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.server.requests), 4)
+
+        closed = HttpClient(timeout=1, retries=1, backoff=0)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            closed.get("http://127.0.0.1:1/permits.csv")
+
+    def test_permanent_errors_are_not_retried(self):
+        """
+        Tests that an invalid URL fails at once, without backing off.
+        """
+        with mock.patch("http_client.time.sleep") as sleep:
+            for url in ("ftp://127.0.0.1/permits.csv", "permits.csv", "http://"):
+                with self.assertRaises(requests.exceptions.RequestException):
+                    self.client.get(url)
+        sleep.assert_not_called()
+
+    def test_backoff_doubles_and_honours_retry_after(self):
+        """
+        Tests the delays between attempts.
+        """
+        client = HttpClient(backoff=1, max_backoff=5)
+        self.assertEqual([client.delay(n) for n in range(4)], [1, 2, 4, 5])
+        response = requests.Response()
+        response.headers["Retry-After"] = "3"
+        self.assertEqual(client.delay(0, response), 3)
+
+    def test_connections_are_reused(self):
+        """
+        Tests that consecutive requests share one pooled connection and ask
+        for a compressed body.
+        """
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(len(self.server.ports), 1)
+        self.assertEqual(self.server.requests[0]["Accept-Encoding"], "gzip, deflate")
+
+    def test_resumes_dropped_body(self):
+        """
+        Tests that a body cut off halfway is completed with a Range request.
+        """
+        self.server.faults = ["drop"]
+        body, resumes = self.download()
+        self.assertEqual(body, self.server.body)
+        self.assertEqual(resumes, 1)
+        resumed = self.server.requests[1]
+        self.assertEqual(resumed["Range"], f"bytes={len(body) // 2}-")
+        self.assertEqual(resumed["If-Range"], '"v1"')
+
+    def test_resumes_dropped_gzip_body(self):
+        """
+        Tests that a compressed body resumes at its compressed offset and
+        still decodes to the export.
+        """
+        self.server.use_gzip = True
+        self.server.faults = ["drop", "drop"]
+        body, resumes = self.download()
+        self.assertEqual(body, self.server.body)
+        self.assertEqual(resumes, 2)
+
+    def test_resumes_without_range_support(self):
+        """
+        Tests that the received part is skipped when the server sends the
+        whole body again.
+        """
+        self.server.honour_range = False
+        self.server.faults = ["drop"]
+        body, resumes = self.download()
+        self.assertEqual(body, self.server.body)
+        self.assertEqual(resumes, 1)
+
+    def test_changed_export_is_not_spliced(self):
+        """
+        Tests that a body is not resumed from a different version.
+        """
+        self.server.honour_range = False
+        self.server.faults = ["change"]
+        with self.assertRaises(ResumeError):
+            self.download()
+
+    def test_spooled_part_is_resumed_by_next_download(self):
+        """
+        Tests that a download interrupted for good leaves its part in the
+        spool, and the next download only fetches the rest.
+        """
+        self.client.retries = 0
+        self.server.faults = ["drop"]
+        with self.assertRaises(ResumeError):
+            self.download(self.spool_path)
+        self.assertEqual(os.path.getsize(self.spool_path), len(self.server.body) // 2)
+
+        self.server.requests = []
+        body, resumes = self.download(self.spool_path)
+        self.assertEqual(body, self.server.body)
+        self.assertEqual(resumes, 0)
+        self.assertEqual(self.server.requests[0]["If-Range"], '"v1"')
+        self.assertFalse(os.path.exists(self.spool_path))
+        self.assertFalse(os.path.exists(self.spool_path + ".json"))
+
+    def test_complete_spooled_part_is_downloaded_again(self):
+        """
+        Tests that a spooled part the server rejects with 416 is discarded
+        and the whole export fetched again.
+        """
+        with open(self.spool_path, "wb") as spool:
+            spool.write(self.server.body + b"extra")
+        with open(self.spool_path + ".json", "w", encoding="utf-8") as meta:
+            json.dump({"url": self.url, "validator": '"v1"', "encoding": None}, meta)
+        body, _ = self.download(self.spool_path)
+        self.assertEqual(body, self.server.body)
+        self.assertIn("Range", self.server.requests[0])
+        self.assertNotIn("Range", self.server.requests[1])
+        self.assertFalse(os.path.exists(self.spool_path))
+        self.assertFalse(os.path.exists(self.spool_path + ".json"))
+
+    def test_changed_export_replaces_spooled_part(self):
+        """
+        Tests that a spooled part of an older version is discarded.
+        """
+        self.client.retries = 0
+        self.server.faults = ["change"]
+        with self.assertRaises(ResumeError):
+            self.download(self.spool_path)
+        body, _ = self.download(self.spool_path)
+        self.assertEqual(body, self.server.body)
+        self.assertIn(b"Kitsilano", body)
+
+    def test_concurrent_downloads_do_not_share_a_spool(self):
+        """
+        Tests that a second download of an export whose spool is in use
+        downloads without it, instead of truncating the first one's part.
+        """
+        first = self.client.open(self.url, spool_path=self.spool_path, keep_body=True)
+        second = self.client.open(self.url, spool_path=self.spool_path, keep_body=True)
+        bodies = [b"", b""]
+        with first, second:
+            self.assertEqual(first.body_path, self.spool_path)
+            self.assertIsNone(second.body_path)
+            while True:
+                blocks = [first.read(4096), second.read(4096)]
+                if not any(blocks):
+                    break
+                bodies = [body + block for body, block in zip(bodies, blocks)]
+        self.assertEqual(bodies, [self.server.body, self.server.body])
+        with open(self.spool_path, "rb") as spool:
+            self.assertEqual(spool.read(), self.server.body)
+        os.remove(self.spool_path)
+
+        with self.client.open(self.url, spool_path=self.spool_path,
+                              keep_body=True) as third:
+            third.read()
+            self.assertEqual(third.body_path, self.spool_path)
+
+    def test_model_loads_through_dropped_connection(self):
+        """
+        Tests that the model parses every row of an export whose download
+        was cut off and resumed.
+        """
+        self.server.use_gzip = True
+        self.server.faults = ["unavailable", "drop"]
+        model = DataModel()
+        model.http = self.client
+        progress = []
+        model.load_permit_data(self.url, year=2024,
+                               progress=lambda *args: progress.append(args))
+        self.assertEqual(len(model.permits), ROWS // 12 * 12)
+        self.assertTrue(progress)
+
+
+if __name__ == "__main__":
+    unittest.main()
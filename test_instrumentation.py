@@ -0,0 +1,139 @@
+import json
+import os
+import tempfile
+import unittest
+from argparse import Namespace
+from instrumentation import (
+    LatencyHistogram,
+    LatencyRecorder,
+    Profiler,
+    RECORDER,
+    instrument,
+    parse_profile_modes,
+    timed,
+    timing,
+    untimed,
+)
+
+
+@instrument
+class Sample:
+    """
+    A class with every kind of attribute instrument has to handle.
+    """
+
+    def work(self, value):
+        """Doubles the value."""
+        return value * 2
+
+    def fail(self):
+        raise KeyError("missing")
+
+    def _helper(self):
+        return 1
+
+    @untimed
+    def loop(self):
+        return 2
+
+    @property
+    def size(self):
+        return 3
+
+    @staticmethod
+    def build():
+        return Sample()
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        RECORDER.reset()
+
+    def test_histogram_buckets_and_percentiles(self):
+        """
+        Tests bucketing and the bucket-bound percentile estimates.
+        """
+        histogram = LatencyHistogram()
+        for seconds in (0.0004, 0.0004, 0.003, 20.0):
+            histogram.add(seconds)
+        stats = histogram.to_dict()
+        self.assertEqual(stats["count"], 4)
+        self.assertEqual(stats["buckets"], {"<=0.5ms": 2, "<=5ms": 1, ">10000ms": 1})
+        self.assertEqual(stats["p50_ms"], 0.5)
+        self.assertAlmostEqual(stats["p95_ms"], 20000.0)
+        self.assertAlmostEqual(stats["max_ms"], 20000.0)
+
+    def test_instrument_times_public_methods_only(self):
+        """
+        Tests which methods instrument wraps, and that wrapped methods keep
+        their names and results and are timed even when they raise.
+        """
+        sample = Sample.build()
+        self.assertEqual(sample.work(2), 4)
+        self.assertEqual(Sample.work.__name__, "work")
+        self.assertEqual(Sample.work.__doc__, "Doubles the value.")
+        with self.assertRaises(KeyError):
+            sample.fail()
+        sample._helper()
+        sample.loop()
+        self.assertEqual(sample.size, 3)
+        self.assertEqual(list(RECORDER.stats()), ["Sample.fail", "Sample.work"])
+
+    def test_timing_context_and_decorator(self):
+        """
+        Tests timing into a separate recorder, and that a disabled recorder
+        records nothing.
+        """
+        recorder = LatencyRecorder()
+        with timing("block", recorder):
+            pass
+        timed("function", recorder)(len)([1])
+        recorder.enabled = False
+        with timing("block", recorder):
+            pass
+        stats = recorder.stats()
+        self.assertEqual(stats["block"]["count"], 1)
+        self.assertEqual(stats["function"]["count"], 1)
+        self.assertIn("block", recorder.format_table())
+        self.assertEqual(LatencyRecorder().format_table(), "No calls recorded yet.")
+
+    def test_dump_json(self):
+        """
+        Tests that the dumped histograms match stats().
+        """
+        Sample().work(1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "timings.json")
+            RECORDER.dump_json(path)
+            with open(path) as file:
+                self.assertEqual(json.load(file), RECORDER.stats())
+
+    def test_profile_modes(self):
+        """
+        Tests parsing profile modes from options and the environment.
+        """
+        self.assertEqual(parse_profile_modes("tracemalloc, CPROFILE"),
+                         ("cprofile", "tracemalloc"))
+        self.assertEqual(parse_profile_modes(None), ())
+        with self.assertRaises(ValueError):
+            parse_profile_modes("perf")
+        os.environ["DASHBOARD_PROFILE"] = "tracemalloc"
+        try:
+            profiler = Profiler.from_options(Namespace(profile=None, profile_dir="."))
+        finally:
+            del os.environ["DASHBOARD_PROFILE"]
+        self.assertEqual(profiler.modes, ("tracemalloc",))
+
+    def test_profiler_writes_captures(self):
+        """
+        Tests that both capture modes write their files.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            with Profiler(("cprofile", "tracemalloc"), directory, "run") as profiler:
+                [Sample().work(i) for i in range(100)]
+            self.assertEqual(sorted(os.listdir(directory)), ["run-memory.txt", "run.prof"])
+            self.assertEqual(profiler.stop(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,105 @@
+import gzip
+import hashlib
+import importlib.util
+import os
+import re
+import tempfile
+import threading
+import time
 import unittest
-from data_model import DataModel
+from unittest import mock
+import numpy as np
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from data_cache import DataCache
+from date_parser import DateParser
+from data_model import DataModel, delta_url
+from http_client import HttpClient
+from dataset_schema import SCHEMAS
+from neighborhood_index import NeighborhoodIndex
+from query_cache import QueryCache
+from record_store import MonthCube
+from parallel_parse import parse_csv_parallel, split_ranges
+from column_file import open_columns, save_columns
 from io import StringIO
 
+HAVE_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def filter_since(payload, where):
+    """
+    Applies an API filter like "issuedate >= date'2024-02-15'" to a payload.
+    """
+    field, since = re.fullmatch(r"(\w+) >= date'([\d-]+)'", where).groups()
+    lines = payload.splitlines(keepends=True)
+    column = [name.lower() for name in lines[0].strip().split(";")].index(field)
+    return lines[0] + "".join(
+        line for line in lines[1:] if line.split(";")[column] >= since
+    )
+
+
+class CsvHandler(BaseHTTPRequestHandler):
+    """
+    Serves the CSV payload registered on the server for each path, honouring
+    the API's where filter on the issued date unless apply_where is off.
+    """
+
+    def do_GET(self):
+        if self.server.barrier is not None:
+            self.server.barrier.wait(timeout=5)  # Raises unless both arrive
+        path, _, query = self.path.partition("?")
+        payload = self.server.payloads.get(path)
+        if payload is None:
+            self.send_error(404)
+            return
+        where = parse_qs(query).get("where")
+        if where and self.server.apply_where:
+            payload = filter_since(payload, where[0])
+        body = payload.encode("utf-8")
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        if self.server.use_gzip:
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep test output quiet
+
+
+class LocalServerTestCase(unittest.TestCase):
+    """
+    Runs a local HTTP stand-in for the Open Data portal during the tests.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), CsvHandler)
+        cls.server.payloads = {}
+        cls.server.use_gzip = False
+        cls.server.barrier = None
+        cls.server.apply_where = True
+        cls.server.requests = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
 
 class TestDataModel(unittest.TestCase):
     def setUp(self):
@@ -145,6 +243,93 @@ class TestDataModel(unittest.TestCase):
         self.assertEqual(grouped_bar_data["Building Permits"], 1)
         self.assertEqual(grouped_bar_data["Business Licenses"], 1)
 
+    def test_parse_drops_invalid_dates_and_strips_areas(self):
+        """
+        Tests that the columnar parser drops unparseable dates and cleans areas.
+        """
+        csv_data = (
+            "IssueDate;GeoLocalArea\n"
+            " 2024-04-02 ;  Downtown \n"
+            "not a date;Kitsilano\n"
+            ";Kitsilano\n"
+            "2024-04-09;\n"
+        )
+        self.model.parse_permit_data(csv_data)
+        self.assertEqual(len(self.model.permits), 2)
+        self.assertEqual(self.model.permits[0].geo_local_area, "Downtown")
+        self.assertEqual(self.model.permits[0].year_month, "2024-04")
+        self.assertEqual(self.model.permits[1].geo_local_area, "")
+
+    def test_records_are_materialized_lazily(self):
+        """
+        Tests that record objects are only built when requested and match the
+        columnar query results.
+        """
+        self.model.parse_license_data(self.valid_license_csv.getvalue())
+        self.assertIsNone(self.model._license_store._records)
+        self.assertEqual(self.model.count_licenses_by_month("Downtown"),
+                         {"2023-11": 1, "2024-01": 1})
+        self.assertIsNone(self.model._license_store._records)
+
+        licenses = self.model.licenses
+        self.assertIs(licenses, self.model.licenses)
+        downtown_months = sorted(
+            lic.year_month for lic in licenses if lic.local_area == "Downtown"
+        )
+        self.assertEqual(downtown_months, ["2023-11", "2024-01"])
+
+    def test_compact_record_storage(self):
+        """
+        Tests that records are stored as int32 day ordinals and area codes and
+        that materialized records are slotted and share timestamps.
+        """
+        csv_data = (
+            "IssuedDate;LocalArea\n"
+            "2024-06-01;Downtown\n"
+            "2024-06-01;Downtown\n"
+            "2024-06-02;Kitsilano\n"
+        )
+        self.model.parse_license_data(csv_data)
+        store = self.model._license_store
+        self.assertEqual(store.days.dtype, np.int32)
+        self.assertEqual(store.codes.dtype, np.int32)
+        self.assertEqual(store.area_names, ["Downtown", "Kitsilano"])
+
+        licenses = self.model.licenses
+        self.assertFalse(hasattr(licenses[0], "__dict__"))
+        self.assertIs(licenses[0].issued_date, licenses[1].issued_date)
+        self.assertIs(licenses[0].local_area, licenses[1].local_area)
+        self.assertEqual(licenses[2].year_month, "2024-06")
+        self.assertEqual(store[2].local_area, "Kitsilano")
+
+    def test_count_cube_tracks_appended_data(self):
+        """
+        Tests that the count cube is rebuilt when data is appended after
+        filtering, and that unknown neighborhoods count as zero.
+        """
+        self.model.parse_permit_data(self.valid_permit_csv.getvalue())
+        self.model.filter_data_2024()
+        cube = self.model._permit_store.month_cube()
+        self.assertEqual(cube.counts.sum(), 2)
+        self.assertEqual(self.model.prepare_grouped_bar_data("Nowhere"),
+                         {"Building Permits": 0, "Business Licenses": 0})
+
+        self.model.parse_permit_data("IssueDate;GeoLocalArea\n2024-02-03;Downtown\n")
+        self.assertEqual(self.model.count_permits_by_month("Downtown"),
+                         {"2024-01": 1, "2024-02": 1})
+        self.assertEqual(self.model.prepare_grouped_bar_data("Downtown")
+                         ["Building Permits"], 2)
+
+    def test_parse_logs_one_summary_line(self):
+        """
+        Tests that parsing logs a single summary line at INFO rather than one
+        line per row.
+        """
+        with self.assertLogs("data_model", level="INFO") as logs:
+            self.model.parse_permit_data(self.valid_permit_csv.getvalue())
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("rows=3, kept=3, total=3", logs.output[0])
+
     def test_parse_invalid_csv(self):
         """
         Tests parsing invalid CSV data.
@@ -185,6 +370,905 @@ class TestDataModel(unittest.TestCase):
         self.assertEqual(grouped_bar_data["Building Permits"], 0)
         self.assertEqual(grouped_bar_data["Business Licenses"], 0)
 
+    def test_neighborhood_index_tracks_loaded_data(self):
+        """
+        Tests that the index covers both datasets, skips empty areas, and is
+        rebuilt after more data is parsed.
+        """
+        self.model.parse_permit_data(self.valid_permit_csv.getvalue())
+        self.model.parse_license_data(
+            "IssuedDate;LocalArea\n2024-01-05;Downtown\n2024-01-06;\n"
+        )
+        index = self.model.neighborhood_index()
+        self.assertEqual(index.names, ["Downtown", "Kitsilano", "Mount Pleasant"])
+        self.assertIs(self.model.neighborhood_index(), index)
+
+        self.model.parse_license_data("IssuedDate;LocalArea\n2024-02-01;Fairview\n")
+        self.assertIn("Fairview", self.model.neighborhood_index())
+
+    def test_area_offsets_select_one_neighborhood(self):
+        """
+        Tests that per-area offsets return exactly the records of one area.
+        """
+        self.model.parse_permit_data(
+            "IssueDate;GeoLocalArea\n2024-01-01;Downtown\n2024-01-02;Kitsilano\n"
+            "2024-01-03;Downtown\n"
+        )
+        downtown = self.model.permits_in_area("Downtown")
+        self.assertEqual([p.issued_date.day for p in downtown], [1, 3])
+        self.assertEqual(self.model.permits_in_area("Nowhere"), [])
+        self.assertEqual(self.model.licenses_in_area("Downtown"), [])
+
+    def test_time_series_over_all_years(self):
+        """
+        Tests yearly, weekly and daily buckets over data kept for all years,
+        including empty buckets and windows given per query.
+        """
+        self.model.parse_permit_data(self.valid_permit_csv.getvalue())
+        self.model.parse_license_data(self.valid_license_csv.getvalue())
+
+        yearly = self.model.prepare_time_series(start="", end="", granularity="year")
+        self.assertEqual(yearly, [
+            {"period": "2023", "permits": 1, "licenses": 1},
+            {"period": "2024", "permits": 2, "licenses": 2},
+        ])
+        weekly = self.model.prepare_time_series(
+            start="2023-12-25", end="2024-01-07", granularity="week"
+        )
+        self.assertEqual(weekly, [
+            {"period": "2023-12-25", "permits": 1, "licenses": 0},
+            {"period": "2024-01-01", "permits": 1, "licenses": 1},
+        ])
+        daily = self.model.prepare_line_chart_data(
+            "Downtown", start="2024-01-01", end="2024-01-05", granularity="day"
+        )
+        self.assertEqual([(d["period"], d["permits"], d["licenses"]) for d in daily], [
+            ("2024-01-01", 1, 0), ("2024-01-02", 0, 0), ("2024-01-03", 0, 0),
+            ("2024-01-04", 0, 0), ("2024-01-05", 0, 1),
+        ])
+
+    def test_time_window_defaults_and_bar_totals(self):
+        """
+        Tests that charts default to 2024 and follow set_time_window.
+        """
+        self.model.parse_permit_data(self.valid_permit_csv.getvalue())
+        self.model.parse_license_data(self.valid_license_csv.getvalue())
+        self.assertEqual(len(self.model.prepare_line_chart_data()), 12)
+        self.assertEqual(self.model.prepare_grouped_bar_data("Downtown"),
+                         {"Building Permits": 1, "Business Licenses": 1})
+
+        self.model.set_time_window("2023-12", None, "year")
+        self.assertEqual(self.model.prepare_grouped_bar_data("Downtown"),
+                         {"Building Permits": 1, "Business Licenses": 1})
+        self.assertEqual(self.model.prepare_grouped_bar_data(),
+                         {"Building Permits": 3, "Business Licenses": 2})
+        self.assertEqual(
+            [d["period"] for d in self.model.prepare_line_chart_data()],
+            ["2023", "2024"],
+        )
+        with self.assertRaises(ValueError):
+            self.model.set_time_window(granularity="fortnight")
+        with self.assertRaises(ValueError):
+            self.model.prepare_time_series(start="next tuesday")
+
+
+class TestNeighborhoodIndex(unittest.TestCase):
+    def setUp(self):
+        """
+        Sets up an index of a few Vancouver neighborhoods.
+        """
+        self.index = NeighborhoodIndex(
+            ["Kensington-Cedar Cottage", "Kerrisdale", "Kitsilano",
+             "Mount Pleasant", "Downtown", "Downtown", ""]
+        )
+
+    def test_ids_are_dense_and_names_interned(self):
+        """
+        Tests that duplicates collapse and each name gets a stable ID.
+        """
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.ids["Downtown"], 0)
+        self.assertEqual(
+            [self.index.ids[name] for name in self.index.names], list(range(5))
+        )
+
+    def test_resolve_exact_case_and_punctuation(self):
+        """
+        Tests exact matches and matches ignoring case and punctuation.
+        """
+        self.assertEqual(self.index.resolve("Kitsilano"), "Kitsilano")
+        self.assertEqual(self.index.resolve(" mount pleasant "), "Mount Pleasant")
+        self.assertEqual(self.index.resolve("KENSINGTON CEDAR-COTTAGE"),
+                         "Kensington-Cedar Cottage")
+
+    def test_resolve_prefix_and_typos(self):
+        """
+        Tests unique prefixes and small typos, and rejects ambiguous input.
+        """
+        self.assertEqual(self.index.resolve("kens"), "Kensington-Cedar Cottage")
+        self.assertEqual(self.index.resolve("Kitsilamo"), "Kitsilano")
+        self.assertIsNone(self.index.resolve("k"))
+        self.assertIsNone(self.index.resolve("Atlantis"))
+
+    def test_suggest(self):
+        """
+        Tests the suggestions offered for unresolved input.
+        """
+        self.assertEqual(self.index.suggest("k"),
+                         ["Kensington-Cedar Cottage", "Kerrisdale", "Kitsilano"])
+        self.assertEqual(self.index.suggest("Atlantis"), [])
+
+
+class TestAggregate(unittest.TestCase):
+    def setUp(self):
+        """
+        Sets up a model with permits and licenses across two years.
+        """
+        self.model = DataModel()
+        self.model.parse_permit_data(
+            "IssueDate;GeoLocalArea\n2024-01-01;Downtown\n2024-01-20;Downtown\n"
+            "2024-03-05;Fairview\n2023-12-31;Fairview\n"
+        )
+        self.model.parse_license_data(
+            "IssuedDate;LocalArea\n2024-01-07;Fairview\n2024-02-29;Marpole\n"
+        )
+
+    def test_measures_match_the_chart_queries(self):
+        """
+        Tests that one fused pass gives the same series, totals and per-area
+        breakdowns as the separate queries, for cube and binned windows.
+        """
+        for granularity, start, end in (("month", None, None), ("week", "", ""),
+                                        ("day", "2024-01-01", "2024-01-31")):
+            counts = self.model.aggregate(start=start, end=end, granularity=granularity)
+            line = self.model.prepare_line_chart_data(None, start, end, granularity)
+            self.assertEqual(counts["labels"], [entry["period"] for entry in line])
+            self.assertEqual(counts["permits"]["series"].tolist(),
+                             [entry["permits"] for entry in line])
+            bar = self.model.prepare_grouped_bar_data(None, start, end)
+            self.assertEqual(counts["licenses"]["total"], bar["Business Licenses"])
+            for area, total in counts["permits"]["area_totals"].items():
+                self.assertEqual(total, self.model.prepare_grouped_bar_data(
+                    area, start, end)["Building Permits"])
+                self.assertEqual(counts["permits"]["area_series"][area].sum(), total)
+
+    def test_neighborhood_and_totals_only(self):
+        """
+        Tests measures restricted to one area, a totals-only query, and
+        unknown measures.
+        """
+        counts = self.model.aggregate(("total", "area_totals"), "Fairview", "", "")
+        self.assertEqual(counts["labels"], [])
+        self.assertEqual(counts["permits"], {"total": 2, "area_totals": {"Fairview": 2}})
+        self.assertEqual(counts["licenses"], {"total": 1, "area_totals": {"Fairview": 1}})
+        self.assertEqual(self.model.aggregate(("total",), "Atlantis")["permits"],
+                         {"total": 0})
+        with self.assertRaises(ValueError):
+            self.model.aggregate(("median",))
+
+
+class TestQueryCache(unittest.TestCase):
+    def test_lru_eviction_and_stats(self):
+        """
+        Tests least-recently-used eviction and the counters.
+        """
+        cache = QueryCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)  # Evicts "b", the least recently used
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats(), {
+            "size": 2, "max_entries": 2, "hits": 1, "misses": 1,
+            "evictions": 1, "hit_rate": 0.5,
+        })
+
+    def test_model_answers_repeats_from_the_cache(self):
+        """
+        Tests that repeated chart queries hit the cache, that the window is
+        part of the key, and that callers get their own copies.
+        """
+        model = DataModel()
+        model.parse_permit_data("IssueDate;GeoLocalArea\n2024-01-01;Downtown\n")
+        first = model.prepare_line_chart_data("Downtown")
+        first[0]["permits"] = 99
+        self.assertEqual(model.prepare_line_chart_data("Downtown")[0]["permits"], 1)
+        model.prepare_grouped_bar_data("Downtown")
+        model.prepare_grouped_bar_data("Downtown")
+        model.prepare_grouped_bar_data("Downtown", "2023-01-01", "2023-12-31")
+        stats = model.query_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 3))
+
+    def test_data_changes_invalidate_the_cache(self):
+        """
+        Tests that loading more data and filtering drop cached results.
+        """
+        model = DataModel()
+        model.parse_permit_data("IssueDate;GeoLocalArea\n2024-01-01;Downtown\n")
+        self.assertEqual(model.prepare_grouped_bar_data()["Building Permits"], 1)
+        model.parse_permit_data("IssueDate;GeoLocalArea\n2023-05-01;Downtown\n")
+        self.assertEqual(model.prepare_grouped_bar_data(None, "", "")["Building Permits"], 2)
+        model.filter_data_year(2024)
+        self.assertEqual(model.prepare_grouped_bar_data(None, "", "")["Building Permits"], 1)
+        stats = model.query_cache_stats()
+        self.assertEqual((stats["hits"], stats["size"]), (0, 1))
+        self.assertEqual(stats["evictions"], 2)
+
+    def test_replaced_stores_never_reuse_a_version(self):
+        """
+        Tests that loading other files never answers from results of freed
+        stores, whose ids CPython reuses.
+        """
+        model = DataModel()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = []
+            for i, area in enumerate(("Downtown", "Kitsilano")):
+                path = os.path.join(temp_dir, f"{i}.csv")
+                with open(path, "w", encoding="utf-8") as file:
+                    file.write(f"IssueDate;GeoLocalArea\n2024-01-01;{area}\n")
+                paths.append(path)
+            for _ in range(20):
+                seen = {model.data_version()}
+                for path, area in zip(paths, ("Downtown", "Kitsilano")):
+                    self.assertTrue(model.load_csv_file(path, "permits"))
+                    self.assertNotIn(model.data_version(), seen)
+                    seen.add(model.data_version())
+                    self.assertEqual(
+                        model.prepare_grouped_bar_data(area, "", "")["Building Permits"], 1
+                    )
+                    self.assertEqual(model.neighborhood_index().resolve(area), area)
+
+
+class TestDateParser(unittest.TestCase):
+    def test_parse_memoizes_iso_dates(self):
+        """
+        Tests the strict ISO fast path and the memo cache counters.
+        """
+        parser = DateParser()
+        first = parser.parse("2024-03-05")
+        self.assertIs(parser.parse(" 2024-03-05 "), first)
+        self.assertEqual((first.year, first.month, first.day), (2024, 3, 5))
+        stats = parser.stats()
+        self.assertIsNone(stats["date_format"])  # Only columns detect a format
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["fast_path"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_parse_falls_back_and_bounds_cache(self):
+        """
+        Tests flexible fallback on a miss, failures and the cache size limit.
+        """
+        parser = DateParser(max_entries=2)
+        parser.parse("2024-01-01")
+        self.assertEqual(parser.parse("March 5, 2024").month, 3)
+        self.assertIsNone(parser.parse("not a date"))
+        self.assertIsNone(parser.parse(""))
+        stats = parser.stats()
+        self.assertEqual(stats["fallback"], 2)
+        self.assertEqual(stats["failures"], 1)
+        self.assertEqual(stats["cache_size"], 2)
+
+    def test_parse_days_parses_each_distinct_string_once(self):
+        """
+        Tests the column path: distinct strings are parsed once and rows that
+        miss the detected format fall back to flexible parsing.
+        """
+        parser = DateParser()
+        days, valid = parser.parse_days(
+            ["2024-01-02", "2024-01-02", None, "2024/01/03", "bad", "2024-01-02"]
+        )
+        self.assertEqual(valid.tolist(), [True, True, False, True, False, True])
+        self.assertEqual(days[valid].tolist(), [19724, 19724, 19725, 19724])
+        stats = parser.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 3))
+        self.assertEqual((stats["fast_path"], stats["fallback"]), (1, 2))
+
+    def test_parse_days_categorical(self):
+        """
+        Tests that a categorical column is parsed through its categories and
+        gives the same days as the plain column.
+        """
+        values = ["2024-01-02", " 2024-01-02", None, "bad", "2024-01-03"]
+        parser = DateParser()
+        days, valid = parser.parse_days(pd.Series(values, dtype="category"))
+        plain_days, plain_valid = DateParser().parse_days(values)
+        np.testing.assert_array_equal(valid, plain_valid)
+        np.testing.assert_array_equal(days[valid], plain_days[plain_valid])
+        self.assertEqual(parser.stats()["misses"], 4)
+
+    def test_parse_days_mixed_utc_offsets(self):
+        """
+        Tests that timestamps with PST and PDT offsets in one column take the
+        strict path and keep their local dates.
+        """
+        parser = DateParser()
+        days, valid = parser.parse_days([
+            "2024-03-09T23:30:00-08:00", "2024-03-10T12:00:00-07:00",
+            "2024-11-03T00:15:00-07:00", "2024-11-03T23:45:00-08:00",
+        ])
+        self.assertTrue(valid.all())
+        self.assertEqual(days.tolist(), [19791, 19792, 20030, 20030])
+        stats = parser.stats()
+        self.assertEqual((stats["fast_path"], stats["fallback"]), (4, 0))
+
+    def test_format_is_detected_per_column(self):
+        """
+        Tests that an export in another format parsed later is not forced
+        onto the format of the first one.
+        """
+        parser = DateParser()
+        parser.parse_days(["2024-01-02", "2024-01-03"])
+        self.assertEqual(parser.stats()["date_format"], "%Y-%m-%d")
+        days, valid = parser.parse_days(["2024-01-02T08:00:00-08:00"])
+        self.assertEqual(days[valid].tolist(), [19724])
+        self.assertEqual(parser.stats()["date_format"], "ISO8601")
+        self.assertEqual(parser.stats()["fallback"], 0)
+        parser.parse("2024-01-05")  # A single lookup leaves the column format
+        self.assertEqual(parser.stats()["date_format"], "ISO8601")
+
+
+class TestDatasetSchema(unittest.TestCase):
+    def test_read_options_project_the_export(self):
+        """
+        Tests that only the declared columns are read, as categoricals.
+        """
+        csv_data = (
+            "PermitNumber;IssueDate;Address;GeoLocalArea;ProjectValue\n"
+            "BP-1;2024-01-01;1 Main St;Downtown;100\n"
+            "BP-2;2024-01-01;2 Main St; Downtown ;200\n"
+            "BP-3;2024-02-01;3 Main St;;300\n"
+        )
+        data = pd.read_csv(StringIO(csv_data), **SCHEMAS["permits"].read_options())
+        self.assertEqual(list(data.columns), ["IssueDate", "GeoLocalArea"])
+        self.assertTrue(all(isinstance(dtype, pd.CategoricalDtype)
+                            for dtype in data.dtypes))
+
+        model = DataModel()
+        model.parse_permit_data(csv_data)
+        self.assertEqual([(p.issued_date.month, p.geo_local_area) for p in model.permits],
+                         [(1, "Downtown"), (1, "Downtown"), (2, "")])
+        self.assertEqual(model._permit_store.area_names, ["Downtown", ""])
+
+    def test_year_filter_skips_unused_categories(self):
+        """
+        Tests that areas whose rows are all filtered out are not interned.
+        """
+        model = DataModel()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "permits.csv")
+            with open(path, "w") as file:
+                file.write("IssueDate;GeoLocalArea\n2023-05-01;Fairview\n"
+                           "2024-05-01;Marpole\n")
+            self.assertTrue(model.load_csv_file(path, "permits", year=2024))
+        self.assertEqual(model._permit_store.area_names, ["Marpole"])
+
+
+class TestStreamingLoad(LocalServerTestCase):
+    def setUp(self):
+        """
+        Registers wide sample exports on the stand-in server.
+        """
+        self.model = DataModel()
+        self.server.use_gzip = False
+        self.server.payloads["/permits.csv"] = (
+            "PermitNumber;IssueDate;Description;GeoLocalArea\n"
+            "BP-1;2024-01-01;New house;Downtown\n"
+            "BP-2;2024-02-15;Renovation;Mount Pleasant\n"
+            "BP-3;2023-12-31;Garage;Kitsilano\n"
+            "BP-4;2024-02-20;Laneway;Downtown\n"
+            "BP-5;;Unknown;Downtown\n"
+        )
+        self.server.payloads["/licenses.csv"] = (
+            "LicenceNumber;IssuedDate;BusinessName;LocalArea\n"
+            "L-1;2024-01-05;Cafe;Downtown\n"
+            "L-2;2024-03-20;Bakery;Kitsilano\n"
+            "L-3;2023-11-25;Shop;Downtown\n"
+        )
+
+    def test_load_permit_data_streams_chunks(self):
+        """
+        Tests that the streamed permits are parsed across chunks and that rows
+        outside 2024 are dropped while loading.
+        """
+        loaded = self.model.load_permit_data(
+            self.base_url + "/permits.csv", chunksize=2
+        )
+        self.assertTrue(loaded)
+        self.assertEqual(len(self.model.permits), 3)
+        self.assertEqual(
+            self.model.count_permits_by_month(), {"2024-01": 1, "2024-02": 2}
+        )
+        self.assertEqual(
+            self.model.prepare_grouped_bar_data("Downtown")["Building Permits"], 2
+        )
+
+    def test_load_license_data_gzip(self):
+        """
+        Tests that a gzip-encoded response is decoded while streaming.
+        """
+        self.server.use_gzip = True
+        loaded = self.model.load_license_data(self.base_url + "/licenses.csv")
+        self.assertTrue(loaded)
+        self.assertEqual(self.model.count_licenses_by_month(),
+                         {"2024-01": 1, "2024-03": 1})
+
+    def test_load_all_years(self):
+        """
+        Tests that passing year=None keeps every valid row.
+        """
+        self.model.load_permit_data(self.base_url + "/permits.csv", year=None)
+        self.assertEqual(len(self.model.permits), 4)
+
+    def test_load_datasets_concurrently(self):
+        """
+        Tests that both exports are requested at the same time: the server
+        only answers once both requests are in flight.
+        """
+        self.server.barrier = threading.Barrier(2)
+        try:
+            loaded = self.model.load_datasets(
+                self.base_url + "/permits.csv", self.base_url + "/licenses.csv"
+            )
+        finally:
+            self.server.barrier = None
+        self.assertEqual(loaded, (True, True))
+        self.assertEqual(self.model.prepare_grouped_bar_data(),
+                         {"Building Permits": 3, "Business Licenses": 2})
+
+    def test_load_datasets_share_one_client(self):
+        """
+        Tests that the two loader threads create a single HTTP client even
+        when creating it is slow.
+        """
+        created = []
+        original_init = HttpClient.__init__
+
+        def slow_init(client, *args, **kwargs):
+            created.append(client)
+            time.sleep(0.05)
+            original_init(client, *args, **kwargs)
+
+        with mock.patch.object(HttpClient, "__init__", slow_init):
+            loaded = self.model.load_datasets(
+                self.base_url + "/permits.csv", self.base_url + "/licenses.csv"
+            )
+        self.assertEqual(loaded, (True, True))
+        self.assertEqual(created, [self.model.http])
+
+    def test_load_datasets_reports_progress(self):
+        """
+        Tests that progress and per-dataset completion are reported.
+        """
+        events = []
+        loaded_events = []
+        self.model.load_datasets(
+            self.base_url + "/permits.csv", self.base_url + "/missing.csv",
+            chunksize=2,
+            progress=lambda *event: events.append(event),
+            on_loaded=lambda *event: loaded_events.append(event),
+        )
+        permit_events = [event for event in events if event[0] == "permits"]
+        self.assertEqual(len(permit_events), 4)  # 5 rows in chunks of 2, then done
+        self.assertEqual(permit_events[-2][2], 5)  # Rows parsed
+        self.assertEqual(permit_events[-1][2], 3)  # Rows kept, as from the cache
+        self.assertEqual(permit_events[-1][1], permit_events[-2][1])
+        self.assertGreater(permit_events[-1][1], 0)
+        self.assertEqual(sorted(loaded_events),
+                         [("licenses", False), ("permits", True)])
+
+    def test_load_datasets_partial_failure(self):
+        """
+        Tests that a failure of one export is reported separately.
+        """
+        loaded = self.model.load_datasets(
+            self.base_url + "/permits.csv", self.base_url + "/missing.csv"
+        )
+        self.assertEqual(loaded, (True, False))
+
+    def test_load_missing_export(self):
+        """
+        Tests that an HTTP error leaves the model unchanged.
+        """
+        self.model.parse_permit_data("IssueDate;GeoLocalArea\n2024-05-01;Downtown\n")
+        loaded = self.model.load_permit_data(self.base_url + "/missing.csv")
+        self.assertFalse(loaded)
+        self.assertEqual(len(self.model.permits), 1)
+
+
+class TestDeltaRefresh(LocalServerTestCase):
+    def setUp(self):
+        """
+        Loads a small permits export from the stand-in API.
+        """
+        self.model = DataModel()
+        self.server.use_gzip = False
+        self.server.apply_where = True
+        self.server.requests = []
+        self.server.payloads["/delta-permits.csv"] = (
+            "IssueDate;GeoLocalArea\n"
+            "2024-01-01;Downtown\n"
+            "2024-02-15;Mount Pleasant\n"
+        )
+        self.url = self.base_url + "/delta-permits.csv"
+        self.assertTrue(self.model.load_permit_data(self.url))
+        self.server.requests = []
+
+    def test_delta_url(self):
+        """
+        Tests the where and order_by filters added to the export URL.
+        """
+        url = delta_url("http://x/export?lang=en", "licenses", 19768)
+        self.assertEqual(
+            url,
+            "http://x/export?lang=en&where=issueddate+%3E%3D+date%272024-02-15%27"
+            "&order_by=issueddate",
+        )
+
+    def test_refresh_fetches_only_new_records(self):
+        """
+        Tests that only records from the newest day held onwards are fetched,
+        and that they are merged into the counts and the neighborhood index.
+        """
+        self.server.payloads["/delta-permits.csv"] += (
+            "2024-02-15;Downtown\n"
+            "2024-03-03;Fairview\n"
+        )
+        self.assertEqual(self.model.refresh_permit_data(self.url), 2)
+
+        path, _ = self.server.requests[0]
+        self.assertIn("where=issuedate", path)
+        self.assertEqual(len(self.model.permits), 4)
+        self.assertEqual(self.model.count_permits_by_month(),
+                         {"2024-01": 1, "2024-02": 2, "2024-03": 1})
+        self.assertEqual(self.model.count_permits_by_month("Downtown"),
+                         {"2024-01": 1, "2024-02": 1})
+        store = self.model._permit_store
+        rebuilt = MonthCube(store.days, store.codes, store.area_names)
+        np.testing.assert_array_equal(store.month_cube().counts, rebuilt.counts)
+        self.assertEqual(self.model.resolve_neighborhood("fairview"), "Fairview")
+
+    def test_refresh_without_new_records(self):
+        """
+        Tests that refetching the newest day does not duplicate it.
+        """
+        self.assertEqual(self.model.refresh_permit_data(self.url), 0)
+        self.assertEqual(self.model.count_permits_by_month(),
+                         {"2024-01": 1, "2024-02": 1})
+
+    def test_refresh_ignores_rows_outside_the_filter(self):
+        """
+        Tests that rows before the newest day held are not merged again when
+        the portal ignores the where filter and sends the whole export.
+        """
+        self.server.apply_where = False
+        self.server.payloads["/delta-permits.csv"] += "2024-03-03;Fairview\n"
+        self.assertEqual(self.model.refresh_permit_data(self.url), 1)
+        self.assertEqual(len(self.model.permits), 3)
+        self.assertEqual(self.model.count_permits_by_month(),
+                         {"2024-01": 1, "2024-02": 1, "2024-03": 1})
+        store = self.model._permit_store
+        rebuilt = MonthCube(store.days, store.codes, store.area_names)
+        np.testing.assert_array_equal(store.month_cube().counts, rebuilt.counts)
+
+    def test_refresh_failure_keeps_data(self):
+        """
+        Tests that a failed refresh reports None and keeps the loaded rows.
+        """
+        del self.server.payloads["/delta-permits.csv"]
+        self.assertIsNone(self.model.refresh_permit_data(self.url))
+        self.assertEqual(len(self.model.permits), 2)
+
+    def test_refresh_datasets_skips_unloaded_dataset(self):
+        """
+        Tests refreshing both datasets when only the permits are loaded.
+        """
+        self.server.payloads["/delta-permits.csv"] += "2024-04-01;Downtown\n"
+        self.assertEqual(
+            self.model.refresh_datasets(self.url, self.base_url + "/none.csv"),
+            (1, 0),
+        )
+
+
+class TestParallelParse(LocalServerTestCase):
+    def setUp(self):
+        """
+        Writes an export whose quoted descriptions hold newlines, semicolons
+        and escaped quotes.
+        """
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "permits.csv")
+        lines = ["PermitNumber;IssueDate;Description;GeoLocalArea\n"]
+        areas = ["Downtown", "Kitsilano", "Mount Pleasant", ""]
+        for i in range(400):
+            description = f'"Unit {i};\nsays ""hi""\n"' if i % 3 == 0 else "Plain"
+            date = f"{2023 + i % 2}-{i % 12 + 1:02d}-{i % 28 + 1:02d}"
+            lines.append(f"BP-{i};{date};{description};{areas[i % 4]}\n")
+        lines.append("BP-X;;Undated;Downtown")  # No trailing newline
+        self.text = "".join(lines)
+        with open(self.path, "w", encoding="utf-8") as export:
+            export.write(self.text)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_ranges_end_on_record_boundaries(self):
+        """
+        Tests that ranges cover the file and never cut a quoted field.
+        """
+        header, ranges = split_ranges(self.path, 7, min_bytes=1)
+        self.assertEqual(header, b"PermitNumber;IssueDate;Description;GeoLocalArea\n")
+        self.assertEqual(len(ranges), 7)
+        self.assertEqual(ranges[0][0], len(header))
+        self.assertEqual(ranges[-1][1], os.path.getsize(self.path))
+        data = self.text.encode("utf-8")
+        rows = 0
+        for (start, end, max_rows), (next_start, _, _) in zip(ranges, ranges[1:] + [(None, 0, 0)]):
+            if next_start is not None:
+                self.assertEqual(end, next_start)
+            self.assertEqual(data[start:end].count(b'"') % 2, 0)
+            rows += len(pd.read_csv(StringIO((header + data[start:end]).decode()),
+                                    delimiter=";"))
+            self.assertLessEqual(rows, sum(r[2] for r in ranges))
+        self.assertEqual(rows, 401)
+
+    def test_parallel_matches_streaming_parse(self):
+        """
+        Tests that parsing on two processes gives the same records, in order,
+        as the single-process streaming parse.
+        """
+        parallel = parse_csv_parallel(
+            self.path, SCHEMAS["permits"], year=2024, workers=2, min_bytes=1,
+        )
+        model = DataModel()
+        self.assertTrue(model.load_csv_file(self.path, "permits", year=2024))
+        serial = model._permit_store
+        self.assertEqual(len(parallel), 200)
+        np.testing.assert_array_equal(parallel.days, serial.days)
+        self.assertEqual([parallel.area_names[c] for c in parallel.codes],
+                         [serial.area_names[c] for c in serial.codes])
+
+    def test_model_spools_and_parses_in_parallel(self):
+        """
+        Tests loading an export over HTTP with several workers.
+        """
+        self.server.use_gzip = False
+        self.server.payloads["/parallel.csv"] = self.text
+        model = DataModel(workers=2)
+        self.assertTrue(model.load_permit_data(self.base_url + "/parallel.csv",
+                                               year=None))
+        self.assertEqual(len(model.permits), 400)
+        self.assertEqual(model.prepare_grouped_bar_data("Downtown", "", ""),
+                         {"Building Permits": 100, "Business Licenses": 0})
+
+    def test_model_parses_the_download_spool(self):
+        """
+        Tests that with a cache the file the client spools the download to
+        is parsed directly, without writing a second copy, and then deleted.
+        """
+        self.server.use_gzip = False
+        self.server.payloads["/spooled.csv"] = self.text
+        url = self.base_url + "/spooled.csv"
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = DataCache(cache_dir)
+            model = DataModel(cache, workers=2)
+            with mock.patch("data_model.tempfile.TemporaryDirectory") as temp:
+                self.assertTrue(model.load_permit_data(url, year=None))
+            temp.assert_not_called()
+            self.assertEqual(len(model.permits), 400)
+            self.assertFalse(os.path.exists(cache.spool_path(url)))
+            self.assertFalse(os.path.exists(cache.spool_path(url) + ".json"))
+
+
+class TestColumnFile(unittest.TestCase):
+    def setUp(self):
+        """
+        Parses sample data and creates a directory for the column files.
+        """
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.model = DataModel()
+        self.model.parse_permit_data(
+            "IssueDate;GeoLocalArea\n2024-01-01;Downtown\n2023-05-02;Kitsilano\n"
+            "2024-02-15;Downtown\n"
+        )
+        self.model.parse_license_data("IssuedDate;LocalArea\n")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_reopen_is_memory_mapped_and_equal(self):
+        """
+        Tests that reopened columns are memory maps with the same contents
+        and answer the same queries, including an empty dataset.
+        """
+        self.model.save_columns(self.temp_dir.name)
+        reopened = DataModel()
+        self.assertTrue(reopened.open_columns(self.temp_dir.name))
+        store = reopened._permit_store
+        self.assertIsInstance(store.days, np.memmap)
+        np.testing.assert_array_equal(store.days, self.model._permit_store.days)
+        self.assertEqual(store.area_names, ["Downtown", "Kitsilano"])
+        self.assertEqual(len(reopened.licenses), 0)
+        self.assertEqual(reopened.prepare_time_series(start="", end="", granularity="year"),
+                         self.model.prepare_time_series(start="", end="", granularity="year"))
+
+        # Mapped columns are read-only; changes produce new arrays
+        reopened.filter_data_2024()
+        self.assertEqual(len(reopened.permits), 2)
+
+    def test_replacing_a_mapped_file_keeps_the_old_view(self):
+        """
+        Tests that a reader keeps its mapped copy when the file is rewritten.
+        """
+        path = os.path.join(self.temp_dir.name, "permits.cols")
+        save_columns(path, self.model._permit_store)
+        mapped = open_columns(path, None)
+        self.model.filter_data_2024()
+        save_columns(path, self.model._permit_store)
+        self.assertEqual(len(mapped), 3)
+        self.assertEqual(len(open_columns(path, None)), 2)
+
+    def test_invalid_file_is_rejected(self):
+        """
+        Tests that a file in another format is not opened.
+        """
+        for name in ("permits.cols", "licenses.cols"):
+            with open(os.path.join(self.temp_dir.name, name), "wb") as bad:
+                bad.write(b"IssueDate;GeoLocalArea\n")
+        self.assertFalse(DataModel().open_columns(self.temp_dir.name))
+
+
+class TestArrowExport(unittest.TestCase):
+    def setUp(self):
+        """
+        Parses sample data spanning two years and creates an export directory.
+        """
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.model = DataModel()
+        self.model.parse_permit_data(
+            "IssueDate;GeoLocalArea\n2024-01-01;Downtown\n2023-05-02;Kitsilano\n"
+            "2024-02-15;Downtown\n2024-02-16;\n"
+        )
+        self.model.parse_license_data("IssuedDate;LocalArea\n")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    @unittest.skipUnless(HAVE_PYARROW, "pyarrow is not installed")
+    def test_round_trip_in_both_formats(self):
+        """
+        Tests that exported datasets are partitioned by year and import back
+        to the same records and chart data, including an empty dataset.
+        """
+        for file_format, suffix in (("parquet", ".parquet"), ("arrow", ".arrow")):
+            self.assertGreater(self.model.export_arrow(self.temp_dir.name, file_format), 0)
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(self.temp_dir.name, "permits"))),
+                ["year=2023", "year=2024"],
+            )
+            self.assertTrue(os.listdir(os.path.join(
+                self.temp_dir.name, "permits", "year=2024"))[0].endswith(suffix))
+            imported = DataModel()
+            self.assertTrue(imported.import_arrow(self.temp_dir.name, file_format))
+            self.assertEqual(
+                sorted((p.issued_date, p.geo_local_area) for p in imported.permits),
+                sorted((p.issued_date, p.geo_local_area) for p in self.model.permits),
+            )
+            self.assertEqual(len(imported.licenses), 0)
+            self.assertEqual(
+                imported.prepare_time_series(start="", end="", granularity="month"),
+                self.model.prepare_time_series(start="", end="", granularity="month"),
+            )
+
+    @unittest.skipUnless(HAVE_PYARROW, "pyarrow is not installed")
+    def test_aggregates_and_reexport(self):
+        """
+        Tests the neighborhood x month counts, and that a later export drops
+        the partitions of years no longer present.
+        """
+        import pyarrow.dataset as ds
+
+        self.model.export_arrow(self.temp_dir.name)
+        counts = ds.dataset(os.path.join(self.temp_dir.name, "aggregates"),
+                            partitioning="hive").to_table().to_pylist()
+        self.assertEqual(
+            sorted((row["neighborhood"], str(row["month"]), row["count"]) for row in counts),
+            [("", "2024-02-01", 1), ("Downtown", "2024-01-01", 1),
+             ("Downtown", "2024-02-01", 1), ("Kitsilano", "2023-05-01", 1)],
+        )
+        self.model.filter_data_2024()
+        self.model.export_arrow(self.temp_dir.name)
+        self.assertEqual(os.listdir(os.path.join(self.temp_dir.name, "permits")),
+                         ["year=2024"])
+
+    @unittest.skipUnless(HAVE_PYARROW, "pyarrow is not installed")
+    def test_import_errors(self):
+        """
+        Tests importing a missing export and an unknown format.
+        """
+        self.assertFalse(DataModel().import_arrow(self.temp_dir.name))
+        with self.assertRaises(ValueError):
+            self.model.export_arrow(self.temp_dir.name, "csv")
+
+    @unittest.skipIf(HAVE_PYARROW, "pyarrow is installed")
+    def test_missing_pyarrow_is_reported(self):
+        """
+        Tests that exporting without pyarrow names the missing package.
+        """
+        with self.assertRaisesRegex(ImportError, "pip install pyarrow"):
+            self.model.export_arrow(self.temp_dir.name)
+
+
+class TestDataCache(LocalServerTestCase):
+    def setUp(self):
+        """
+        Creates a temporary cache directory and a sample export.
+        """
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = DataCache(self.temp_dir.name)
+        self.url = self.base_url + "/cached-permits.csv"
+        self.server.use_gzip = False
+        self.server.requests = []
+        self.server.payloads["/cached-permits.csv"] = (
+            "IssueDate;GeoLocalArea\n"
+            "2024-01-01;Downtown\n"
+            "2024-02-15;Mount Pleasant\n"
+        )
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_fresh_entry_skips_network(self):
+        """
+        Tests that a second load within the TTL is served from disk.
+        """
+        self.assertTrue(DataModel(self.cache).load_permit_data(self.url))
+        model = DataModel(self.cache)
+        self.assertTrue(model.load_permit_data(self.url))
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(model.count_permits_by_month("Downtown"), {"2024-01": 1})
+
+    def test_expired_entry_is_revalidated(self):
+        """
+        Tests that an expired entry is revalidated with If-None-Match and
+        reused on a 304 response.
+        """
+        self.cache.ttl = 0
+        DataModel(self.cache).load_permit_data(self.url)
+        model = DataModel(self.cache)
+        self.assertTrue(model.load_permit_data(self.url))
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertIsNotNone(self.server.requests[1][1])
+        self.assertEqual(len(model.permits), 2)
+
+        # A changed export is downloaded again
+        self.server.payloads["/cached-permits.csv"] += "2024-03-03;Downtown\n"
+        self.assertTrue(model.load_permit_data(self.url))
+        self.assertEqual(len(model.permits), 3)
+
+    def test_force_refresh(self):
+        """
+        Tests that a forced refresh downloads unconditionally.
+        """
+        DataModel(self.cache).load_permit_data(self.url)
+        DataModel(self.cache).load_permit_data(self.url, force_refresh=True)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertIsNone(self.server.requests[1][1])
+
+    def test_size_limit_evicts_oldest(self):
+        """
+        Tests that the oldest entry is evicted when the cache is too large.
+        """
+        model = DataModel(self.cache)
+        model.load_permit_data(self.url, year=2024)
+        first_size = sum(
+            os.path.getsize(os.path.join(self.temp_dir.name, name))
+            for name in os.listdir(self.temp_dir.name)
+        )
+        self.cache.max_bytes = first_size + 1
+        model.load_permit_data(self.url, year=None)
+        self.assertIsNone(self.cache.lookup(self.url, 2024))
+        self.assertIsNotNone(self.cache.lookup(self.url, None))
+
 
 if __name__ == "__main__":
     unittest.main()
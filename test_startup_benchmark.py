@@ -0,0 +1,65 @@
+import unittest
+from startup_benchmark import (
+    BUDGETS_MS,
+    check_budgets,
+    measure,
+    parse_importtime,
+    summarize,
+)
+
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 | _io
+import time:        50 |         50 |     numpy._core
+import time:       400 |        450 |   numpy
+import time:        30 |         30 |   logging
+import time:       200 |        680 | data_model
+"""
+
+
+class TestStartupBenchmark(unittest.TestCase):
+    def test_parse_importtime(self):
+        """
+        Tests reading names, nesting depths and times from the report.
+        """
+        imports = parse_importtime(SAMPLE)
+        self.assertEqual(imports[0], ("_io", 0, 120, 120))
+        self.assertEqual(imports[1], ("numpy._core", 2, 50, 50))
+        self.assertEqual(imports[-1], ("data_model", 0, 200, 680))
+
+    def test_summarize(self):
+        """
+        Tests that only the entry point's own imports are summarized.
+        """
+        summary = summarize(parse_importtime(SAMPLE), "data_model")
+        self.assertEqual(summary["ms"], 0.68)
+        self.assertEqual(summary["modules"], ["logging", "numpy", "numpy._core"])
+        self.assertEqual(summary["top"], [["numpy", 0.45], ["logging", 0.03]])
+        with self.assertRaises(ValueError):
+            summarize(parse_importtime(SAMPLE), "data_view")
+
+    def test_check_budgets(self):
+        """
+        Tests that slow entry points and eager heavy imports are reported.
+        """
+        results = {
+            "data_model": {"ms": 900.0, "modules": ["numpy"]},
+            "api_server": {"ms": 10.0, "modules": ["pandas.core", "tkinter"]},
+        }
+        problems = check_budgets(results)
+        self.assertEqual(len(problems), 2)
+        self.assertIn("budget", problems[0])
+        self.assertIn("pandas, tkinter", problems[1])
+        self.assertEqual(check_budgets({"data_model": {"ms": 1.0, "modules": []}}), [])
+
+    def test_entry_points_defer_heavy_imports(self):
+        """
+        Tests that no entry point loads pandas, requests, Tk or matplotlib
+        when it is imported.
+        """
+        results = {module: measure(module, runs=1) for module in BUDGETS_MS}
+        self.assertEqual(check_budgets(results, budgets={}), [])
+
+
+if __name__ == "__main__":
+    unittest.main()